@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect signal handlers.
+        from api import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+        from api.instrumentation import install_query_recorder
+
+        # Count the queries of every request (see LoggingMiddleware).
+        connection_created.connect(install_query_recorder)
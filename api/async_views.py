@@ -0,0 +1,122 @@
+"""
+Async versions of the read-only API views for ASGI deployments.
+
+DRF views are synchronous, so under ASGI every request to them runs on a
+worker thread. The views here serve GET requests on the event loop using
+Django's async ORM and cache APIs, and only hop to a thread to serialize
+posts that are missing from the cache. Other methods are delegated to the
+synchronous DRF views. They are enabled with the ASYNC_VIEWS setting.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from api import views
+from api.cache import aget_serialized_breeds, aget_serialized_posts
+from api.models import Post
+
+renderer = JSONRenderer()
+
+
+async def authenticate(request):
+    """
+    Authenticate a request with the DRF authentication classes and return
+    the user. Raises AuthenticationFailed if the credentials are invalid.
+    """
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    return await sync_to_async(lambda: drf_request.user)()
+
+
+def response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        renderer.render(data),
+        status=status_code,
+        content_type=renderer.media_type,
+    )
+
+
+def error_response(exc: APIException, request):
+    error = response({"detail": exc.detail}, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+        error["WWW-Authenticate"] = authenticator.authenticate_header(request)
+    return error
+
+
+class AsyncAPIView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like DRF views, rely on token authentication instead of CSRF checks.
+        view.csrf_exempt = True
+        return view
+
+
+class AsyncPostsView(AsyncAPIView):
+    """Async version of PostsView."""
+
+    sync_view = staticmethod(views.PostsView.as_view())
+
+    async def get(self, request):
+        try:
+            # Only authenticate to reject invalid credentials, like DRF does.
+            if "HTTP_AUTHORIZATION" in request.META:
+                await authenticate(request)
+        except APIException as exc:
+            return error_response(exc, request)
+
+        pks = [pk async for pk in Post.objects.alive().values_list("pk", flat=True)]
+        return response(await aget_serialized_posts(pks))
+
+    async def post(self, request):
+        return await sync_to_async(self.sync_view)(request)
+
+
+class AsyncPostView(AsyncAPIView):
+    """Async version of PostView."""
+
+    sync_view = staticmethod(views.PostView.as_view())
+
+    async def get(self, request, pk=None):
+        try:
+            if "HTTP_AUTHORIZATION" in request.META:
+                await authenticate(request)
+        except APIException as exc:
+            return error_response(exc, request)
+
+        try:
+            posts = await aget_serialized_posts([int(pk)])
+        except ValueError:
+            posts = []
+        if not posts:
+            return response({"detail": "Object not found."}, status.HTTP_404_NOT_FOUND)
+        return response(posts[0])
+
+    async def put(self, request, pk=None):
+        return await sync_to_async(self.sync_view)(request, pk=pk)
+
+    async def delete(self, request, pk=None):
+        return await sync_to_async(self.sync_view)(request, pk=pk)
+
+
+class AsyncBreedsListView(AsyncAPIView):
+    """Async version of BreedsListView."""
+
+    async def get(self, request):
+        try:
+            user = await authenticate(request)
+            if not user.is_authenticated:
+                raise NotAuthenticated()
+        except APIException as exc:
+            return error_response(exc, request)
+
+        return response(await aget_serialized_breeds())
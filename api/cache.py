@@ -0,0 +1,120 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+from api.instrumentation import stats
+from api.models import Breed, Post
+from api.serializers import BreedSerializer, read_posts
+
+
+def post_cache():
+    return caches[settings.POST_CACHE["CACHE"]]
+
+
+def post_key(pk) -> str:
+    """
+    Return the cache key of a serialized post. The key includes the
+    representation version so that a change to PostSerializer only requires
+    bumping POST_CACHE["VERSION"] instead of flushing the cache.
+    """
+    return f"post:v{settings.POST_CACHE['VERSION']}:{pk}"
+
+
+def post_queryset():
+    """Return a Post queryset that serializes with a fixed number of queries."""
+    return (
+        Post.objects.alive()
+        .select_related("pet", "user")
+        .prefetch_related("photos", "pet__breed", "pet__eye_colors", "pet__coat_colors")
+    )
+
+
+def serialize_posts(pks) -> dict:
+    """
+    Load and serialize the posts with the given primary keys, write them to
+    the cache and return them keyed by cache key. The posts are read from
+    the primary, since a lagging replica would put stale posts back in the
+    cache right after a write invalidated them.
+    """
+    posts = read_posts(Post.objects.using(DEFAULT_DB_ALIAS).alive().filter(pk__in=pks))
+    serialized = {post_key(pk): data for pk, data in posts.items()}
+    post_cache().set_many(serialized, timeout=settings.POST_CACHE["TIMEOUT"])
+    return serialized
+
+
+def get_serialized_posts(pks) -> list:
+    """
+    Return the serialized representation of the posts with the given primary
+    keys, in the same order. Cached posts are fetched with a single cache
+    round trip, and all misses are loaded and serialized together and then
+    written back to the cache. Posts that do not exist are left out.
+    """
+    keys = {pk: post_key(pk) for pk in pks}
+    found = post_cache().get_many(keys.values())
+    missing = [pk for pk in pks if keys[pk] not in found]
+    stats.add_cache_lookup("posts", len(pks) - len(missing), len(missing))
+    if missing:
+        found.update(serialize_posts(missing))
+    return [found[keys[pk]] for pk in pks if keys[pk] in found]
+
+
+async def aget_serialized_posts(pks) -> list:
+    """Async version of get_serialized_posts()."""
+    keys = {pk: post_key(pk) for pk in pks}
+    # The default aget_many() awaits aget() once per key, so fetch all keys
+    # with a single call on a worker thread instead.
+    get_many = sync_to_async(post_cache().get_many, thread_sensitive=False)
+    found = await get_many(keys.values())
+    missing = [pk for pk in pks if keys[pk] not in found]
+    stats.add_cache_lookup("posts", len(pks) - len(missing), len(missing))
+    if missing:
+        found.update(await sync_to_async(serialize_posts)(missing))
+    return [found[keys[pk]] for pk in pks if keys[pk] in found]
+
+
+def invalidate_posts(pks):
+    """Remove the cached representation of the posts with the given primary keys."""
+    post_cache().delete_many([post_key(pk) for pk in pks])
+
+
+def breed_cache():
+    return caches[settings.BREED_CACHE["CACHE"]]
+
+
+def breeds_key() -> str:
+    return f"breeds:v{settings.BREED_CACHE['VERSION']}"
+
+
+def get_serialized_breeds() -> list:
+    """Return the serialized list of all breeds, from the cache when possible."""
+    breeds = breed_cache().get(breeds_key())
+    stats.add_cache_lookup("breeds", int(breeds is not None), int(breeds is None))
+    if breeds is None:
+        breeds = [
+            dict(data) for data in BreedSerializer(Breed.objects.all(), many=True).data
+        ]
+        breed_cache().set(breeds_key(), breeds, timeout=settings.BREED_CACHE["TIMEOUT"])
+    return breeds
+
+
+async def aget_serialized_breeds() -> list:
+    """Async version of get_serialized_breeds()."""
+    breeds = await breed_cache().aget(breeds_key())
+    stats.add_cache_lookup("breeds", int(breeds is not None), int(breeds is None))
+    if breeds is None:
+        breeds = [
+            dict(data)
+            for data in BreedSerializer(
+                [breed async for breed in Breed.objects.all()], many=True
+            ).data
+        ]
+        await breed_cache().aset(
+            breeds_key(), breeds, timeout=settings.BREED_CACHE["TIMEOUT"]
+        )
+    return breeds
+
+
+def invalidate_breeds():
+    """Remove the cached list of breeds."""
+    breed_cache().delete(breeds_key())
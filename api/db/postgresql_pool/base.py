@@ -0,0 +1,144 @@
+"""
+PostgreSQL database backend that keeps connections in an in-process pool.
+
+Django opens a connection on the first query of a request and closes it when
+the request finishes (or after CONN_MAX_AGE seconds). With this backend,
+closing a connection returns it to a pool shared by all threads of the
+process instead, so requests handled by other threads (threaded WSGI
+servers or the ASGI thread pool) reuse it without a new TCP and auth
+handshake. The pool is configured with the POOL key of the database
+settings:
+
+    "POOL": {"MIN_SIZE": 5, "MAX_SIZE": 20, "TIMEOUT": 10}
+
+MIN_SIZE connections, but no more than MAX_SIZE, are opened with the pool
+and kept open while idle.
+Up to MAX_SIZE connections are opened under load, and the extra ones are
+closed when they are returned. Requests wait up to TIMEOUT seconds for a
+free connection. Use CONN_MAX_AGE = 0 with this backend so that every
+request hands its connection back to the pool.
+"""
+
+import logging
+import threading
+
+import psycopg2.extras
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base, creation
+from psycopg2 import OperationalError, pool
+
+logger = logging.getLogger(__name__)
+
+pools = dict()
+pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """
+    A ThreadedConnectionPool that waits up to timeout seconds for a
+    connection to be returned when all of them are in use, instead of
+    raising PoolError right away.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, *args, **kwargs):
+        self.available = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self.available.acquire(timeout=self.timeout):
+            raise pool.PoolError("Timed out waiting for a database connection.")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self.available.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.available.release()
+
+
+def get_pool(settings_dict, conn_params) -> BlockingConnectionPool:
+    # Pools are keyed by connection parameters rather than by alias, since
+    # the test runner changes the database name of an alias.
+    key = tuple(sorted(conn_params.items()))
+    with pools_lock:
+        if key not in pools:
+            options = settings_dict.get("POOL", {})
+            max_size = options.get("MAX_SIZE", 20)
+            pools[key] = BlockingConnectionPool(
+                # A MAX_SIZE below the default MIN_SIZE lowers MIN_SIZE too.
+                min(options.get("MIN_SIZE", 5), max_size),
+                max_size,
+                options.get("TIMEOUT", 10),
+                **conn_params,
+            )
+        return pools[key]
+
+
+def close_pools(database):
+    """Close the pooled connections to a database so that it can be dropped."""
+    with pools_lock:
+        for key in [key for key in pools if ("database", database) in key]:
+            pools.pop(key).closeall()
+
+
+def is_usable(connection) -> bool:
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+        return True
+    except OperationalError:
+        return False
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        if self.settings_dict["CONN_MAX_AGE"] != 0:
+            raise ImproperlyConfigured(
+                "CONN_MAX_AGE must be 0 when using connection pooling."
+            )
+        self.pool = get_pool(self.settings_dict, conn_params)
+        connection = self.pool.getconn()
+        # Pooled connections may have been closed by the server while idle.
+        if self.settings_dict["CONN_HEALTH_CHECKS"]:
+            while not is_usable(connection):
+                logger.warning("Discarding unusable pooled connection.")
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+
+        # The rest mirrors the setup done by the postgresql backend.
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # The pool rolls back any open transaction and closes
+                # connections that were lost.
+                self.pool.putconn(self.connection)
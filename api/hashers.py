@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with the costs set in settings.ARGON2 instead of Django's. When
+    the costs change, stored hashes are upgraded the next time their user
+    logs in, like hashes of the other hashers in PASSWORD_HASHERS.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2["TIME_COST"]
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2["MEMORY_COST"]
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2["PARALLELISM"]
@@ -0,0 +1,156 @@
+import functools
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+
+# Fields of request data that are left out of fingerprints, so that the
+# stored fingerprints reveal nothing about them.
+SECRET_FIELDS = {"password"}
+
+
+def expiry_cutoff():
+    """Return the creation time before which stored responses have expired."""
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY["TTL"])
+
+
+def encode_file(value):
+    """
+    Return a json-encodable stand-in for the uploaded files in request data.
+    Files are only told apart by name and size, since reading them on every
+    request, replays included, would be slow.
+    """
+    if not isinstance(value, UploadedFile):
+        return str(value)
+    return f"file:{value.name}:{value.size}"
+
+
+def keyed_hash(value) -> str:
+    """
+    Return an HMAC of value keyed with SECRET_KEY, so that stored hashes of
+    request data cannot be matched against guesses without the key.
+    """
+    return salted_hmac(__name__, value, algorithm="sha256").hexdigest()
+
+
+def fingerprint(request) -> str:
+    """
+    Return a keyed hash of the method, path and data of a request, without
+    the SECRET_FIELDS of the data.
+    """
+    data = request.data
+    if hasattr(data, "getlist"):
+        data = {key: data.getlist(key) for key in data}
+    if isinstance(data, dict):
+        data = {key: data[key] for key in data if key not in SECRET_FIELDS}
+    body = json.dumps(data, sort_keys=True, default=encode_file)
+    return keyed_hash(f"{request.method} {request.path} {body}")
+
+
+def claim(scope, path, key, request_fingerprint):
+    """
+    Store a new in-progress record for the key and return it with True, or
+    return the existing record with False if the key was already used.
+    Expired records, and in-progress records older than LOCK_TIMEOUT whose
+    request must have been abandoned, are replaced.
+    """
+    now = timezone.now()
+    lock_cutoff = now - timedelta(seconds=settings.IDEMPOTENCY["LOCK_TIMEOUT"])
+    IdempotencyKey.objects.filter(scope=scope, path=path, key=key).filter(
+        Q(created_at__lt=expiry_cutoff())
+        | Q(status_code__isnull=True, created_at__lt=lock_cutoff)
+    ).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                scope=scope, path=path, key=key, fingerprint=request_fingerprint
+            )
+        return record, True
+    except IntegrityError:
+        return IdempotencyKey.objects.get(scope=scope, path=path, key=key), False
+
+
+def idempotent(method):
+    """
+    Decorator for APIView methods that makes requests with an
+    Idempotency-Key header safe to retry. The first response for a key is
+    stored for settings.IDEMPOTENCY["TTL"] seconds and returned again for
+    later requests with the same key, without running the method. Requests
+    that arrive while the first one is still running get a 409 response,
+    and requests that reuse a key for a different method, path or data get
+    a 422 response. Server errors are not stored, so that they can be
+    retried.
+
+    Views whose responses go stale, e.g. with expiring photo URLs, can
+    define replay_data(data) to return fresh data for a stored successful
+    response.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER, None)
+        if key is None:
+            return method(self, request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return Response(
+                data={"detail": f"Invalid {HEADER} header."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_fingerprint = fingerprint(request)
+        if request.user.is_authenticated:
+            scope = f"user:{request.user.pk}"
+        else:
+            # Anonymous clients only share keys when they send the same
+            # request from the same address.
+            client = f"{request.META.get('REMOTE_ADDR')} {request_fingerprint}"
+            scope = f"anonymous:{keyed_hash(client)}"
+        record, created = claim(scope, request.path, key, request_fingerprint)
+        if not created:
+            if record.fingerprint != request_fingerprint:
+                return Response(
+                    data={"detail": f"This {HEADER} was used for a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is None:
+                return Response(
+                    data={"detail": f"A request with this {HEADER} is in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            data = record.response
+            replay = getattr(self, "replay_data", None)
+            if replay is not None and status.is_success(record.status_code):
+                data = replay(data)
+            response = Response(data=data, status=record.status_code)
+            response["Idempotent-Replayed"] = "true"
+            return response
+
+        # The record is updated by primary key, in case it was taken over
+        # after LOCK_TIMEOUT by a retry of this request.
+        records = IdempotencyKey.objects.filter(pk=record.pk)
+        try:
+            response = method(self, request, *args, **kwargs)
+        except Exception:
+            records.delete()
+            raise
+        if response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+            records.delete()
+        else:
+            records.update(status_code=response.status_code, response=response.data)
+        return response
+
+    return wrapper
@@ -0,0 +1,81 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, JpegImagePlugin
+
+# EXIF tag that tells viewers how to rotate or flip the image.
+ORIENTATION = 0x0112
+# EXIF tag of the GPS coordinates where the photo was taken.
+GPS_INFO = 0x8825
+
+# Many phones save their photos as MPO, which is a JPEG followed by more
+# images that JPEG decoders ignore.
+FORMAT_ALIASES = {"MPO": "JPEG"}
+
+
+def save_options(image) -> dict:
+    """
+    Return the options that save image again in its format with the same
+    quality. JPEGs keep their quantization tables and chroma subsampling.
+    """
+    if isinstance(image, JpegImagePlugin.JpegImageFile):
+        return {
+            "qtables": image.quantization,
+            "subsampling": JpegImagePlugin.get_sampling(image),
+        }
+    return dict()
+
+
+def read_image(file):
+    """
+    Validate an uploaded image and return it together with its metadata.
+
+    Only the image header is read and the file structure verified, without
+    decoding the pixels. Images with an EXIF orientation or GPS coordinates
+    are the exception: they are rotated once here and saved again at the
+    same quality without the orientation and the coordinates, so that the
+    stored image is always upright and does not reveal where it was taken.
+
+    Return a tuple of the file (the upload itself, or a new file for saved
+    images) and a dict with its width, height, format and bytes. Raise
+    ValidationError if the file is not a supported image.
+    """
+    try:
+        file.seek(0)
+        image = Image.open(file)
+        image_format = FORMAT_ALIASES.get(image.format, image.format)
+        width, height = image.size
+        exif = image.getexif()
+        image.verify()
+    except Exception:
+        raise ValidationError("Upload a valid image.", code="invalid_image")
+
+    if Image.MIME.get(image_format) not in settings.PHOTO_UPLOADS["CONTENT_TYPES"]:
+        raise ValidationError("Image format is not supported.", code="invalid_image")
+
+    rotated = 2 <= exif.get(ORIENTATION, 1) <= 8
+    if rotated or GPS_INFO in exif:
+        file.seek(0)
+        image = Image.open(file)
+        options = save_options(image)
+        if rotated:
+            image = ImageOps.exif_transpose(image)
+            width, height = image.size
+        exif.pop(ORIENTATION, None)
+        exif.pop(GPS_INFO, None)
+        content = BytesIO()
+        image.save(content, format=image_format, exif=exif, **options)
+        file = SimpleUploadedFile(
+            file.name, content.getvalue(), Image.MIME[image_format]
+        )
+
+    file.seek(0)
+    metadata = {
+        "width": width,
+        "height": height,
+        "format": image_format,
+        "bytes": file.size,
+    }
+    return file, metadata
@@ -0,0 +1,221 @@
+"""
+Per-request measurements for LoggingMiddleware.
+
+The middleware stores a RequestMetrics object in the request_metrics
+context variable for the duration of a request. Database queries, storage
+calls and serializers add to it from wherever they run, including the
+threads of sync_to_async(), which copy the context. When the request is
+done, the metrics are logged as a json line and added to the totals of the
+process in stats, which api.metrics exposes at /metrics.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+request_metrics = ContextVar("request_metrics", default=None)
+
+# Upper bounds in seconds of the buckets of duration histograms. A last
+# bucket counts longer durations.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = [
+        "db_queries",
+        "db_time",
+        "storage_calls",
+        "storage_time",
+        "serializer_time",
+        "serializer_depth",
+    ]
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.storage_calls = 0
+        self.storage_time = 0.0
+        self.serializer_time = 0.0
+        # Serializers that run inside other timed serializers are not
+        # counted twice.
+        self.serializer_depth = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper that counts queries and their time."""
+    metrics = request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.db_queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """connection_created receiver that adds record_query to a connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_storage_call(method):
+    """
+    Decorator for storage methods that make a request to the storage service.
+    Calls are counted per operation, the name of the method, in stats, and
+    also in the metrics of the current request if there is one.
+    """
+    operation = method.__name__.lstrip("_")
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        error = True
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            stats.add_storage_call(operation, duration, error)
+            metrics = request_metrics.get()
+            if metrics is not None:
+                metrics.storage_time += duration
+                metrics.storage_calls += 1
+
+    return wrapper
+
+
+@contextmanager
+def serializer_timer():
+    """Add the time spent in the block to the serializer time of the request."""
+    metrics = request_metrics.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    metrics.serializer_depth += 1
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if metrics.serializer_depth == 0:
+            metrics.serializer_time += time.perf_counter() - start
+
+
+class ProcessStats:
+    """
+    Thread-safe totals of the measurements of this process: requests per
+    method, route and status code, storage calls per operation and cache
+    lookups per cache. Durations are also counted in the histogram buckets.
+    """
+
+    LABELS = {
+        "requests": ("method", "route", "status"),
+        "storage": ("operation",),
+        "cache": ("cache",),
+    }
+    FIELDS = {
+        "requests": [
+            "count",
+            "duration",
+            "db_queries",
+            "db_time",
+            "storage_calls",
+            "storage_time",
+            "serializer_time",
+            "bytes",
+            "buckets",
+        ],
+        "storage": ["count", "errors", "duration", "buckets"],
+        "cache": ["hits", "misses"],
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.families = {family: dict() for family in self.LABELS}
+
+    def series(self, family, labels) -> dict:
+        """Return the totals of a series, which must be called with the lock held."""
+        totals = self.families[family].get(labels, None)
+        if totals is None:
+            totals = self.families[family][labels] = dict.fromkeys(
+                self.FIELDS[family], 0
+            )
+            if "buckets" in totals:
+                totals["buckets"] = [0] * (len(BUCKETS) + 1)
+        return totals
+
+    def add(self, method, route, status, values):
+        """Add the values measured by LoggingMiddleware for a request."""
+        with self.lock:
+            totals = self.series("requests", (method, route, status))
+            totals["count"] += 1
+            for field in values:
+                totals[field] += values[field]
+            totals["buckets"][bisect_left(BUCKETS, values["duration"])] += 1
+
+    def add_storage_call(self, operation, duration, error):
+        with self.lock:
+            totals = self.series("storage", (operation,))
+            totals["count"] += 1
+            totals["errors"] += error
+            totals["duration"] += duration
+            totals["buckets"][bisect_left(BUCKETS, duration)] += 1
+
+    def add_cache_lookup(self, cache, hits, misses):
+        with self.lock:
+            totals = self.series("cache", (cache,))
+            totals["hits"] += hits
+            totals["misses"] += misses
+
+    def merge(self, snapshot):
+        """Add the totals of a snapshot, e.g. of another process."""
+        with self.lock:
+            for family, entries in snapshot.items():
+                for entry in entries:
+                    labels = tuple(entry[name] for name in self.LABELS[family])
+                    totals = self.series(family, labels)
+                    for field in self.FIELDS[family]:
+                        if field == "buckets":
+                            for i, count in enumerate(entry[field]):
+                                totals[field][i] += count
+                        else:
+                            totals[field] += entry[field]
+
+    def snapshot(self) -> dict:
+        """
+        Return a copy of the totals that can be serialized as json, as a
+        dict of lists of series with their labels.
+        """
+        with self.lock:
+            snapshot = dict()
+            for family, series in self.families.items():
+                snapshot[family] = []
+                for labels, totals in series.items():
+                    entry = dict(zip(self.LABELS[family], labels))
+                    for field, value in totals.items():
+                        entry[field] = list(value) if field == "buckets" else value
+                    snapshot[family].append(entry)
+            return snapshot
+
+    def reset(self):
+        with self.lock:
+            for series in self.families.values():
+                series.clear()
+
+    def after_fork(self):
+        # A forked child starts without the totals of its parent. The lock is
+        # replaced in case another thread held it during the fork.
+        self.lock = threading.Lock()
+        for series in self.families.values():
+            series.clear()
+
+
+stats = ProcessStats()
+os.register_at_fork(after_in_child=stats.after_fork)
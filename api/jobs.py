@@ -0,0 +1,208 @@
+"""
+A job queue backed by the database, for work that should not run inside a
+request.
+
+Functions decorated with @job are deferred with func.delay(**kwargs), which
+inserts a Job row. Inside a transaction the row is only visible to workers
+once the transaction commits, so jobs never see data that was rolled back.
+Workers, started with the run_worker command, claim queued jobs with SELECT
+... FOR UPDATE SKIP LOCKED, so any number of them can run side by side.
+
+A job that raises is retried with exponential backoff until it has been
+attempted max_attempts times, and is then kept with the failed status for
+inspection. Jobs that succeed are deleted. Keyword arguments must be json
+serializable.
+"""
+
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from api.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = dict()
+
+
+class JobType:
+    """A function registered with @job."""
+
+    def __init__(self, func, name, max_attempts, concurrency):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, run_at=None, **kwargs) -> Job:
+        """Queue the function to run with kwargs, at run_at or as soon as possible."""
+        return Job.objects.create(
+            name=self.name, kwargs=kwargs, run_at=run_at or timezone.now()
+        )
+
+    def delay_many(self, kwargs_list, run_at=None) -> list:
+        """Queue the function once for each dict of kwargs, with a single insert."""
+        run_at = run_at or timezone.now()
+        return Job.objects.bulk_create(
+            Job(name=self.name, kwargs=kwargs, run_at=run_at) for kwargs in kwargs_list
+        )
+
+
+def job(name=None, max_attempts=None, concurrency=None):
+    """
+    Decorator that registers a function as a job. The name defaults to the
+    dotted path of the function and must not change while jobs are queued.
+    At most concurrency jobs of this type run at the same time across all
+    workers, or any number if it is None.
+    """
+
+    def decorator(func):
+        job_type = JobType(
+            func,
+            name or f"{func.__module__}.{func.__name__}",
+            max_attempts or settings.JOBS["MAX_ATTEMPTS"],
+            concurrency,
+        )
+        registry[job_type.name] = job_type
+        return job_type
+
+    return decorator
+
+
+def backoff(attempts) -> float:
+    """Return the seconds to wait before retrying a job that failed attempts times."""
+    delay = settings.JOBS["BACKOFF"] * 2 ** (attempts - 1)
+    # Jitter keeps jobs that failed together from being retried together.
+    return min(delay, settings.JOBS["MAX_BACKOFF"]) * random.uniform(0.5, 1)
+
+
+class Worker:
+    """Runs queued jobs one at a time until stopped."""
+
+    def __init__(self, name=None, burst=False):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        # In burst mode the worker exits once no job is ready.
+        self.burst = burst
+        self.stopping = False
+
+    def stop(self):
+        """Stop after the current job."""
+        self.stopping = True
+
+    def run(self):
+        logger.info(f"Worker {self.name} started.")
+        self.requeue_stale()
+        while not self.stopping:
+            self.close_old_connections()
+            job = self.claim()
+            if job is not None:
+                self.execute(job)
+            elif self.burst:
+                break
+            else:
+                self.requeue_stale()
+                time.sleep(settings.JOBS["POLL_INTERVAL"])
+        logger.info(f"Worker {self.name} stopped.")
+
+    def close_old_connections(self):
+        # Like django.db.close_old_connections() between requests, but
+        # connections inside a transaction (as in tests) are left alone.
+        for connection in connections.all():
+            if not connection.in_atomic_block:
+                connection.close_if_unusable_or_obsolete()
+
+    def saturated(self) -> list:
+        """Return the names of job types that are at their concurrency limit."""
+        running = (
+            Job.objects.filter(status=Job.Status.RUNNING)
+            .values("name")
+            .annotate(count=Count("id"))
+        )
+        saturated = []
+        for row in running:
+            job_type = registry.get(row["name"], None)
+            if job_type and job_type.concurrency is not None:
+                if row["count"] >= job_type.concurrency:
+                    saturated.append(row["name"])
+        return saturated
+
+    def claim(self):
+        """Mark the next job that is ready as running and return it, or None."""
+        now = timezone.now()
+        # The limit is checked before locking, so two workers claiming at
+        # the same moment may briefly exceed it by one.
+        saturated = self.saturated()
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status=Job.Status.QUEUED, run_at__lte=now)
+                .exclude(name__in=saturated)
+                .order_by("run_at", "pk")
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = Job.Status.RUNNING
+            job.attempts += 1
+            job.locked_at = now
+            job.locked_by = self.name
+            job.save(update_fields=["status", "attempts", "locked_at", "locked_by"])
+        return job
+
+    def execute(self, job):
+        job_type = registry.get(job.name, None)
+        try:
+            if job_type is None:
+                raise LookupError(f"No job is registered as '{job.name}'.")
+            job_type.func(**job.kwargs)
+        except Exception:
+            logger.exception(f"Job {job.pk} ({job.name}) failed.")
+            self.fail(job, job_type)
+        else:
+            job.delete()
+
+    def fail(self, job, job_type):
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        job.locked_by = ""
+        if job_type is not None and job.attempts < job_type.max_attempts:
+            job.status = Job.Status.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        else:
+            job.status = Job.Status.FAILED
+        job.save()
+
+    def requeue_stale(self):
+        """
+        Queue again the jobs of workers that died while running them, unless
+        they have been attempted max_attempts times, in which case they fail.
+        """
+        cutoff = timezone.now() - timedelta(seconds=settings.JOBS["TIMEOUT"])
+        stale = Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=cutoff)
+        failed = 0
+        for name, job_type in registry.items():
+            failed += stale.filter(
+                name=name, attempts__gte=job_type.max_attempts
+            ).update(
+                status=Job.Status.FAILED,
+                locked_at=None,
+                locked_by="",
+                last_error="The worker running the job stopped responding.",
+            )
+        if failed:
+            logger.warning(f"Failed {failed} stale job(s) out of attempts.")
+        requeued = stale.update(status=Job.Status.QUEUED, locked_at=None, locked_by="")
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale job(s).")
@@ -1,4 +1,14 @@
-from logging.handlers import MemoryHandler
+import copy
+import os
+import queue
+from collections import deque
+from contextvars import ContextVar
+from logging import ERROR
+from logging.handlers import MemoryHandler, QueueListener
+
+# Set by api.middleware.LoggingMiddleware to a dict in which handlers keep
+# the buffers of the current request.
+request_buffers = ContextVar("request_buffers", default=None)
 
 
 class EventMemoryHandler(MemoryHandler):
@@ -6,24 +16,108 @@ class EventMemoryHandler(MemoryHandler):
     A handler class that behaves similarly to MemoryHandler, except that it
     flushes records in the buffer only when an event of a certain severity
     or greater is seen.
+
+    Every request has its own buffer, so that the event flushes the records
+    that led up to it in the same request. Records logged outside of a
+    request share one buffer. A buffer keeps the last capacity records.
+    Flushed records are passed to the target by a listener thread, so that
+    logging never waits for the target to write them.
     """
 
+    def __init__(self, capacity, flushLevel=ERROR, target=None, flushOnClose=True):
+        super().__init__(capacity, flushLevel, target, flushOnClose)
+        self.buffer = deque(maxlen=capacity)
+        self.queue = queue.SimpleQueue()
+        self.listener = None
+        self.listener_pid = None
+
+    def handle(self, record):
+        """
+        Filter and emit a record. Appending to a deque is thread-safe, so
+        unlike other handlers the lock is not taken for every record.
+        """
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
     def emit(self, record):
         """
         Emit a record.
 
-        If capacity is reached, discard first record in the buffer
-        before appending the record. If shouldFlush() tells us to,
-        call flush() to process the buffer.
+        Append the record to the buffer of the current request, which
+        discards the oldest record once capacity is reached. If
+        shouldFlush() tells us to, flush that buffer.
         """
-        if len(self.buffer) == self.capacity:
-            self.buffer.pop(0)
-        self.buffer.append(record)
+        buffer = self.current_buffer()
+        buffer.append(record)
         if self.shouldFlush(record):
-            self.flush()
+            self.flush_buffer(buffer)
 
     def shouldFlush(self, record):
         """
         Check for a record at the flushLevel or higher.
         """
         return record.levelno >= self.flushLevel
+
+    def current_buffer(self) -> deque:
+        buffers = request_buffers.get()
+        if buffers is None:
+            return self.buffer
+        buffer = buffers.get(self, None)
+        if buffer is None:
+            buffer = buffers.setdefault(self, deque(maxlen=self.capacity))
+        return buffer
+
+    def flush(self):
+        """Pass the records in the buffer of the current request to the target."""
+        self.flush_buffer(self.current_buffer())
+
+    def flush_buffer(self, buffer):
+        if self.target is None:
+            return
+        self.start_listener()
+        while True:
+            try:
+                record = buffer.popleft()
+            except IndexError:
+                break
+            self.queue.put(self.prepare(record))
+
+    def prepare(self, record):
+        # Merge the arguments into the message now, as they may change
+        # before the listener formats the record.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def start_listener(self):
+        pid = os.getpid()
+        if self.listener_pid == pid:
+            return
+        with self.lock:
+            # Threads do not survive a fork, so each process starts its own
+            # listener.
+            if self.listener_pid != pid:
+                self.listener = QueueListener(
+                    self.queue, self.target, respect_handler_level=True
+                )
+                self.listener.start()
+                self.listener_pid = pid
+
+    def setTarget(self, target):
+        with self.lock:
+            self.target = target
+            if self.listener is not None:
+                self.listener.handlers = (target,)
+
+    def close(self):
+        """Flush the buffer and wait for the listener to write all records."""
+        try:
+            super().close()
+        finally:
+            if self.listener is not None and self.listener_pid == os.getpid():
+                self.listener.stop()
+                self.listener = None
+                self.listener_pid = None
@@ -0,0 +1,281 @@
+import random
+from io import BytesIO
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from api.models import Breed, Color, Comment, Pet, Photo, Post, Sex, Species, User
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+
+# Centers (latitude, longitude) of the areas around which posts are placed,
+# with their share of the posts.
+CLUSTERS = [
+    ((40.7128, -74.0060), 8),  # New York
+    ((34.0522, -118.2437), 6),  # Los Angeles
+    ((41.8781, -87.6298), 4),  # Chicago
+    ((29.7604, -95.3698), 3),  # Houston
+    ((33.4484, -112.0740), 2),  # Phoenix
+    ((47.6062, -122.3321), 2),  # Seattle
+    ((39.7392, -104.9903), 2),  # Denver
+    ((25.7617, -80.1918), 2),  # Miami
+    ((42.3601, -71.0589), 2),  # Boston
+    ((44.9778, -93.2650), 1),  # Minneapolis
+]
+# Standard deviation in degrees of the distance of posts to their center,
+# about 10 km.
+CLUSTER_SPREAD = 0.1
+
+SPECIES_WEIGHTS = {Species.DOG: 60, Species.CAT: 35, Species.OTHER: 5}
+PET_NAMES = ["Bella", "Luna", "Max", "Charlie", "Milo", "Daisy", "Rocky", "Yuna"]
+DESCRIPTIONS = [
+    "Last seen near the park, very friendly.",
+    "Found wandering on the street without a collar.",
+    "Shy, please do not chase. Call if you see them.",
+    "Has a small scar on the left ear.",
+    "Answers to their name and loves treats.",
+]
+COMMENTS = [
+    "I think I saw them this morning!",
+    "Sharing with my neighbors.",
+    "Any news?",
+    "So glad they were found.",
+    "Check the shelter on Main Street.",
+]
+# Chance that a comment gets a reply, at every level of a thread.
+REPLY_CHANCE = 0.5
+MAX_REPLY_DEPTH = 3
+# Colors of the generated photo files, one image per color.
+PHOTO_COLORS = ["black", "white", "brown", "gray", "orange"]
+
+
+def zipf_weights(count) -> list:
+    """Return weights that make the first items much more common than the last."""
+    return [1 / rank for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users, pets, posts, photos and comment threads for local "
+        "load testing, with bulk inserts in batched transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument(
+            "--photos", type=int, default=3, help="Maximum number of photos per post."
+        )
+        parser.add_argument(
+            "--comments",
+            type=float,
+            default=3,
+            help="Average number of top-level comments per post.",
+        )
+        parser.add_argument(
+            "--photo-files",
+            action="store_true",
+            help=(
+                "Also save an image for every photo to the default storage, "
+                "which should then be a local backend."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of users or posts inserted per transaction.",
+        )
+        parser.add_argument("--seed", type=int, help="Seed of the random generator.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.photos = options["photos"]
+        self.comments = options["comments"]
+        self.photo_files = options["photo_files"]
+
+        self.breeds = {
+            species: list(
+                Breed.objects.filter(species=species)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            for species in Species.values
+        }
+        self.colors = list(Color.objects.order_by("pk").values_list("pk", flat=True))
+        self.weights = {
+            len(items): zipf_weights(len(items))
+            for items in [self.colors, *self.breeds.values()]
+        }
+        self.images = [self.image(color) for color in PHOTO_COLORS]
+
+        self.create_users(options["users"])
+        self.user_pks = list(User.objects.values_list("pk", flat=True))
+        if not self.user_pks:
+            self.stderr.write("There are no users to create posts for.")
+            return
+        for start in range(0, options["posts"], self.batch_size):
+            count = min(self.batch_size, options["posts"] - start)
+            with transaction.atomic():
+                self.create_posts(count)
+            self.stdout.write(f"Created {start + count} of {options['posts']} posts.")
+
+    def create_users(self, count):
+        # Every user gets the same password, since hashing one per user
+        # would take longer than everything else. It is "password".
+        password = make_password("password")
+        prefix = uuid4().hex[:8]
+        for start in range(0, count, self.batch_size):
+            users = [
+                User(**FakeUser(username=f"user_{prefix}_{i}", password=password).data)
+                for i in range(start, min(start + self.batch_size, count))
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+        self.stdout.write(f"Created {count} users.")
+
+    def image(self, color) -> dict:
+        content = BytesIO()
+        Image.new("RGB", (640, 480), color).save(content, "JPEG")
+        return {
+            "content": content.getvalue(),
+            "width": 640,
+            "height": 480,
+            "format": "JPEG",
+        }
+
+    def location(self) -> tuple:
+        centers = [center for center, _ in CLUSTERS]
+        weights = [weight for _, weight in CLUSTERS]
+        lat, long = self.random.choices(centers, weights=weights)[0]
+        lat = max(-90, min(90, self.random.gauss(lat, CLUSTER_SPREAD)))
+        long = max(-180, min(180, self.random.gauss(long, CLUSTER_SPREAD)))
+        return round(lat, 6), round(long, 6)
+
+    def pick(self, items, count=1) -> list:
+        """Pick count different items, the first ones more often."""
+        picked = set()
+        weights = self.weights[len(items)]
+        while len(picked) < min(count, len(items)):
+            picked.add(self.random.choices(items, weights=weights)[0])
+        return list(picked)
+
+    def create_posts(self, count):
+        pets = Pet.objects.bulk_create(
+            Pet(
+                **FakePet(
+                    name=self.random.choice(PET_NAMES),
+                    species=self.random.choices(
+                        list(SPECIES_WEIGHTS), weights=SPECIES_WEIGHTS.values()
+                    )[0],
+                    age=self.random.randint(0, 15),
+                    sex=self.random.choice(Sex.values),
+                    weight=self.random.randint(1, 45),
+                    microchip=str(self.random.randrange(10**14, 10**15)),
+                ).data
+            )
+            for _ in range(count)
+        )
+        self.create_pet_relations(pets)
+
+        posts = []
+        for pet in pets:
+            lat, long = self.location()
+            posts.append(
+                Post(
+                    **FakePost(
+                        description=self.random.choice(DESCRIPTIONS),
+                        location_lat=lat,
+                        location_long=long,
+                        status=self.random.choices(
+                            Post.Status.values, weights=[5, 3, 2]
+                        )[0],
+                    ).data,
+                    pet=pet,
+                    user_id=self.random.choice(self.user_pks),
+                    photo_count=self.random.randint(0, self.photos),
+                )
+            )
+        posts = Post.objects.bulk_create(posts)
+        self.create_photos(posts)
+        self.create_comments(posts)
+
+    def create_pet_relations(self, pets):
+        breeds, eye_colors, coat_colors = [], [], []
+        for pet in pets:
+            # Most pets are of a single breed, some are mixed.
+            for breed in self.pick(
+                self.breeds[pet.species], self.random.choice([1, 1, 1, 2])
+            ):
+                breeds.append(Pet.breed.through(pet_id=pet.pk, breed_id=breed))
+            for color in self.pick(self.colors, self.random.choice([1] * 49 + [2])):
+                eye_colors.append(Pet.eye_colors.through(pet_id=pet.pk, color_id=color))
+            for color in self.pick(self.colors, self.random.randint(1, 3)):
+                coat_colors.append(
+                    Pet.coat_colors.through(pet_id=pet.pk, color_id=color)
+                )
+        Pet.breed.through.objects.bulk_create(breeds)
+        Pet.eye_colors.through.objects.bulk_create(eye_colors)
+        Pet.coat_colors.through.objects.bulk_create(coat_colors)
+
+    def create_photos(self, posts):
+        photos = []
+        for post in posts:
+            for order in range(post.photo_count):
+                image = self.random.choice(self.images)
+                name = f"{uuid4()}.jpg"
+                if self.photo_files:
+                    name = default_storage.save(name, ContentFile(image["content"]))
+                photos.append(
+                    Photo(
+                        post=post,
+                        order=order,
+                        file=name,
+                        width=image["width"],
+                        height=image["height"],
+                        format=image["format"],
+                        bytes=len(image["content"]),
+                    )
+                )
+        Photo.objects.bulk_create(photos)
+
+    def create_comments(self, posts):
+        """
+        Create threads of comments. Replies are inserted one level at a
+        time, as they need the primary keys of the comments they reply to.
+        """
+        level = []
+        if self.comments > 0:
+            level = Comment.objects.bulk_create(
+                self.comment(post.pk)
+                for post in posts
+                for _ in range(round(self.random.expovariate(1 / self.comments)))
+            )
+        counts = {post.pk: 0 for post in posts}
+        for depth in range(MAX_REPLY_DEPTH + 1):
+            for comment in level:
+                counts[comment.post_id] += 1
+            if depth == MAX_REPLY_DEPTH:
+                break
+            level = Comment.objects.bulk_create(
+                self.comment(parent.post_id, reply_to=parent)
+                for parent in level
+                if self.random.random() < REPLY_CHANCE
+            )
+
+        for post in posts:
+            post.comment_count = counts[post.pk]
+        Post.objects.bulk_update(posts, ["comment_count"])
+
+    def comment(self, post_id, reply_to=None) -> Comment:
+        return Comment(
+            user_id=self.random.choice(self.user_pks),
+            post_id=post_id,
+            reply_to=reply_to,
+            content=self.random.choice(COMMENTS),
+        )
@@ -0,0 +1,98 @@
+import json
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import invalidate_breeds
+from api.models import Breed, Species
+
+# Words that the scraped pages append to the names of breeds, by species.
+# "Dog" is part of the name of dog breeds such as "Bernese Mountain Dog".
+NAME_SUFFIXES = {
+    Species.CAT: [" Breed", " Cat"],
+    Species.DOG: [" Breed"],
+}
+
+# Words that the scraped pages append to the names of some breeds that are
+# stored without them, such as "German Shepherd Dog" for "German Shepherd".
+# They are only dropped when the shorter name is stored already.
+OPTIONAL_SUFFIXES = {
+    Species.DOG: [" Dog"],
+}
+
+
+def normalize_name(name, species) -> str:
+    """
+    Return the name of a breed without surrounding or repeated whitespace
+    and without the suffixes of the scraped pages, e.g. "Bengal" for
+    "Bengal Cat " and "Norwegian Forest" for "Norwegian Forest Cat Breed".
+    """
+    name = re.sub(r"\s+", " ", name).strip()
+    for suffix in NAME_SUFFIXES.get(species, []):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            name = name[: -len(suffix)]
+    return name
+
+
+def canonical_name(name, species, existing) -> str:
+    """
+    Return the name under which a breed is stored when the scraped name only
+    adds an optional suffix to it, e.g. "German Shepherd" for "German
+    Shepherd Dog", and otherwise the name itself.
+    """
+    for suffix in OPTIONAL_SUFFIXES.get(species, []):
+        stripped = name.removesuffix(suffix)
+        if stripped != name and (stripped, species) in existing:
+            return stripped
+    return name
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert the breeds scraped by scrape/scrape.py that are missing from "
+        "the Breed table, with normalized names."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=settings.BASE_DIR / "scrape" / "breeds.json",
+            help="Path of the scraped breeds, scrape/breeds.json by default.",
+        )
+
+    def handle(self, *args, path, **options):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f"Could not read breeds from {path}: {e}")
+
+        # Re-runs usually find every breed in place and write nothing.
+        existing = set(Breed.objects.values_list("name", "species"))
+        names = set()
+        for key, scraped in data.items():
+            species = key.removesuffix("_breeds")
+            if species not in Species.values:
+                raise CommandError(f"Unknown species of {key} in {path}.")
+            for name in scraped:
+                name = canonical_name(normalize_name(name, species), species, existing)
+                names.add((name, species))
+
+        missing = names - existing
+        if missing:
+            with transaction.atomic():
+                Breed.objects.bulk_create(
+                    [Breed(name=name, species=species) for name, species in missing],
+                    update_conflicts=True,
+                    unique_fields=["name", "species"],
+                    update_fields=["name"],
+                )
+            # bulk_create() sends no signals.
+            invalidate_breeds()
+        self.stdout.write(
+            f"Created {len(missing)} breed(s), {len(names) - len(missing)} "
+            "already existed."
+        )
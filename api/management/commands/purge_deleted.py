@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.purge import purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Remove soft-deleted posts and users and their photos in storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of posts or users removed per transaction.",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        posts, users = purge_deleted(batch_size)
+        self.stdout.write(f"Purged {posts} post(s) and {users} user(s).")
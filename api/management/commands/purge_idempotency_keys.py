@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import expiry_cutoff
+from api.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses that have expired."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            created_at__lt=expiry_cutoff()
+        ).delete()
+        self.stdout.write(f"Deleted {deleted} expired idempotency key(s).")
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Comment, Photo, Post
+
+
+def count_of(model):
+    """Return an expression counting the rows of model that belong to each post."""
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.comment_count and Post.photo_count for posts that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of posts checked per transaction.",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            with transaction.atomic():
+                drifted = (
+                    Post.objects.filter(pk__in=pks)
+                    .annotate(
+                        actual_comment_count=count_of(Comment),
+                        actual_photo_count=count_of(Photo),
+                    )
+                    .exclude(
+                        comment_count=F("actual_comment_count"),
+                        photo_count=F("actual_photo_count"),
+                    )
+                    .values_list("pk", flat=True)
+                )
+                fixed += Post.objects.filter(pk__in=list(drifted)).update(
+                    comment_count=count_of(Comment),
+                    photo_count=count_of(Photo),
+                )
+        self.stdout.write(f"Reconciled counters for {fixed} post(s).")
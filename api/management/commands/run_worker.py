@@ -0,0 +1,60 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils.module_loading import autodiscover_modules
+
+from api.jobs import Worker
+
+
+def run_worker(burst):
+    worker = Worker(burst=burst)
+    # Finish the current job before exiting.
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = "Run worker processes for the job queue (see api.jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once there are no more jobs that are ready to run.",
+        )
+
+    def handle(self, *args, processes, burst, **options):
+        # Register the jobs of every installed app.
+        autodiscover_modules("tasks")
+        if processes == 1:
+            run_worker(burst)
+            return
+
+        # Forked processes must not share the parent's database connections.
+        connections.close_all()
+        children = [
+            multiprocessing.Process(target=run_worker, args=(burst,))
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def stop_children(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        signal.signal(signal.SIGTERM, stop_children)
+        # Ctrl+C already reaches the children, which stop on their own.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for child in children:
+            child.join()
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Photo
+
+
+class Command(BaseCommand):
+    help = "Find files in storage that no Photo refers to, and optionally delete them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=24,
+            help=(
+                "Only report files older than this many hours, so that "
+                "uploads for posts that are still being created are kept."
+            ),
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete the orphaned files instead of only listing them.",
+        )
+
+    def handle(self, *args, min_age, delete, **options):
+        cutoff = timezone.now() - timedelta(hours=min_age)
+        files = default_storage.list_files()
+        orphans = []
+        while True:
+            page = list(islice(files, 1000))
+            if not page:
+                break
+            names = {name for name, modified in page if modified < cutoff}
+            known = Photo.objects.filter(file__in=names).values_list("file", flat=True)
+            for name in sorted(names.difference(known)):
+                self.stdout.write(name)
+                orphans.append(name)
+
+        if delete and orphans:
+            failed = default_storage.delete_many(orphans)
+            self.stdout.write(f"Deleted {len(orphans) - len(failed)} orphaned file(s).")
+        else:
+            self.stdout.write(f"Found {len(orphans)} orphaned file(s).")
@@ -0,0 +1,249 @@
+"""
+Metrics in the Prometheus text format, served by MetricsView at /metrics.
+
+The measurements are made in each process by api.instrumentation. Servers
+that pre-fork several worker processes must set METRICS["MULTIPROCESS_DIR"]
+to a directory shared by the workers. Every process then writes its totals
+to its own file there at most every FLUSH_INTERVAL seconds and when it
+exits, and /metrics adds up the files of all processes. Files of exited
+processes are kept so that counters never go back.
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from api.instrumentation import BUCKETS, ProcessStats, stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+def read_snapshot(path):
+    """Return the snapshot written to path, or None if it cannot be read."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotWriter:
+    """Writes the totals of this process to its file in MULTIPROCESS_DIR."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.written_at = 0.0
+
+    def write_if_due(self):
+        """Write the totals if FLUSH_INTERVAL has passed since the last write."""
+        if not settings.METRICS["MULTIPROCESS_DIR"]:
+            return
+        if time.monotonic() - self.written_at >= settings.METRICS["FLUSH_INTERVAL"]:
+            self.write()
+
+    def write(self):
+        directory = settings.METRICS["MULTIPROCESS_DIR"]
+        if not directory:
+            return
+        # Requests that arrive while another thread writes do not wait.
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.written_at = time.monotonic()
+            pid = os.getpid()
+            path = os.path.join(directory, f"{pid}.json")
+            if self.pid != pid:
+                # The file of an exited process that had the same pid is
+                # taken over, so that its counts are not lost.
+                self.pid = pid
+                previous = read_snapshot(path)
+                if previous is not None:
+                    stats.merge(previous)
+            # Write to a temporary file first, so that readers never see a
+            # partly written file.
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                json.dump(stats.snapshot(), file)
+            os.replace(temp_path, path)
+        except OSError:
+            logger.exception("Could not write metrics.")
+        finally:
+            self.lock.release()
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+        self.written_at = 0.0
+
+
+writer = SnapshotWriter()
+os.register_at_fork(after_in_child=writer.after_fork)
+atexit.register(writer.write)
+
+
+def collect() -> dict:
+    """Return the totals of this process, or of all processes in MULTIPROCESS_DIR."""
+    directory = settings.METRICS["MULTIPROCESS_DIR"]
+    if not directory:
+        return stats.snapshot()
+    writer.write()
+    total = ProcessStats()
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            snapshot = read_snapshot(os.path.join(directory, name))
+            if snapshot is not None:
+                total.merge(snapshot)
+    return total.snapshot()
+
+
+def format_labels(**labels) -> str:
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", r"\\").replace('"', r"\"")
+        value = value.replace("\n", r"\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Exposition:
+    """Builds the lines of the text format, one metric family at a time."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, description):
+        self.lines.append(f"# HELP {name} {description}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f"{name}{format_labels(**labels)} {value}")
+
+    def histogram(self, name, buckets, total, count, **labels):
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ("+Inf",), buckets):
+            cumulative += bucket_count
+            self.sample(f"{name}_bucket", cumulative, **labels, le=bound)
+        self.sample(f"{name}_sum", total, **labels)
+        self.sample(f"{name}_count", count, **labels)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+# Counters of request totals, as (metric name, field, description).
+REQUEST_COUNTERS = [
+    ("http_requests_total", "count", "Requests by method, route and status."),
+    (
+        "http_request_db_queries_total",
+        "db_queries",
+        "Database queries made by requests.",
+    ),
+    (
+        "http_request_db_seconds_total",
+        "db_time",
+        "Time spent by requests in database queries.",
+    ),
+    (
+        "http_request_storage_calls_total",
+        "storage_calls",
+        "Storage service calls made by requests.",
+    ),
+    (
+        "http_request_storage_seconds_total",
+        "storage_time",
+        "Time spent by requests in storage service calls.",
+    ),
+    (
+        "http_request_serializer_seconds_total",
+        "serializer_time",
+        "Time spent by requests in serializers.",
+    ),
+    ("http_response_bytes_total", "bytes", "Size of response bodies."),
+]
+
+
+def render(snapshot) -> str:
+    """Return a snapshot of ProcessStats in the Prometheus text format."""
+    exposition = Exposition()
+    requests = snapshot["requests"]
+    for name, field, description in REQUEST_COUNTERS:
+        exposition.family(name, "counter", description)
+        for entry in requests:
+            exposition.sample(
+                name,
+                entry[field],
+                method=entry["method"],
+                route=entry["route"],
+                status=entry["status"],
+            )
+
+    # The latency histogram is not split by status, to keep the number of
+    # series down.
+    durations = dict()
+    for entry in requests:
+        key = (entry["method"], entry["route"])
+        if key not in durations:
+            durations[key] = {
+                "buckets": [0] * len(entry["buckets"]),
+                "sum": 0,
+                "count": 0,
+            }
+        for i, count in enumerate(entry["buckets"]):
+            durations[key]["buckets"][i] += count
+        durations[key]["sum"] += entry["duration"]
+        durations[key]["count"] += entry["count"]
+    exposition.family(
+        "http_request_duration_seconds", "histogram", "Duration of requests."
+    )
+    for (method, route), totals in durations.items():
+        exposition.histogram(
+            "http_request_duration_seconds",
+            totals["buckets"],
+            totals["sum"],
+            totals["count"],
+            method=method,
+            route=route,
+        )
+
+    exposition.family(
+        "storage_operation_duration_seconds",
+        "histogram",
+        "Duration of calls to the storage service by operation.",
+    )
+    for entry in snapshot["storage"]:
+        exposition.histogram(
+            "storage_operation_duration_seconds",
+            entry["buckets"],
+            entry["duration"],
+            entry["count"],
+            operation=entry["operation"],
+        )
+    exposition.family(
+        "storage_operation_errors_total",
+        "counter",
+        "Calls to the storage service that raised an error.",
+    )
+    for entry in snapshot["storage"]:
+        exposition.sample(
+            "storage_operation_errors_total",
+            entry["errors"],
+            operation=entry["operation"],
+        )
+
+    exposition.family("cache_lookups_total", "counter", "Cache lookups by result.")
+    for entry in snapshot["cache"]:
+        exposition.sample(
+            "cache_lookups_total", entry["hits"], cache=entry["cache"], result="hit"
+        )
+        exposition.sample(
+            "cache_lookups_total", entry["misses"], cache=entry["cache"], result="miss"
+        )
+    return exposition.text()
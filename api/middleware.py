@@ -1,19 +1,161 @@
+import asyncio
+import json
 import logging
+import time
+from asgiref.sync import sync_to_async
 from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
 
+from api.instrumentation import RequestMetrics, request_metrics, stats
+from api.logging import request_buffers
+from api.metrics import writer
+from api.routers import RoutingState, authenticated_user, pin_to_primary, routing_state
 
-class LoggingMiddleware:
-    """This middleware logs every request and response."""
+
+class AsyncCapableMiddleware:
+    """
+    Base class for middleware that supports both sync and async requests, so
+    that async views are not forced onto a thread under ASGI. Subclasses
+    implement process(request) and its async version aprocess(request).
+    """
+
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
-        self.logger = logging.getLogger(__name__)
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Tell Django to await this middleware instead of calling it
+            # from a thread.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        else:
+            self._is_coroutine = None
 
     def __call__(self, request):
-        self.logger.debug(request)
-        response = self.get_response(request)
+        if self._is_coroutine:
+            return self.__acall__(request)
+        return self.process(request)
+
+    async def __acall__(self, request):
+        return await self.aprocess(request)
+
+
+class LoggingMiddleware(AsyncCapableMiddleware):
+    """
+    This middleware measures every request and logs the measurements as a
+    json line to the api.requests logger. They are also added to the
+    totals of the process in api.instrumentation.stats, which are served at
+    /metrics. See api.instrumentation and api.metrics. Every request and
+    response is logged as well, at the debug level.
+
+    It also gives every request its own buffer in api.logging's
+    EventMemoryHandler.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.logger = logging.getLogger(__name__)
+        self.request_logger = logging.getLogger("api.requests")
+
+    def process(self, request):
+        token = request_metrics.set(RequestMetrics())
+        buffers_token = request_buffers.set(dict())
+        start = time.perf_counter()
+        try:
+            self.logger.debug(request)
+            response = self.get_response(request)
+            self.log_response(request, response, time.perf_counter() - start)
+        finally:
+            request_buffers.reset(buffers_token)
+            request_metrics.reset(token)
+        return response
+
+    async def aprocess(self, request):
+        token = request_metrics.set(RequestMetrics())
+        buffers_token = request_buffers.set(dict())
+        start = time.perf_counter()
+        try:
+            self.logger.debug(request)
+            response = await self.get_response(request)
+            self.log_response(request, response, time.perf_counter() - start)
+        finally:
+            request_buffers.reset(buffers_token)
+            request_metrics.reset(token)
+        return response
+
+    def log_response(self, request, response, duration):
+        metrics = request_metrics.get()
+        match = request.resolver_match
+        # The route pattern rather than the path, so that all requests for
+        # e.g. different posts are counted together.
+        route = match.route if match is not None else "<unmatched>"
+        if response.streaming:
+            size = 0
+        else:
+            size = len(response.content)
+        values = {
+            "duration": duration,
+            "db_queries": metrics.db_queries,
+            "db_time": metrics.db_time,
+            "storage_calls": metrics.storage_calls,
+            "storage_time": metrics.storage_time,
+            "serializer_time": metrics.serializer_time,
+            "bytes": size,
+        }
+        stats.add(request.method, route, response.status_code, values)
+        writer.write_if_due()
+
         if response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR:
             self.logger.error(response)
         else:
             self.logger.debug(response)
+        if self.request_logger.isEnabledFor(logging.INFO):
+            line = {
+                "method": request.method,
+                "route": route,
+                "view": match.view_name if match is not None else None,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 3),
+                "db_queries": metrics.db_queries,
+                "db_ms": round(metrics.db_time * 1000, 3),
+                "storage_calls": metrics.storage_calls,
+                "storage_ms": round(metrics.storage_time * 1000, 3),
+                "serializer_ms": round(metrics.serializer_time * 1000, 3),
+                "bytes": size,
+            }
+            self.request_logger.info(json.dumps(line))
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    This middleware tells ReplicaRouter which database the current request
+    should read from, and pins users to the primary after they write.
+    """
+
+    def process(self, request):
+        safe = request.method in SAFE_METHODS
+        token = routing_state.set(RoutingState(request, use_primary=not safe))
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if not safe and response.status_code < status.HTTP_400_BAD_REQUEST:
+            user = authenticated_user(request)
+            if user is not None:
+                pin_to_primary(user.pk)
+        return response
+
+    async def aprocess(self, request):
+        safe = request.method in SAFE_METHODS
+        token = routing_state.set(RoutingState(request, use_primary=not safe))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if not safe and response.status_code < status.HTTP_400_BAD_REQUEST:
+            user = authenticated_user(request)
+            if user is not None:
+                await sync_to_async(pin_to_primary)(user.pk)
         return response
@@ -0,0 +1,44 @@
+# Generated by Django 4.1 on 2026-10-19 17:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model):
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    Post = apps.get_model("api", "Post")
+    Comment = apps.get_model("api", "Comment")
+    Photo = apps.get_model("api", "Photo")
+    Post.objects.update(comment_count=count_of(Comment), photo_count=count_of(Photo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_auto_20220806_2100"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="photo_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
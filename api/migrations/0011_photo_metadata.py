@@ -0,0 +1,38 @@
+# Generated by Django 4.1 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_post_comment_count_post_photo_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="photo",
+            name="bytes",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="format",
+            field=models.CharField(blank=True, default="", max_length=10),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="photo",
+            name="file",
+            field=models.FileField(upload_to=""),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1 on 2026-10-19 20:00
+
+from django.db import migrations, models
+
+
+def merge_duplicate_breeds(apps, schema_editor):
+    """
+    Strip the names of breeds and merge the breeds that then share a name
+    and species into the oldest one, so that the constraint can be added.
+    """
+    Breed = apps.get_model("api", "Breed")
+    Pet = apps.get_model("api", "Pet")
+    PetBreed = Pet.breed.through
+
+    kept = dict()
+    for breed in Breed.objects.order_by("pk"):
+        name = breed.name.strip()
+        original = kept.setdefault((name, breed.species), breed)
+        if original is breed:
+            if name != breed.name:
+                breed.name = name
+                breed.save(update_fields=["name"])
+            continue
+        pet_ids = PetBreed.objects.filter(breed=original).values_list("pet_id")
+        PetBreed.objects.filter(breed=breed, pet_id__in=pet_ids).delete()
+        PetBreed.objects.filter(breed=breed).update(breed=original)
+        breed.delete()
+
+
+class Migration(migrations.Migration):
+
+    # PostgreSQL cannot alter a table with pending foreign key checks in the
+    # transaction that deleted its rows, so the merge commits on its own.
+    atomic = False
+
+    dependencies = [
+        ("api", "0014_job"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_breeds, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="breed",
+            constraint=models.UniqueConstraint(
+                fields=("name", "species"), name="unique_breed_name_species"
+            ),
+        ),
+    ]
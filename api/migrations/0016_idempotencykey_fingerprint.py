@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-19 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_breed_unique_breed_name_species"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="fingerprint",
+            field=models.CharField(default="", max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="scope",
+            field=models.CharField(max_length=100),
+        ),
+    ]
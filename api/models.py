@@ -1,17 +1,33 @@
 import logging
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 
 class User(AbstractUser):
     nickname = models.CharField(max_length=100, blank=True, default="")
+    # Set when the user deletes their account. The rows are removed later
+    # by the purge_deleted command.
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return self.username
 
+    def soft_delete(self):
+        """
+        Deactivate the user, log them out everywhere and hide their posts,
+        leaving the actual deletion to the purge_deleted command.
+        """
+        with transaction.atomic():
+            self.deleted_at = timezone.now()
+            self.is_active = False
+            self.posts.alive().update(deleted_at=self.deleted_at)
+            self.auth_token_set.all().delete()
+            self.save(update_fields=["deleted_at", "is_active"])
+
 
 class UserAddress(models.Model):
     user = models.ForeignKey("User", related_name="address", on_delete=models.CASCADE)
@@ -40,6 +56,13 @@ class Breed(models.Model):
     name = models.CharField(max_length=50)
     species = models.CharField(max_length=50, choices=Species.choices)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "species"], name="unique_breed_name_species"
+            )
+        ]
+
 
 class Color(models.Model):
     name = models.CharField(max_length=50)
@@ -61,6 +84,12 @@ class Pet(models.Model):
     microchip = models.CharField(max_length=15, blank=True, default="")
 
 
+class PostQuerySet(models.QuerySet):
+    def alive(self):
+        """Exclude posts that were soft deleted."""
+        return self.filter(deleted_at__isnull=True)
+
+
 class Post(models.Model):
     class Status(models.TextChoices):
         LOST = "lost"
@@ -75,11 +104,82 @@ class Post(models.Model):
     pet = models.ForeignKey("Pet", related_name="posts", on_delete=models.CASCADE)
     user = models.ForeignKey("User", related_name="posts", on_delete=models.CASCADE)
 
+    # Denormalized counters kept up to date by the signal handlers in
+    # api.signals. Use the reconcile_post_counts command to repair drift.
+    comment_count = models.PositiveIntegerField(default=0)
+    photo_count = models.PositiveIntegerField(default=0)
+
+    # Set when the post is deleted. Deleted posts are hidden with
+    # Post.objects.alive() and removed later by the purge_deleted command.
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = PostQuerySet.as_manager()
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+
 
 class Photo(models.Model):
     order = models.IntegerField()
     post = models.ForeignKey("Post", related_name="photos", on_delete=models.CASCADE)
-    file = models.ImageField()
+    # A FileField rather than an ImageField, so that Django does not open
+    # every image again. Uploads are validated by api.images.read_image,
+    # which also fills in the metadata below. Photos uploaded directly to
+    # storage have no width and height.
+    file = models.FileField()
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    format = models.CharField(max_length=10, blank=True, default="")
+    bytes = models.PositiveIntegerField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        # Keep the insert and the post_save counter update in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread(self, post_id, offset=0, limit=20, max_depth=5):
+        """
+        Return a page of top-level comments for a post together with all of
+        their replies (up to max_depth levels deep) using a single recursive
+        query. Each comment is annotated with its depth and the username of
+        its author. Comments of users who deleted their account keep their
+        place in the thread, without author or content. Results are ordered
+        so that parents always come before their replies.
+        """
+        comment_table = self.model._meta.db_table
+        user_table = User._meta.db_table
+        sql = f"""
+            WITH RECURSIVE thread AS (
+                SELECT c.id, c.user_id, c.post_id, c.reply_to_id, c.content,
+                       0 AS depth
+                FROM {comment_table} c
+                WHERE c.id IN (
+                    SELECT id FROM {comment_table}
+                    WHERE post_id = %s AND reply_to_id IS NULL
+                    ORDER BY id
+                    LIMIT %s OFFSET %s
+                )
+                UNION ALL
+                SELECT c.id, c.user_id, c.post_id, c.reply_to_id, c.content,
+                       t.depth + 1
+                FROM {comment_table} c
+                INNER JOIN thread t ON c.reply_to_id = t.id
+                WHERE t.depth < %s
+            )
+            SELECT thread.id, thread.user_id, thread.post_id,
+                   thread.reply_to_id, thread.depth,
+                   CASE WHEN u.deleted_at IS NULL THEN thread.content
+                        ELSE '' END AS content,
+                   CASE WHEN u.deleted_at IS NULL THEN u.username
+                        ELSE NULL END AS username
+            FROM thread
+            INNER JOIN {user_table} u ON u.id = thread.user_id
+            ORDER BY thread.depth, thread.id
+        """
+        return self.raw(sql, [post_id, limit, offset, max_depth])
 
 
 class Comment(models.Model):
@@ -89,3 +189,65 @@ class Comment(models.Model):
         "self", on_delete=models.CASCADE, blank=True, null=True
     )
     content = models.CharField(max_length=2000)
+
+    objects = CommentQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Keep the insert and the post_save counter update in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a request made with an Idempotency-Key header,
+    so that retries of the request get the same response without running
+    it again. A record without a status code belongs to a request that is
+    still in progress. See api.idempotency.
+    """
+
+    key = models.CharField(max_length=255)
+    # "user:<pk>" for authenticated requests. For anonymous requests
+    # "anonymous:" and a hash of the client address and the fingerprint.
+    scope = models.CharField(max_length=100)
+    path = models.CharField(max_length=200)
+    # Keyed hash of the method, path and data of the request, without
+    # passwords, see api.idempotency.fingerprint().
+    fingerprint = models.CharField(max_length=64, default="")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "path", "key"], name="unique_idempotency_key"
+            )
+        ]
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work, run outside of the request by the workers of
+    the run_worker command. See api.jobs.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        FAILED = "failed"
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
@@ -1,32 +1,114 @@
 import json
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http.multipartparser import (
+    MultiPartParser as DjangoMultiPartParser,
+    MultiPartParserError,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
 from rest_framework.parsers import MultiPartParser, DataAndFiles
 
 
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request is too large."
+    default_code = "request_too_large"
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """
+    Upload handler that enforces the limits of settings.MULTIPART_UPLOADS
+    while the request is streamed. It must come before the handlers that
+    store the files. When a limit is exceeded, parsing stops right away and
+    the reason is kept in self.error.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.limits = settings.MULTIPART_UPLOADS
+        self.file_count = 0
+        self.total_size = 0
+        self.error = None
+
+    def stop(self, error):
+        self.error = error
+        # Stop reading the request instead of draining the rest of it.
+        raise StopUpload(connection_reset=True)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file_count += 1
+        if self.file_count > self.limits["MAX_FILE_COUNT"]:
+            self.stop(f"At most {self.limits['MAX_FILE_COUNT']} files can be uploaded.")
+
+    def receive_data_chunk(self, raw_data, start):
+        self.total_size += len(raw_data)
+        if start + len(raw_data) > self.limits["MAX_FILE_SIZE"]:
+            self.stop(
+                f"'{self.file_name}' is larger than {self.limits['MAX_FILE_SIZE']} bytes."
+            )
+        if self.total_size > self.limits["MAX_TOTAL_SIZE"]:
+            self.stop(f"Files are larger than {self.limits['MAX_TOTAL_SIZE']} bytes.")
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
 class MultiPartJSONParser(MultiPartParser):
     """
     Parser for multipart form data that has json.
+
+    File parts are streamed to temporary files within the limits of
+    settings.MULTIPART_UPLOADS. Fields listed in the json_fields attribute
+    of the view are decoded as json, and all other fields are left as
+    strings. Files are returned as lists, so that fields with several files
+    keep all of them.
     """
 
     def parse(self, stream, media_type=None, parser_context=None):
-        result = super().parse(
-            stream,
-            media_type=media_type,
-            parser_context=parser_context,
-        )
-
-        data = dict()
-
-        # If a value seems to be a json string, try
-        # to parse it accordingly.
-        for key, value in result.data.items():
-            if not isinstance(value, str):
-                data[key] = value
-            elif "[" in value or "{" in value:
-                try:
-                    data[key] = json.loads(value)
-                except ValueError:
-                    data[key] = value
-            else:
-                data[key] = value
-
-        return DataAndFiles(data, result.files)
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        view = parser_context.get("view", None)
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+
+        # Reject requests that declare a body over the limit before reading it.
+        try:
+            content_length = int(meta.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > settings.MULTIPART_UPLOADS["MAX_TOTAL_SIZE"]:
+            raise RequestTooLarge()
+
+        limiter = LimitedUploadHandler(request)
+        upload_handlers = [limiter, TemporaryFileUploadHandler(request)]
+        try:
+            parser = DjangoMultiPartParser(meta, stream, upload_handlers, encoding)
+            query_dict, multi_value_files = parser.parse()
+        except MultiPartParserError as exc:
+            raise ParseError("Multipart form parse error - %s" % str(exc))
+
+        if limiter.error is not None:
+            for _, files in multi_value_files.lists():
+                for file in files:
+                    file.close()
+            raise RequestTooLarge(limiter.error)
+
+        data = query_dict.dict()
+        for key in getattr(view, "json_fields", []):
+            if key not in data:
+                continue
+            try:
+                data[key] = json.loads(data[key])
+            except ValueError:
+                raise ParseError(f"Field '{key}' must be valid json.")
+
+        files = {key: multi_value_files.getlist(key) for key in multi_value_files}
+        return DataAndFiles(data, files)
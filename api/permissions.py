@@ -1,4 +1,7 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
 
 
 class IsOwnerOrReadOnly(BasePermission):
@@ -13,3 +16,20 @@ class IsSameUser(BasePermission):
     def has_object_permission(self, request, view, obj):
         # obj must be a User instance.
         return obj == request.user
+
+
+class IsMetricsClient(BasePermission):
+    """
+    Allows scrapers that send METRICS["TOKEN"] as a bearer token, or, when
+    no token is set, scrapers at one of METRICS["ALLOWED_IPS"]. Addresses
+    are resolved through REST_FRAMEWORK["NUM_PROXIES"] like throttling does,
+    but behind a reverse proxy a token should be set.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS["TOKEN"]
+        if token:
+            return constant_time_compare(
+                request.headers.get("Authorization", ""), f"Bearer {token}"
+            )
+        return BaseThrottle().get_ident(request) in settings.METRICS["ALLOWED_IPS"]
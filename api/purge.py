@@ -0,0 +1,101 @@
+"""
+Removal of soft-deleted posts and users.
+
+Deleting a post or a user only marks it as deleted (see Post.soft_delete
+and User.soft_delete), so that requests do not have to cascade through
+every related row. The functions here delete the marked rows in batches
+once settings.SOFT_DELETE["PURGE_AFTER"] seconds have passed, together
+with the photo files in storage. They run in the purge_post and purge_user
+jobs queued on deletion, and in the purge_deleted command.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Pet, Photo, Post, User
+
+logger = logging.getLogger(__name__)
+
+
+def purge_cutoff():
+    """Return the deletion time before which deleted rows are purged."""
+    return timezone.now() - timedelta(seconds=settings.SOFT_DELETE["PURGE_AFTER"])
+
+
+def purge_time(deleted_at):
+    """Return the time at which a row deleted at deleted_at is purged."""
+    return deleted_at + timedelta(seconds=settings.SOFT_DELETE["PURGE_AFTER"])
+
+
+def delete_files(names):
+    """Delete photo files from storage, logging the ones that remain."""
+    failed = default_storage.delete_many([name for name in names if name])
+    if failed:
+        logger.error(
+            f"{len(failed)} file(s) could not be deleted. "
+            "They will be found by the scan_orphaned_photos command."
+        )
+
+
+def purge_posts(pks) -> int:
+    """
+    Delete posts with their pets, photos and comments, and then the photo
+    files. Rows are deleted first, so that a failure in storage can only
+    leave orphaned files behind and never posts with missing photos.
+    """
+    with transaction.atomic():
+        names = list(Photo.objects.filter(post__in=pks).values_list("file", flat=True))
+        pet_ids = list(Post.objects.filter(pk__in=pks).values_list("pet", flat=True))
+        Post.objects.filter(pk__in=pks).delete()
+        # A pet only exists for its posts.
+        Pet.objects.filter(pk__in=pet_ids, posts__isnull=True).delete()
+    delete_files(names)
+    return len(pks)
+
+
+def purge_users(pks) -> int:
+    """Delete users, along with their comments, addresses and any posts left."""
+    posts = list(Post.objects.filter(user__in=pks).values_list("pk", flat=True))
+    if posts:
+        purge_posts(posts)
+    with transaction.atomic():
+        User.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def batches(queryset, batch_size):
+    """Yield lists of up to batch_size primary keys from queryset."""
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        last_pk = pks[-1]
+        yield pks
+
+
+def purge_deleted(batch_size=None):
+    """
+    Purge the posts and users that were deleted before purge_cutoff(), and
+    return the numbers of purged posts and users.
+    """
+    batch_size = batch_size or settings.SOFT_DELETE["BATCH_SIZE"]
+    cutoff = purge_cutoff()
+    posts = sum(
+        purge_posts(pks)
+        for pks in batches(Post.objects.filter(deleted_at__lt=cutoff), batch_size)
+    )
+    users = sum(
+        purge_users(pks)
+        for pks in batches(User.objects.filter(deleted_at__lt=cutoff), batch_size)
+    )
+    return posts, users
@@ -0,0 +1,130 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+from django.utils.functional import LazyObject, empty
+
+logger = logging.getLogger(__name__)
+
+# Routing state of the request being handled, set by ReplicaRoutingMiddleware.
+routing_state = ContextVar("routing_state", default=None)
+
+# Replica alias -> time.monotonic() value until which it is considered down.
+unhealthy_until = dict()
+
+# Replica connection -> time.monotonic() value of its last health check.
+# Connections are per thread, so they are checked one by one.
+checked_at = WeakKeyDictionary()
+
+
+class RoutingState:
+    def __init__(self, request, use_primary=False):
+        self.request = request
+        self.use_primary = use_primary
+        self.pin_checked = False
+
+
+def pin_key(user_id) -> str:
+    return f"db-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Send the reads of a user to the primary for the next few seconds."""
+    cache.set(pin_key(user_id), True, settings.REPLICA_ROUTING["STICKY_SECONDS"])
+
+
+def authenticated_user(request):
+    """
+    Return the authenticated user of a request, or None if the user is
+    anonymous or has not been resolved yet. This never triggers a lazy
+    session lookup, since that lookup would be routed here again.
+    """
+    user = request.__dict__.get("user")
+    if isinstance(user, LazyObject) and user._wrapped is empty:
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+    return user
+
+
+def replica_is_healthy(alias) -> bool:
+    """
+    Return True if a connection to the replica can be used. An open
+    connection is checked again every REPLICA_ROUTING["CHECK_SECONDS"], and
+    replaced when it is broken. A replica that fails to connect is skipped
+    for REPLICA_ROUTING["RETRY_SECONDS"].
+    """
+    now = time.monotonic()
+    if unhealthy_until.get(alias, 0) > now:
+        return False
+    connection = connections[alias]
+    last_check = checked_at.get(connection, 0)
+    if connection.connection is not None and (
+        now - last_check < settings.REPLICA_ROUTING["CHECK_SECONDS"]
+    ):
+        return True
+    try:
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+        connection.ensure_connection()
+    except OperationalError as exc:
+        logger.warning("Replica %s is unavailable: %s", alias, exc)
+        unhealthy_until[alias] = now + settings.REPLICA_ROUTING["RETRY_SECONDS"]
+        return False
+    checked_at[connection] = now
+    return True
+
+
+class ReplicaRouter:
+    """
+    A database router that sends reads of safe requests to a random healthy
+    replica in DATABASE_REPLICAS and everything else to the primary.
+
+    Reads go to the primary when the current request is not safe, when the
+    authenticated user made a write in the last few seconds (so that users
+    always read their own writes), when the model is listed in
+    REPLICA_ROUTING["PRIMARY_MODELS"] or when no replica is healthy.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or self.use_primary(model):
+            return DEFAULT_DB_ALIAS
+
+        healthy = [alias for alias in replicas if replica_is_healthy(alias)]
+        if not healthy:
+            return DEFAULT_DB_ALIAS
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+    def use_primary(self, model) -> bool:
+        if model._meta.label in settings.REPLICA_ROUTING["PRIMARY_MODELS"]:
+            return True
+
+        state = routing_state.get()
+        if state is None:
+            # Outside of a request, e.g. in management commands.
+            return True
+        if state.use_primary or state.pin_checked:
+            return state.use_primary
+
+        user = authenticated_user(state.request)
+        if user is not None:
+            state.pin_checked = True
+            state.use_primary = cache.get(pin_key(user.pk), False)
+        return state.use_primary
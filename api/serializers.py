@@ -1,16 +1,47 @@
+from functools import lru_cache
 from typing import Mapping
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from rest_framework.fields import empty
 from rest_framework.serializers import (
     Serializer,
     ModelSerializer,
     ValidationError,
     CharField,
+    ChoiceField,
+    IntegerField,
+    ListSerializer,
+    PrimaryKeyRelatedField,
+    SerializerMethodField,
     StringRelatedField,
 )
 
-from api.models import Breed, Pet, Photo, User, Post
+from api.images import read_image
+from api.instrumentation import serializer_timer
+from api.models import Breed, Comment, Pet, Photo, User, Post
+from api.tasks import process_uploaded_photo
 from api.validators import PasswordLengthValidator
 
 
+class TimedSerializerMixin:
+    """
+    Mixin for serializers used by views, that adds the time spent validating
+    and representing data to the metrics of the current request (see
+    api.instrumentation). Nested serializers are included in the time of
+    their parent.
+    """
+
+    def run_validation(self, data=empty):
+        with serializer_timer():
+            return super().run_validation(data)
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
 class PhotoSerializer(ModelSerializer):
     """
     Serializer class for pet photos. This is only used inside PostSerializer
@@ -19,13 +50,104 @@ class PhotoSerializer(ModelSerializer):
 
     class Meta:
         model = Photo
-        fields = ["order", "file"]
+        fields = ["order", "file", "width", "height", "format", "bytes"]
+        read_only_fields = ["width", "height", "format", "bytes"]
 
     def validate(self, data):
         if hasattr(self, "initial_data"):
             raise_if_unknown_fields(self.initial_data, PhotoSerializer)
+        try:
+            data["file"], metadata = read_image(data["file"])
+        except DjangoValidationError as exc:
+            raise ValidationError({"file": exc.messages})
+        data.update(metadata)
+        return data
+
+
+class UploadedPhotoSerializer(Serializer):
+    """
+    Serializer class for photos that a client uploaded directly to storage
+    with a presigned upload. Only used inside CreatePostSerializer, which
+    must be given the uploading user in its context.
+    """
+
+    order = IntegerField()
+    key = CharField(max_length=100)
+
+    def validate_key(self, key):
+        user = self.root.context.get("user", None)
+        if user is None or not key.startswith(upload_prefix(user)):
+            raise ValidationError("Unknown upload key.")
+        # BulkCreatePostSerializer looks up the keys of all posts at once.
+        used_keys = getattr(self.root, "used_keys", None)
+        if used_keys is None:
+            used = Photo.objects.filter(file=key).exists()
+        else:
+            used = key in used_keys
+        if used:
+            raise ValidationError("Upload key has already been used.")
+        return key
+
+    def validate(self, data):
+        if hasattr(self, "initial_data"):
+            raise_if_unknown_fields(self.initial_data, UploadedPhotoSerializer)
+
+        upload_metadata = getattr(self.root, "upload_metadata", dict())
+        if data["key"] in upload_metadata:
+            metadata = upload_metadata[data["key"]]
+        else:
+            metadata = default_storage.metadata(data["key"])
+        if metadata is None:
+            raise ValidationError({"key": "File has not been uploaded."})
+        if metadata["size"] > settings.PHOTO_UPLOADS["MAX_SIZE"]:
+            raise ValidationError({"key": "File is too large."})
+        content_type = metadata["content_type"]
+        if content_type not in settings.PHOTO_UPLOADS["CONTENT_TYPES"]:
+            raise ValidationError({"key": "File type is not supported."})
+        # The image itself is not downloaded, so its dimensions are unknown.
+        data["bytes"] = metadata["size"]
+        data["format"] = content_type.split("/")[1].upper()
         return data
 
+    class Meta:
+        fields = ["order", "key"]
+
+
+class PhotoUploadSerializer(Serializer):
+    """Serializer class for requesting a presigned photo upload."""
+
+    content_type = ChoiceField(choices=settings.PHOTO_UPLOADS["CONTENT_TYPES"])
+
+
+class PhotoUploadsSerializer(TimedSerializerMixin, Serializer):
+    """Serializer class for requesting presigned uploads for several photos."""
+
+    photos = PhotoUploadSerializer(many=True, allow_empty=False)
+
+    def validate_photos(self, photos):
+        if len(photos) > settings.PHOTO_UPLOADS["MAX_COUNT"]:
+            raise ValidationError(
+                f"At most {settings.PHOTO_UPLOADS['MAX_COUNT']} photos can be uploaded."
+            )
+        return photos
+
+
+class BatchPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """
+    A PrimaryKeyRelatedField that takes objects from the instances that a
+    BulkCreatePostSerializer fetched once for all of its posts, instead of
+    querying them one at a time.
+    """
+
+    def to_internal_value(self, data):
+        instances = getattr(self.root, "instances", dict()).get(self.queryset.model)
+        if instances is None or not str(data).isdigit():
+            return super().to_internal_value(data)
+        try:
+            return instances[str(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+
 
 class PetSerializer(ModelSerializer):
     """
@@ -33,6 +155,8 @@ class PetSerializer(ModelSerializer):
     and not meant to be directly used by a view.
     """
 
+    serializer_related_field = BatchPrimaryKeyRelatedField
+
     class Meta:
         model = Pet
         fields = [
@@ -60,9 +184,10 @@ class PetSerializer(ModelSerializer):
         return data
 
 
-class PostSerializer(ModelSerializer):
+class PostSerializer(TimedSerializerMixin, ModelSerializer):
     """
-    Serializer class for reading/updating a post.
+    Serializer class for reading/updating a post. Cached posts are read
+    with read_posts() instead, which must return the same representation.
     """
 
     pet = PetSerializer(read_only=True)
@@ -80,8 +205,14 @@ class PostSerializer(ModelSerializer):
             "pet",
             "photos",
             "user",
+            "comment_count",
+            "photo_count",
         ]
-        extra_kwargs = {"likes": {"read_only": True}}
+        extra_kwargs = {
+            "likes": {"read_only": True},
+            "comment_count": {"read_only": True},
+            "photo_count": {"read_only": True},
+        }
 
     def create(self, validated_data):
         raise NotImplementedError(
@@ -94,13 +225,238 @@ class PostSerializer(ModelSerializer):
         return data
 
 
-class CreatePostSerializer(ModelSerializer):
+PET_M2M_FIELDS = ["breed", "eye_colors", "coat_colors"]
+
+
+@lru_cache(maxsize=None)
+def coordinate_fields() -> tuple:
+    """Return the fields of PostSerializer that format the coordinates."""
+    fields = PostSerializer().fields
+    return fields["location_lat"], fields["location_long"]
+
+
+def read_posts(queryset) -> dict:
+    """
+    Return the representation of PostSerializer of every post in queryset,
+    keyed by primary key. The posts with their pets, the pet relations and
+    the photos are read as .values() rows with one query each and turned
+    into dicts directly, which is several times faster than model instances
+    and serializer fields for many posts. All queries go to the database of
+    queryset. Keep it in sync with
+    PostSerializer, PetSerializer and PhotoSerializer; the tests compare them.
+    """
+    with serializer_timer():
+        post_fields = [
+            field
+            for field in PostSerializer.Meta.fields
+            if field not in ("pet", "photos", "user")
+        ]
+        pet_fields = [
+            field for field in PetSerializer.Meta.fields if field not in PET_M2M_FIELDS
+        ]
+        posts = {
+            row.pop("pk"): row
+            for row in queryset.values(
+                "pk",
+                "user__username",
+                *post_fields,
+                *[f"pet__{field}" for field in pet_fields],
+            )
+        }
+        if not posts:
+            return dict()
+
+        pets = {
+            row["pet__id"]: {field: row[f"pet__{field}"] for field in pet_fields}
+            for row in posts.values()
+        }
+        for field in PET_M2M_FIELDS:
+            for pet in pets.values():
+                pet[field] = []
+            descriptor = getattr(Pet, field)
+            target = descriptor.field.m2m_reverse_field_name()
+            for pet_id, pk in (
+                descriptor.through.objects.using(queryset.db)
+                .filter(pet_id__in=pets)
+                .order_by("pk")
+                .values_list("pet_id", f"{target}_id")
+            ):
+                pets[pet_id][field].append(pk)
+
+        photos = {pk: [] for pk in posts}
+        storage = Photo._meta.get_field("file").storage
+        for row in (
+            Photo.objects.using(queryset.db)
+            .filter(post_id__in=posts)
+            .order_by("pk")
+            .values("post_id", *PhotoSerializer.Meta.fields)
+        ):
+            row["file"] = storage.url(row["file"]) if row["file"] else None
+            photos[row.pop("post_id")].append(row)
+
+        lat_field, long_field = coordinate_fields()
+        representations = dict()
+        for pk, row in posts.items():
+            pet = pets[row["pet__id"]]
+            row["location_lat"] = lat_field.to_representation(row["location_lat"])
+            row["location_long"] = long_field.to_representation(row["location_long"])
+            row["pet"] = {field: pet[field] for field in PetSerializer.Meta.fields}
+            row["photos"] = photos[pk]
+            # A StringRelatedField, and str() of a user is its username.
+            row["user"] = row["user__username"]
+            representations[pk] = {
+                field: row[field] for field in PostSerializer.Meta.fields
+            }
+        return representations
+
+
+class BulkCreatePostSerializer(ListSerializer):
+    """
+    List serializer for CreatePostSerializer that creates all posts with one
+    bulk insert per table in a single transaction. Signal handlers do not
+    run for bulk inserts, so the photo counts are set directly.
+
+    Posts are validated one by one, and only the valid ones are created.
+    The errors of every post, or None, are kept in item_errors.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise ValidationError(
+                {"non_field_errors": ["Expected a list of posts."]}, code="not_a_list"
+            )
+        self.prefetch(data)
+        validated, self.item_errors = [], []
+        seen_keys = set()
+        for item in data:
+            # Lets CreatePostSerializer.validate() check for unknown fields.
+            self.child.initial_data = item
+            try:
+                value = self.child.run_validation(item)
+                keys = {photo["key"] for photo in value.get("uploaded_photos", [])}
+                if not seen_keys.isdisjoint(keys):
+                    raise ValidationError(
+                        {"uploaded_photos": ["Upload key has already been used."]}
+                    )
+                seen_keys |= keys
+            except ValidationError as exc:
+                self.item_errors.append(exc.detail)
+            else:
+                validated.append(value)
+                self.item_errors.append(None)
+        del self.child.initial_data
+        if not validated:
+            raise ValidationError(self.item_errors)
+        return validated
+
+    def prefetch(self, data):
+        """
+        Fetch the breeds and colors, the photos of used upload keys and the
+        metadata of the uploads that the posts in data refer to, with one
+        query per table and one storage call, for the validation of all
+        posts. Malformed values are skipped, and fail validation later.
+        """
+        pks = {
+            Pet._meta.get_field(field).related_model: set() for field in PET_M2M_FIELDS
+        }
+        keys = set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            pet = item.get("pet")
+            for field in PET_M2M_FIELDS:
+                values = pet.get(field) if isinstance(pet, dict) else None
+                if isinstance(values, list):
+                    model = Pet._meta.get_field(field).related_model
+                    pks[model].update(
+                        str(value) for value in values if str(value).isdigit()
+                    )
+            photos = item.get("uploaded_photos")
+            if isinstance(photos, list):
+                keys.update(
+                    photo["key"]
+                    for photo in photos
+                    if isinstance(photo, dict) and isinstance(photo.get("key"), str)
+                )
+
+        self.instances = {
+            model: (
+                {str(obj.pk): obj for obj in model.objects.filter(pk__in=model_pks)}
+                if model_pks
+                else dict()
+            )
+            for model, model_pks in pks.items()
+        }
+        self.used_keys = set(
+            Photo.objects.filter(file__in=keys).values_list("file", flat=True)
+        )
+        user = self.context.get("user", None)
+        prefix = upload_prefix(user) if user is not None else None
+        self.upload_metadata = default_storage.metadata_many(
+            key for key in keys if prefix is not None and key.startswith(prefix)
+        )
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context.get("user", None)
+        m2m_fields = ["breed", "eye_colors", "coat_colors"]
+
+        pets, posts, relations, photos = [], [], [], []
+        for data in validated_data:
+            data = dict(data)
+            pet_data = dict(data.pop("pet"))
+            relations.append({field: pet_data.pop(field, []) for field in m2m_fields})
+            post_photos = data.pop("photos", [])
+            uploaded_photos = data.pop("uploaded_photos", [])
+
+            pet = Pet(**pet_data)
+            post = Post(
+                pet=pet,
+                user=user,
+                photo_count=len(post_photos) + len(uploaded_photos),
+                **data,
+            )
+            pets.append(pet)
+            posts.append(post)
+            photos += [Photo(post=post, **photo_data) for photo_data in post_photos]
+            photos += [
+                Photo(
+                    post=post,
+                    order=photo_data["order"],
+                    file=photo_data["key"],
+                    format=photo_data["format"],
+                    bytes=photo_data["bytes"],
+                )
+                for photo_data in uploaded_photos
+            ]
+
+        Pet.objects.bulk_create(pets)
+        Post.objects.bulk_create(posts)
+        for field in m2m_fields:
+            descriptor = getattr(Pet, field)
+            target = descriptor.field.m2m_reverse_field_name()
+            descriptor.through.objects.bulk_create(
+                descriptor.through(pet=pet, **{target: obj})
+                for pet, pet_relations in zip(pets, relations)
+                for obj in pet_relations[field]
+            )
+        Photo.objects.bulk_create(photos)
+        process_uploaded_photo.delay_many(
+            {"photo_id": photo.pk} for photo in photos if not photo.width
+        )
+        return posts
+
+
+class CreatePostSerializer(TimedSerializerMixin, ModelSerializer):
     """
     Serializer class for creating a new post.
     """
 
     pet = PetSerializer()
     photos = PhotoSerializer(many=True, required=False)
+    uploaded_photos = UploadedPhotoSerializer(
+        many=True, required=False, write_only=True
+    )
 
     class Meta:
         model = Post
@@ -111,19 +467,38 @@ class CreatePostSerializer(ModelSerializer):
             "status",
             "pet",
             "photos",
+            "uploaded_photos",
         ]
+        list_serializer_class = BulkCreatePostSerializer
 
+    @transaction.atomic
     def create(self, validated_data):
         pet_data = validated_data.pop("pet")
         breeds = pet_data.pop("breed", [])
+        eye_colors = pet_data.pop("eye_colors", [])
+        coat_colors = pet_data.pop("coat_colors", [])
         photos = validated_data.pop("photos", [])
+        uploaded_photos = validated_data.pop("uploaded_photos", [])
         user = self.context.get("user", None)
 
         pet = Pet.objects.create(**pet_data)
         pet.breed.set(breeds)
+        pet.eye_colors.set(eye_colors)
+        pet.coat_colors.set(coat_colors)
         post = Post.objects.create(pet=pet, user=user, **validated_data)
         for photo_data in photos:
             Photo.objects.create(post=post, **photo_data)
+        for photo_data in uploaded_photos:
+            # The file is already in storage, so only its name is saved and
+            # the image is read later by a job.
+            photo = Photo.objects.create(
+                post=post,
+                order=photo_data["order"],
+                file=photo_data["key"],
+                format=photo_data["format"],
+                bytes=photo_data["bytes"],
+            )
+            process_uploaded_photo.delay(photo_id=photo.pk)
         return post
 
     def update(self, instance, validated_data):
@@ -131,14 +506,25 @@ class CreatePostSerializer(ModelSerializer):
             "CreatePostSerializer cannot be used to update posts. Please use PostSerializer."
         )
 
+    def validate_uploaded_photos(self, photos):
+        # Multipart photos are limited by MultiPartJSONParser instead.
+        if len(photos) > settings.PHOTO_UPLOADS["MAX_COUNT"]:
+            raise ValidationError(
+                f"At most {settings.PHOTO_UPLOADS['MAX_COUNT']} photos can be added."
+            )
+        keys = [photo["key"] for photo in photos]
+        if len(set(keys)) < len(keys):
+            raise ValidationError("Upload keys must not be repeated.")
+        return photos
+
     def validate(self, data):
         if hasattr(self, "initial_data"):
             raise_if_unknown_fields(self.initial_data, CreatePostSerializer)
         return data
 
 
-class UserSerializer(ModelSerializer):
-    posts = PostSerializer(many=True, read_only=True)
+class UserSerializer(TimedSerializerMixin, ModelSerializer):
+    posts = SerializerMethodField()
     """
     Serializer class for reading and updating users.
     """
@@ -147,6 +533,10 @@ class UserSerializer(ModelSerializer):
         model = User
         fields = ["username", "nickname", "posts"]
 
+    def get_posts(self, user):
+        # Soft deleted posts are hidden like everywhere else.
+        return PostSerializer(user.posts.alive(), many=True).data
+
     def create(self, validated_data):
         raise NotImplementedError(
             "UserSerializer cannot be used to create new users. Please use RegisterUserSerializer."
@@ -158,7 +548,19 @@ class UserSerializer(ModelSerializer):
         return data
 
 
-class RegisterUserSerializer(ModelSerializer):
+class LoginUserSerializer(TimedSerializerMixin, ModelSerializer):
+    """
+    Serializer class for the user returned by LoginView, without the posts
+    of UserSerializer.
+    """
+
+    class Meta:
+        model = User
+        fields = ["username", "nickname"]
+        read_only_fields = fields
+
+
+class RegisterUserSerializer(TimedSerializerMixin, ModelSerializer):
     """Serializer class for registering new users."""
 
     password = CharField(
@@ -185,7 +587,7 @@ class RegisterUserSerializer(ModelSerializer):
         return data
 
 
-class ChangePasswordSerializer(Serializer):
+class ChangePasswordSerializer(TimedSerializerMixin, Serializer):
     """Serializer class for changing a user's password."""
 
     old_password = CharField(max_length=128)
@@ -207,14 +609,57 @@ class ChangePasswordSerializer(Serializer):
             raise ValidationError("Incorrect password.")
 
 
-class BreedSerializer(ModelSerializer):
+class BreedSerializer(TimedSerializerMixin, ModelSerializer):
     class Meta:
         model = Breed
         fields = ["id", "name", "species"]
 
 
+class CommentSerializer(TimedSerializerMixin, ModelSerializer):
+    """
+    Serializer class for reading a single comment row returned by
+    Comment.objects.thread(). Replies are attached by build_comment_tree().
+    """
+
+    user = CharField(source="username", read_only=True)
+    depth = IntegerField(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ["id", "user", "reply_to", "depth", "content"]
+
+
+def build_comment_tree(comments) -> list:
+    """
+    Build a nested list of serialized comments from a flat iterable of
+    comments in which every parent comes before its replies. Runs in O(n).
+    """
+    roots = []
+    nodes = dict()
+    for data in CommentSerializer(comments, many=True).data:
+        node = {**data, "replies": []}
+        nodes[node["id"]] = node
+        parent = nodes.get(node["reply_to"])
+        if parent is None:
+            roots.append(node)
+        else:
+            parent["replies"].append(node)
+    return roots
+
+
+def upload_prefix(user) -> str:
+    """Return the storage prefix under which a user's direct uploads are stored."""
+    return f"uploads/{user.pk}/"
+
+
+@lru_cache(maxsize=None)
+def allowed_fields(serializer_cls) -> frozenset:
+    """Return the fields of a serializer class, computed once per class."""
+    return frozenset(serializer_cls.Meta.fields)
+
+
 def raise_if_unknown_fields(data: Mapping, serializer_cls: ModelSerializer):
     """Raises a ValidationError if data has fields that do not belong in the ModelSerializer class."""
-    unknown_fields = set(data.keys()) - set(serializer_cls.Meta.fields)
+    unknown_fields = data.keys() - allowed_fields(serializer_cls)
     if unknown_fields:
         raise ValidationError(f"Invalid field(s): {unknown_fields}")
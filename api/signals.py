@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.cache import invalidate_breeds, invalidate_posts
+from api.models import Breed, Comment, Pet, Photo, Post, User
+
+
+def deleted_with_post(origin) -> bool:
+    """
+    Return True if a delete that started at origin also deletes the post of
+    every collected object, in which case there is no counter left to update.
+    """
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, (Post, Pet))
+    return isinstance(origin, (Post, Pet))
+
+
+def invalidate_posts_on_commit(pks):
+    """
+    Remove the cached posts once the current transaction commits, so that no
+    request can cache them again from the data from before the commit. The
+    primary keys are collected right away, while the posts still exist.
+    """
+    pks = list(pks)
+    transaction.on_commit(lambda: invalidate_posts(pks))
+
+
+def increment(post_id, field):
+    Post.objects.filter(pk=post_id).update(**{field: F(field) + 1})
+    invalidate_posts_on_commit([post_id])
+
+
+def decrement(post_id, field):
+    Post.objects.filter(pk=post_id, **{f"{field}__gt": 0}).update(
+        **{field: F(field) - 1}
+    )
+    invalidate_posts_on_commit([post_id])
+
+
+def invalidate_pet_posts(pet_ids):
+    invalidate_posts_on_commit(
+        Post.objects.filter(pet__in=pet_ids).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        increment(instance.post_id, "comment_count")
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_post(origin):
+        decrement(instance.post_id, "comment_count")
+
+
+@receiver(post_save, sender=Photo)
+def photo_saved(sender, instance, created, **kwargs):
+    if created:
+        increment(instance.post_id, "photo_count")
+    else:
+        invalidate_posts_on_commit([instance.post_id])
+
+
+@receiver(post_delete, sender=Photo)
+def photo_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_post(origin):
+        decrement(instance.post_id, "photo_count")
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    invalidate_posts_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Breed)
+@receiver(post_delete, sender=Breed)
+def breed_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_breeds)
+
+
+@receiver(post_save, sender=Pet)
+@receiver(pre_delete, sender=Pet)
+def pet_changed(sender, instance, **kwargs):
+    invalidate_pet_posts([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Posts are serialized with the username of their author, and are
+    # hidden when the author is deleted.
+    if created or (
+        update_fields and not {"username", "deleted_at"} & set(update_fields)
+    ):
+        return
+    invalidate_posts_on_commit(instance.posts.values_list("pk", flat=True))
+
+
+PET_M2M_FIELDS = {
+    Pet.breed.through: "breed",
+    Pet.eye_colors.through: "eye_colors",
+    Pet.coat_colors.through: "coat_colors",
+}
+
+
+@receiver(m2m_changed, sender=Pet.breed.through)
+@receiver(m2m_changed, sender=Pet.eye_colors.through)
+@receiver(m2m_changed, sender=Pet.coat_colors.through)
+def pet_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_pet_posts([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        # instance is a Breed or Color and pk_set holds pet ids.
+        invalidate_pet_posts(pk_set)
+    elif action == "pre_clear":
+        field = PET_M2M_FIELDS[sender]
+        invalidate_pet_posts(Pet.objects.filter(**{field: instance}))
@@ -1,28 +1,70 @@
 import mimetypes
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urljoin
 from uuid import uuid4
 
 from boto3.session import Session
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from django.conf import settings
-from django.core.files.storage import Storage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
 from django.utils.deconstruct import deconstructible
+from django.utils.functional import SimpleLazyObject
 
+from api.instrumentation import timed_storage_call
 
-aws = Session(
-    aws_access_key_id=settings.S3_STORAGE["AWS_ACCESS_KEY"],
-    aws_secret_access_key=settings.S3_STORAGE["AWS_SECRET_ACCESS_KEY"],
-    region_name=settings.S3_STORAGE["AWS_REGION"],
+
+# The session, bucket and client are only created when S3Storage first
+# uses them, so that other storages work without S3 settings.
+aws = SimpleLazyObject(
+    lambda: Session(
+        aws_access_key_id=settings.S3_STORAGE["AWS_ACCESS_KEY"],
+        aws_secret_access_key=settings.S3_STORAGE["AWS_SECRET_ACCESS_KEY"],
+        region_name=settings.S3_STORAGE["AWS_REGION"],
+    )
+)
+# ENDPOINT_URL points boto3 at an S3 compatible server other than AWS, such
+# as a local MinIO or moto server during development.
+bucket = SimpleLazyObject(
+    lambda: aws.resource(
+        "s3", endpoint_url=settings.S3_STORAGE["ENDPOINT_URL"]
+    ).Bucket(settings.S3_STORAGE["BUCKET_NAME"])
+)
+client = SimpleLazyObject(
+    lambda: aws.client(
+        "s3",
+        endpoint_url=settings.S3_STORAGE["ENDPOINT_URL"],
+        config=Config(signature_version="s3v4"),
+    )
 )
-bucket = aws.resource("s3").Bucket(settings.S3_STORAGE["BUCKET_NAME"])
-client = aws.client("s3", config=Config(signature_version="s3v4"))
 logger = logging.getLogger(__name__)
 
 
+class UniqueNameMixin:
+    """
+    Stores every file under a new uuid4 name that keeps the extension of
+    the original name, as S3Storage does.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        filename = self.get_unique_name(name)
+        if self.exists(filename):
+            # Generate new name until it's unique.
+            return self.get_available_name(name)
+        return filename
+
+    def get_unique_name(self, name):
+        _, ext = os.path.splitext(name)
+        return str(uuid4()) + ext
+
+
 @deconstructible
-class S3Storage(Storage):
+class S3Storage(UniqueNameMixin, Storage):
+    @timed_storage_call
     def _save(self, name, content):
         content_type, encoding = mimetypes.guess_type(name)
         try:
@@ -37,6 +79,16 @@ class S3Storage(Storage):
             logger.exception(e)
             raise e
 
+    @timed_storage_call
+    def _open(self, name, mode="rb"):
+        try:
+            response = bucket.Object(name).get()
+            return ContentFile(response["Body"].read(), name=name)
+        except ClientError as e:
+            logger.exception(e)
+            raise e
+
+    @timed_storage_call
     def delete(self, name):
         try:
             bucket.Object(name).delete()
@@ -44,6 +96,44 @@ class S3Storage(Storage):
             logger.exception(e)
             raise e
 
+    @timed_storage_call
+    def delete_many(self, names):
+        """
+        Delete several objects with one request per 1000 keys, the most
+        that S3 accepts. Return the names that could not be deleted.
+        """
+        names = list(names)
+        failed = []
+        for i in range(0, len(names), 1000):
+            objects = [{"Key": name} for name in names[i : i + 1000]]
+            try:
+                response = client.delete_objects(
+                    Bucket=settings.S3_STORAGE["BUCKET_NAME"],
+                    Delete={"Objects": objects, "Quiet": True},
+                )
+            except ClientError as e:
+                logger.exception(e)
+                failed += [obj["Key"] for obj in objects]
+                continue
+            for error in response.get("Errors", []):
+                logger.error(f"Could not delete {error['Key']}: {error['Message']}")
+                failed.append(error["Key"])
+        return failed
+
+    def list_files(self, prefix=""):
+        """
+        Yield the name and last modified time of every object whose name
+        starts with prefix, one page of 1000 objects at a time.
+        """
+        paginator = client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=settings.S3_STORAGE["BUCKET_NAME"], Prefix=prefix
+        )
+        for page in pages:
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["LastModified"]
+
+    @timed_storage_call
     def exists(self, name):
         try:
             # verify if object with name exists in bucket
@@ -69,13 +159,184 @@ class S3Storage(Storage):
             logger.exception(e)
             return None
 
-    def get_available_name(self, name, max_length=None):
-        filename = self.get_unique_name(name)
-        if self.exists(filename):
-            # Generate new name until it's unique.
-            return self.get_available_name(name)
-        return filename
+    def generate_upload(self, name, content_type, max_size, expires_in=300):
+        """
+        Return the url and form fields of a presigned POST request that lets
+        a client upload a file of content_type and at most max_size bytes
+        directly to the bucket under name.
+        """
+        try:
+            return client.generate_presigned_post(
+                Bucket=settings.S3_STORAGE["BUCKET_NAME"],
+                Key=name,
+                Fields={"Content-Type": content_type},
+                Conditions=[
+                    {"Content-Type": content_type},
+                    ["content-length-range", 1, max_size],
+                ],
+                ExpiresIn=expires_in,
+            )
+        except ClientError as e:
+            logger.exception(e)
+            raise e
 
-    def get_unique_name(self, name):
-        _, ext = os.path.splitext(name)
-        return str(uuid4()) + ext
+    @timed_storage_call
+    def metadata(self, name):
+        """
+        Return the size and content type of a stored file, or None if it
+        does not exist.
+        """
+        return self._head(name)
+
+    @timed_storage_call
+    def metadata_many(self, names):
+        """
+        Return the metadata of several stored files by name, like metadata()
+        does. The requests are sent concurrently, up to 10 at a time.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return dict()
+        with ThreadPoolExecutor(max_workers=min(len(names), 10)) as executor:
+            return dict(zip(names, executor.map(self._head, names)))
+
+    def _head(self, name):
+        try:
+            response = client.head_object(
+                Bucket=settings.S3_STORAGE["BUCKET_NAME"], Key=name
+            )
+            return {
+                "size": response["ContentLength"],
+                "content_type": response["ContentType"],
+            }
+        except ClientError as e:
+            if e.response["ResponseMetadata"]["HTTPStatusCode"] == 404:
+                return None
+            logger.exception(e)
+            raise e
+
+
+@deconstructible
+class InMemoryStorage(UniqueNameMixin, Storage):
+    """
+    A storage that keeps files in a dict shared by all instances, for tests
+    and benchmarks. Its urls do not point anywhere.
+    """
+
+    files = dict()
+
+    @timed_storage_call
+    def _save(self, name, content):
+        content_type, encoding = mimetypes.guess_type(name)
+        self.files[name] = (content.read(), content_type, datetime.now(timezone.utc))
+        content.close()
+        return name
+
+    @timed_storage_call
+    def _open(self, name, mode="rb"):
+        if name not in self.files:
+            raise FileNotFoundError(name)
+        return ContentFile(self.files[name][0], name=name)
+
+    @timed_storage_call
+    def delete(self, name):
+        self.files.pop(name, None)
+
+    @timed_storage_call
+    def delete_many(self, names):
+        for name in names:
+            self.files.pop(name, None)
+        return []
+
+    def list_files(self, prefix=""):
+        for name, (_, _, modified) in list(self.files.items()):
+            if name.startswith(prefix):
+                yield name, modified
+
+    @timed_storage_call
+    def exists(self, name):
+        return name in self.files
+
+    def size(self, name):
+        return len(self.files[name][0])
+
+    def url(self, name):
+        return urljoin("https://storage.invalid/", name)
+
+    def generate_upload(self, name, content_type, max_size, expires_in=300):
+        return {
+            "url": "https://storage.invalid/",
+            "fields": {"key": name, "Content-Type": content_type},
+        }
+
+    @timed_storage_call
+    def metadata(self, name):
+        if name not in self.files:
+            return None
+        content, content_type, _ = self.files[name]
+        return {"size": len(content), "content_type": content_type}
+
+    def metadata_many(self, names):
+        return {name: self.metadata(name) for name in names}
+
+
+@deconstructible
+class LocalFileSystemStorage(UniqueNameMixin, FileSystemStorage):
+    """
+    A storage that keeps files in LOCAL_STORAGE["LOCATION"], for local
+    development without S3. Files are served at LOCAL_STORAGE["BASE_URL"]
+    when DEBUG is on.
+    """
+
+    def __init__(self, location=None, base_url=None, **kwargs):
+        super().__init__(
+            location=location or settings.LOCAL_STORAGE["LOCATION"],
+            base_url=base_url or settings.LOCAL_STORAGE["BASE_URL"],
+            **kwargs,
+        )
+
+    _save = timed_storage_call(FileSystemStorage._save)
+    _open = timed_storage_call(FileSystemStorage._open)
+    delete = timed_storage_call(FileSystemStorage.delete)
+    exists = timed_storage_call(FileSystemStorage.exists)
+
+    @timed_storage_call
+    def delete_many(self, names):
+        failed = []
+        for name in names:
+            try:
+                FileSystemStorage.delete(self, name)
+            except OSError as e:
+                logger.exception(e)
+                failed.append(name)
+        return failed
+
+    def list_files(self, prefix=""):
+        for root, _, files in os.walk(self.location):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.location).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    modified = os.path.getmtime(path)
+                    yield name, datetime.fromtimestamp(modified, timezone.utc)
+
+    def generate_upload(self, name, content_type, max_size, expires_in=300):
+        """
+        Return the fields of an upload like S3Storage does. There is no
+        endpoint that accepts them, so direct uploads need S3 or an S3
+        compatible server.
+        """
+        return {
+            "url": self.url(""),
+            "fields": {"key": name, "Content-Type": content_type},
+        }
+
+    @timed_storage_call
+    def metadata(self, name):
+        if not FileSystemStorage.exists(self, name):
+            return None
+        content_type, encoding = mimetypes.guess_type(name)
+        return {"size": self.size(name), "content_type": content_type}
+
+    def metadata_many(self, names):
+        return {name: self.metadata(name) for name in names}
@@ -0,0 +1,55 @@
+"""Jobs that run outside of requests, on the workers of the run_worker command."""
+
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+
+from api.images import read_image
+from api.jobs import job
+from api.models import Photo, Post, User
+from api.purge import purge_posts, purge_users
+
+logger = logging.getLogger(__name__)
+
+
+@job()
+def purge_post(post_id):
+    """Purge a deleted post, unless it was restored in the meantime."""
+    if Post.objects.filter(pk=post_id, deleted_at__isnull=False).exists():
+        purge_posts([post_id])
+
+
+@job()
+def purge_user(user_id):
+    """Purge a deleted user, unless they were restored in the meantime."""
+    if User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        purge_users([user_id])
+
+
+@job(concurrency=4)
+def process_uploaded_photo(photo_id):
+    """
+    Fill in the metadata of a photo that was uploaded directly to storage,
+    and rotate it upright if needed, as read_image() does for photos that
+    are uploaded through the API.
+    """
+    photo = Photo.objects.filter(pk=photo_id).first()
+    if photo is None:
+        return
+
+    name = photo.file.name
+    with default_storage.open(name) as file:
+        try:
+            processed, metadata = read_image(file)
+        except ValidationError:
+            logger.warning(f"Photo {photo_id} ({name}) is not a valid image.")
+            return
+        if processed is not file:
+            photo.file = default_storage.save(name, processed)
+
+    for field, value in metadata.items():
+        setattr(photo, field, value)
+    photo.save(update_fields=["file", "width", "height", "format", "bytes"])
+    if photo.file.name != name:
+        default_storage.delete(name)
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from io import BytesIO
 import random
 import string
@@ -57,11 +58,18 @@ class FakePost(FakeData):
         super().__init__(**kwargs)
 
 
-def fake_image_file():
+@lru_cache(maxsize=None)
+def fake_image_content() -> bytes:
+    """Encode the image of fake_image_file() once."""
     image = BytesIO()
     Image.new("RGB", (100, 100)).save(image, "JPEG")
-    image.seek(0)
-    return SimpleUploadedFile(f"img_{str(uuid4())}.jpg", image.getvalue(), "image/jpeg")
+    return image.getvalue()
+
+
+def fake_image_file():
+    return SimpleUploadedFile(
+        f"img_{str(uuid4())}.jpg", fake_image_content(), "image/jpeg"
+    )
 
 
 def fake_password(length=8):
@@ -0,0 +1,67 @@
+import json
+
+from api.async_views import AsyncBreedsListView, AsyncPostView, AsyncPostsView
+from api.cache import post_cache
+from api.models import Breed, Pet, Post, Species, User
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+from django.test import TestCase
+from django.urls import reverse
+from knox.models import AuthToken
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        _, cls.token = AuthToken.objects.create(cls.user)
+        Breed.objects.get_or_create(name="American Shorthair", species=Species.CAT)
+        pet = Pet.objects.create(**FakePet().data)
+        cls.posts = [
+            Post.objects.create(pet=pet, user=cls.user, **FakePost().data)
+            for _ in range(3)
+        ]
+        cls.factory = APIRequestFactory()
+
+    def setUp(self):
+        post_cache().clear()
+
+    async def test_posts_get_200_response(self):
+        request = self.factory.get(reverse("posts"))
+        response = await AsyncPostsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.content)), len(self.posts))
+
+    async def test_post_get_200_response(self):
+        post = self.posts[0]
+        request = self.factory.get(reverse("post", kwargs={"pk": post.pk}))
+        response = await AsyncPostView.as_view()(request, pk=str(post.pk))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(data["description"], post.description)
+        self.assertEqual(data["user"], self.user.username)
+
+    async def test_post_get_404_response(self):
+        request = self.factory.get(reverse("post", kwargs={"pk": -1}))
+        response = await AsyncPostView.as_view()(request, pk="-1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_breeds_get_200_response(self):
+        request = self.factory.get(
+            reverse("breeds"), HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+        response = await AsyncBreedsListView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(len(json.loads(response.content)), 0)
+
+    async def test_breeds_get_401_response(self):
+        request = self.factory.get(reverse("breeds"))
+        response = await AsyncBreedsListView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+    async def test_posts_post_is_delegated(self):
+        request = self.factory.post(reverse("posts"), {})
+        response = await AsyncPostsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
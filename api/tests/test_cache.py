@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from api.cache import get_serialized_posts, post_cache, post_key
+from api.models import Breed, Color, Pet, Photo, Post, Species, User
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+from django.test import TestCase
+
+
+class PostCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.pet = Pet.objects.create(**FakePet().data)
+        cls.posts = [
+            Post.objects.create(pet=cls.pet, user=cls.user, **FakePost().data)
+            for _ in range(3)
+        ]
+
+    def setUp(self):
+        post_cache().clear()
+
+    def assertCached(self, post, cached=True):
+        self.assertEqual(post_cache().get(post_key(post.pk)) is not None, cached)
+
+    def test_caches_serialized_posts(self):
+        pks = [post.pk for post in self.posts]
+        data = get_serialized_posts(pks)
+        self.assertEqual(len(data), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_serialized_posts(pks), data)
+
+    def test_fetches_misses_in_bulk(self):
+        pks = [post.pk for post in self.posts]
+        get_serialized_posts(pks[:1])
+        # One query for the posts and one per prefetched relation.
+        with self.assertNumQueries(5):
+            data = get_serialized_posts(pks + [-1])
+        self.assertEqual(len(data), 3)
+
+    @patch("api.routers.ReplicaRouter.db_for_read", return_value="replica_0")
+    def test_reads_misses_from_primary(self, _):
+        # A replica could still hold the posts that a write just invalidated.
+        data = get_serialized_posts([post.pk for post in self.posts])
+        self.assertEqual(len(data), 3)
+
+    def test_invalidates_on_post_save(self):
+        post = self.posts[0]
+        get_serialized_posts([post.pk])
+        post.description = "updated"
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+            # Until the commit, other requests still read the old post.
+            self.assertCached(post)
+        self.assertCached(post, False)
+        self.assertEqual(get_serialized_posts([post.pk])[0]["description"], "updated")
+
+    def test_invalidates_on_pet_save(self):
+        get_serialized_posts([post.pk for post in self.posts])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.save()
+        for post in self.posts:
+            self.assertCached(post, False)
+
+    def test_invalidates_on_photo_create(self):
+        post = self.posts[0]
+        get_serialized_posts([post.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            Photo.objects.create(post=post, order=0, file="photo.jpg")
+        self.assertCached(post, False)
+
+    def test_invalidates_on_m2m_change(self):
+        post = self.posts[0]
+        breed, _ = Breed.objects.get_or_create(name="Bengal", species=Species.CAT)
+        color = Color.objects.create(name="White", hex="FFFFFF")
+
+        get_serialized_posts([post.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.breed.add(breed)
+        self.assertCached(post, False)
+
+        get_serialized_posts([post.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            color.pet_coat_colors.add(self.pet)
+        self.assertCached(post, False)
+
+        get_serialized_posts([post.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            color.pet_coat_colors.clear()
+        self.assertCached(post, False)
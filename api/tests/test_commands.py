@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from api.cache import breed_cache, breeds_key, get_serialized_breeds
+from api.management.commands.load_breeds import canonical_name, normalize_name
+from api.models import Breed, Comment, Pet, Photo, Post, Species, User
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+
+class ReconcilePostCountsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(**FakeUser().data)
+        pet = Pet.objects.create(**FakePet().data)
+        cls.posts = [
+            Post.objects.create(pet=pet, user=user, **FakePost().data) for _ in range(3)
+        ]
+        for post in cls.posts:
+            Comment.objects.create(user=user, post=post, content="comment")
+            Photo.objects.create(post=post, order=0, file="photo.jpg")
+
+    def test_reconciles_drifted_posts(self):
+        Post.objects.filter(pk=self.posts[0].pk).update(comment_count=7)
+        Post.objects.filter(pk=self.posts[1].pk).update(photo_count=0)
+        out = StringIO()
+        call_command("reconcile_post_counts", batch_size=2, stdout=out)
+        self.assertIn("2 post(s)", out.getvalue())
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, 1)
+            self.assertEqual(post.photo_count, 1)
+
+
+class GenerateDataTest(TestCase):
+    def test_generates_consistent_data(self):
+        out = StringIO()
+        call_command(
+            "generate_data",
+            users=5,
+            posts=30,
+            photos=2,
+            comments=2,
+            batch_size=8,
+            seed=1,
+            stdout=out,
+        )
+        self.assertIn("Created 30 of 30 posts.", out.getvalue())
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Pet.objects.count(), 30)
+        for post in Post.objects.all():
+            self.assertEqual(post.photos.count(), post.photo_count)
+            self.assertEqual(
+                Comment.objects.filter(post=post).count(), post.comment_count
+            )
+            self.assertGreater(post.pet.coat_colors.count(), 0)
+        self.assertTrue(Comment.objects.filter(reply_to__isnull=False).exists())
+        # The replies of a comment belong to the same post.
+        self.assertFalse(
+            Comment.objects.exclude(reply_to__isnull=True)
+            .exclude(reply_to__post=F("post"))
+            .exists()
+        )
+
+
+class LoadBreedsTest(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "cat_breeds": ["Bengal Cat ", "Sokoke  Cat Breed", "Sokoke Cat"],
+                    "dog_breeds": ["Kintamani Dog", "Kintamani Dog"],
+                },
+                f,
+            )
+        self.addCleanup(os.remove, self.path)
+
+    def load(self) -> str:
+        out = StringIO()
+        call_command("load_breeds", self.path, stdout=out)
+        return out.getvalue()
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("Bengal Cat ", Species.CAT), "Bengal")
+        self.assertEqual(
+            normalize_name("Norwegian Forest Cat Breed", Species.CAT),
+            "Norwegian Forest",
+        )
+        self.assertEqual(
+            normalize_name("Bernese Mountain Dog", Species.DOG), "Bernese Mountain Dog"
+        )
+
+    def test_loads_breeds_once(self):
+        Breed.objects.filter(name="Bengal", species=Species.CAT).delete()
+        count = Breed.objects.count()
+        get_serialized_breeds()
+
+        self.assertIn("Created 3 breed(s), 0 already existed.", self.load())
+        self.assertEqual(Breed.objects.count(), count + 3)
+        for name, species in [
+            ("Bengal", Species.CAT),
+            ("Sokoke", Species.CAT),
+            ("Kintamani Dog", Species.DOG),
+        ]:
+            self.assertTrue(Breed.objects.filter(name=name, species=species).exists())
+        self.assertIsNone(breed_cache().get(breeds_key()))
+
+        with self.assertNumQueries(1):
+            self.assertIn("Created 0 breed(s), 3 already existed.", self.load())
+        self.assertEqual(Breed.objects.count(), count + 3)
+
+    def test_canonical_name(self):
+        existing = {("German Shepherd", Species.DOG)}
+        self.assertEqual(
+            canonical_name("German Shepherd Dog", Species.DOG, existing),
+            "German Shepherd",
+        )
+        self.assertEqual(
+            canonical_name("Bernese Mountain Dog", Species.DOG, existing),
+            "Bernese Mountain Dog",
+        )
+
+    def test_scraped_breeds_are_in_place_after_migrations(self):
+        out = StringIO()
+        call_command("load_breeds", stdout=out)
+        self.assertIn("Created 0 breed(s)", out.getvalue())
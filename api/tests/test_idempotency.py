@@ -0,0 +1,147 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from api.models import IdempotencyKey, Post, User
+from api.tests.exceptions import TestException
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+from api.views import PostsView, RegisterUserView
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+class IdempotencyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.factory = APIRequestFactory()
+
+    def register(self, data, key="key", address="127.0.0.1"):
+        request = self.factory.post(
+            reverse("register_user"),
+            data,
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            REMOTE_ADDR=address,
+        )
+        return RegisterUserView.as_view()(request)
+
+    def create_post(self, key="key", data=None):
+        if data is None:
+            data = FakePost().data
+            data["pet"] = FakePet().data
+        request = self.factory.post(
+            reverse("posts"), data, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+        force_authenticate(request, self.user)
+        return PostsView.as_view()(request)
+
+    def test_retry_returns_stored_response(self):
+        first = self.create_post()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with patch("api.serializers.CreatePostSerializer.create") as mock_create:
+            retry = self.create_post()
+        mock_create.assert_not_called()
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_replayed_post_is_serialized_again(self):
+        first = self.create_post()
+        Post.objects.update(description="Updated.")
+        retry = self.create_post()
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.data, {**first.data, "description": "Updated."})
+
+    def test_fingerprint_leaves_out_passwords(self):
+        data = FakeUser().data
+        self.register(data)
+        # Only the password differs, so the request is not told apart.
+        response = self.register({**data, "password": data["password"] + "x"})
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+
+    def test_keys_are_scoped_to_path(self):
+        data = FakeUser().data
+        self.assertEqual(self.register(data).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.create_post().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_409_response_while_in_progress(self):
+        data = FakeUser().data
+        self.register(data)
+        IdempotencyKey.objects.update(status_code=None, response=None)
+        response = self.register(data)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_abandoned_requests_can_be_retried(self):
+        data = FakePost().data
+        data["pet"] = FakePet().data
+        self.create_post(data=data)
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response=None,
+            created_at=timezone.now() - timedelta(minutes=5),
+        )
+        response = self.create_post(data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_422_response_for_different_request(self):
+        data = FakePost().data
+        data["pet"] = FakePet().data
+        self.assertEqual(
+            self.create_post(data=data).status_code, status.HTTP_201_CREATED
+        )
+        data["description"] = "Another post."
+        response = self.create_post(data=data)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_anonymous_keys_are_scoped_to_client_and_request(self):
+        first, second = FakeUser().data, FakeUser().data
+        self.assertEqual(
+            self.register(first, address="10.0.0.1").status_code,
+            status.HTTP_201_CREATED,
+        )
+        response = self.register(second, address="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(response.data["username"], second["username"])
+        response = self.register(first, address="10.0.0.1")
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertTrue(User.objects.filter(username=second["username"]).exists())
+
+    @patch("api.views.RegisterUserSerializer.save")
+    def test_server_errors_are_not_stored(self, mock_save):
+        mock_save.side_effect = TestException()
+        data = FakeUser().data
+        response = self.register(data)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        mock_save.side_effect = None
+        response = self.register(data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_expired_keys_are_reused_and_purged(self):
+        self.create_post()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        data = FakePost().data
+        data["pet"] = FakePet().data
+        data["description"] = "Another post."
+        response = self.create_post(data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1", out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
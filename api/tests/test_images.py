@@ -0,0 +1,74 @@
+from io import BytesIO
+
+from unittest import skipUnless
+
+from api.images import GPS_INFO, ORIENTATION, read_image
+from api.tests.fake_data import fake_image_file
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from PIL import Image, MpoImagePlugin  # noqa: F401 registers the MPO format
+
+
+def image_file(size, image_format="JPEG", orientation=None, gps=False, **options):
+    content = BytesIO()
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[ORIENTATION] = orientation
+    if gps:
+        exif[GPS_INFO] = {1: "N", 2: (52.0, 31.0, 12.0)}
+    Image.new("RGB", size).save(content, image_format, exif=exif, **options)
+    return SimpleUploadedFile("image", content.getvalue())
+
+
+class ReadImageTest(TestCase):
+    def test_returns_metadata(self):
+        upload = fake_image_file()
+        file, metadata = read_image(upload)
+        self.assertIs(file, upload)
+        self.assertEqual(
+            metadata,
+            {"width": 100, "height": 100, "format": "JPEG", "bytes": upload.size},
+        )
+
+    def test_rotates_images_with_exif_orientation(self):
+        file, metadata = read_image(image_file((100, 50), orientation=6))
+        self.assertEqual((metadata["width"], metadata["height"]), (50, 100))
+        image = Image.open(file)
+        self.assertEqual(image.size, (50, 100))
+        self.assertNotIn(ORIENTATION, image.getexif())
+        self.assertEqual(metadata["bytes"], file.size)
+
+    def test_rotated_jpeg_keeps_its_quality(self):
+        upload = image_file((100, 50), orientation=6, quality=95, subsampling=0)
+        original = Image.open(upload)
+        file, metadata = read_image(upload)
+        image = Image.open(file)
+        self.assertEqual(image.quantization, original.quantization)
+        self.assertEqual(image.layer, original.layer)
+
+    def test_strips_gps_from_unrotated_images(self):
+        file, metadata = read_image(image_file((100, 50), gps=True))
+        image = Image.open(file)
+        self.assertEqual(image.size, (100, 50))
+        self.assertNotIn(GPS_INFO, image.getexif())
+        self.assertEqual(metadata["bytes"], file.size)
+
+    @skipUnless("MPO" in Image.SAVE, "Pillow cannot save MPO images")
+    def test_reads_mpo_as_jpeg(self):
+        content = BytesIO()
+        images = [Image.new("RGB", (100, 50)), Image.new("RGB", (50, 25))]
+        images[0].save(content, "MPO", save_all=True, append_images=images[1:])
+        upload = SimpleUploadedFile("image", content.getvalue())
+        self.assertEqual(Image.open(upload).format, "MPO")
+        file, metadata = read_image(upload)
+        self.assertIs(file, upload)
+        self.assertEqual(metadata["format"], "JPEG")
+
+    def test_raises_for_invalid_image(self):
+        with self.assertRaises(ValidationError):
+            read_image(SimpleUploadedFile("image.jpg", b"not an image"))
+
+    def test_raises_for_unsupported_format(self):
+        with self.assertRaises(ValidationError):
+            read_image(image_file((10, 10), image_format="BMP"))
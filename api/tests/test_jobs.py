@@ -0,0 +1,122 @@
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from api.images import ORIENTATION
+from api.jobs import Worker, job
+from api.models import Job, Pet, Photo, Post, User
+from api.tasks import process_uploaded_photo
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from PIL import Image
+
+calls = []
+
+
+@job(name="test.record", max_attempts=2, concurrency=1)
+def record(value):
+    calls.append(value)
+
+
+@job(name="test.fail", max_attempts=2)
+def fail():
+    raise ValueError("failed")
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_queued_jobs(self):
+        record.delay(value=1)
+        record.delay_many([{"value": 2}, {"value": 3}])
+        record.delay(run_at=timezone.now() + timedelta(hours=1), value=4)
+        Worker(burst=True).run()
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_retries_with_backoff(self):
+        job = fail.delay()
+        worker = Worker(burst=True)
+        worker.run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("ValueError", job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        worker.run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_respects_concurrency_limit(self):
+        running = record.delay(value=1)
+        Job.objects.filter(pk=running.pk).update(
+            status=Job.Status.RUNNING, locked_at=timezone.now()
+        )
+        record.delay(value=2)
+        self.assertIsNone(Worker().claim())
+
+    def test_requeues_stale_jobs(self):
+        job = record.delay(value=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING, locked_at=timezone.now() - timedelta(days=1)
+        )
+        call_command("run_worker", burst=True)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_fails_stale_jobs_out_of_attempts(self):
+        job = record.delay(value=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING,
+            attempts=2,
+            locked_at=timezone.now() - timedelta(days=1),
+        )
+        Worker(burst=True).run()
+        self.assertEqual(calls, [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(job.locked_at)
+
+
+class ProcessUploadedPhotoTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(**FakeUser().data)
+        pet = Pet.objects.create(**FakePet().data)
+        post = Post.objects.create(user=user, pet=pet, **FakePost().data)
+        cls.photo = Photo.objects.create(post=post, order=0, file="uploads/1/a.jpg")
+
+    def image(self, orientation=None):
+        content = BytesIO()
+        exif = Image.Exif()
+        if orientation is not None:
+            exif[ORIENTATION] = orientation
+        Image.new("RGB", (40, 20)).save(content, "JPEG", exif=exif)
+        return ContentFile(content.getvalue(), name=self.photo.file.name)
+
+    @patch("api.storage.InMemoryStorage.open")
+    def test_fills_in_metadata(self, mock_open):
+        mock_open.return_value = self.image()
+        process_uploaded_photo(photo_id=self.photo.pk)
+        self.photo.refresh_from_db()
+        self.assertEqual((self.photo.width, self.photo.height), (40, 20))
+        self.assertEqual(self.photo.format, "JPEG")
+
+    @patch("api.storage.InMemoryStorage.delete")
+    @patch("api.storage.InMemoryStorage.save", return_value="rotated.jpg")
+    @patch("api.storage.InMemoryStorage.open")
+    def test_rotates_photo(self, mock_open, mock_save, mock_delete):
+        mock_open.return_value = self.image(orientation=6)
+        process_uploaded_photo(photo_id=self.photo.pk)
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.file.name, "rotated.jpg")
+        self.assertEqual((self.photo.width, self.photo.height), (20, 40))
+        mock_delete.assert_called_once_with("uploads/1/a.jpg")
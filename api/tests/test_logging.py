@@ -0,0 +1,59 @@
+import logging
+from contextvars import copy_context
+
+from api.logging import EventMemoryHandler, request_buffers
+from django.test import SimpleTestCase
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class EventMemoryHandlerTest(SimpleTestCase):
+    def setUp(self):
+        self.target = ListHandler()
+        self.handler = EventMemoryHandler(
+            3, logging.ERROR, self.target, flushOnClose=False
+        )
+        self.logger = logging.getLogger("test_event_memory_handler")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def messages(self):
+        # Wait for the listener to pass all records to the target.
+        self.handler.close()
+        return [record.getMessage() for record in self.target.records]
+
+    def test_keeps_last_records(self):
+        for i in range(5):
+            self.logger.debug("debug %d", i)
+        self.assertEqual(len(self.handler.buffer), 3)
+        self.logger.error("error")
+        self.assertEqual(self.messages(), ["debug 3", "debug 4", "error"])
+
+    def test_does_not_flush_below_flush_level(self):
+        self.logger.debug("debug")
+        self.logger.warning("warning")
+        self.assertEqual(self.messages(), [])
+
+    def test_flushes_records_of_current_request(self):
+        def request(name, fail):
+            request_buffers.set(dict())
+            self.logger.debug(f"{name} debug")
+            if fail:
+                self.logger.error(f"{name} error")
+
+        copy_context().run(request, "first", False)
+        copy_context().run(request, "second", True)
+        self.logger.debug("outside")
+        self.assertEqual(self.messages(), ["second debug", "second error"])
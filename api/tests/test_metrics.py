@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+
+from api.instrumentation import ProcessStats, stats
+from api.metrics import collect, render, writer
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+METRICS = {
+    "TOKEN": "",
+    "ALLOWED_IPS": ["127.0.0.1"],
+    "MULTIPROCESS_DIR": "",
+    "FLUSH_INTERVAL": 5,
+}
+
+
+def request_values(duration):
+    return {
+        "duration": duration,
+        "db_queries": 2,
+        "db_time": 0.001,
+        "storage_calls": 0,
+        "storage_time": 0.0,
+        "serializer_time": 0.0,
+        "bytes": 100,
+    }
+
+
+@override_settings(METRICS=METRICS)
+class MetricsViewTest(TestCase):
+    def setUp(self):
+        stats.reset()
+
+    def test_get_200_response(self):
+        stats.add("GET", "api/posts/<str:pk>", 200, request_values(0.02))
+        stats.add_storage_call("save", 0.3, False)
+        stats.add_cache_lookup("posts", 3, 1)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",route="api/posts/<str:pk>",status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",route="api/posts/<str:pk>",le="0.025"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",route="api/posts/<str:pk>",le="0.01"} 0',
+            text,
+        )
+        self.assertIn(
+            'storage_operation_duration_seconds_count{operation="save"} 1', text
+        )
+        self.assertIn('cache_lookups_total{cache="posts",result="hit"} 3', text)
+
+    def test_get_403_response(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1})
+    def test_resolves_address_through_proxies(self):
+        # The local proxy appends the address of the client it served.
+        response = self.client.get(
+            reverse("metrics"), HTTP_X_FORWARDED_FOR="127.0.0.1, 10.0.0.1"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS={**METRICS, "TOKEN": "secret"})
+    def test_requires_token_when_set(self):
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        response = self.client.get(
+            reverse("metrics"),
+            REMOTE_ADDR="10.0.0.1",
+            HTTP_AUTHORIZATION="Bearer secret",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MetricsTest(TestCase):
+    def test_render_escapes_labels(self):
+        process = ProcessStats()
+        process.add("GET", 'a"b\\c', 200, request_values(1))
+        text = render(process.snapshot())
+        self.assertIn('route="a\\"b\\\\c"', text)
+
+    def test_collect_adds_up_processes(self):
+        other = ProcessStats()
+        other.add("GET", "api/posts", 200, request_values(0.02))
+        other.add_cache_lookup("posts", 1, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            metrics = {**METRICS, "MULTIPROCESS_DIR": directory}
+            with override_settings(METRICS=metrics):
+                with open(os.path.join(directory, "1.json"), "w") as file:
+                    file.write(json.dumps(other.snapshot()))
+                stats.reset()
+                stats.add("GET", "api/posts", 200, request_values(2))
+                writer.pid = None
+                snapshot = collect()
+                # The file of this process is written while collecting.
+                self.assertTrue(
+                    os.path.exists(os.path.join(directory, f"{os.getpid()}.json"))
+                )
+        requests = snapshot["requests"]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]["count"], 2)
+        self.assertEqual(requests[0]["db_queries"], 4)
+        self.assertEqual(sum(requests[0]["buckets"]), 2)
+        self.assertEqual(snapshot["cache"][0]["misses"], 2)
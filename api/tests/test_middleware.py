@@ -0,0 +1,101 @@
+import json
+
+from api.cache import invalidate_breeds
+from api.instrumentation import (
+    RequestMetrics,
+    request_metrics,
+    serializer_timer,
+    stats,
+    timed_storage_call,
+)
+from api.models import User
+from api.tests.fake_data import FakeUser
+from django.test import TestCase
+from django.urls import reverse
+from knox.models import AuthToken
+from rest_framework import status
+
+
+class LoggingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        _, cls.token = AuthToken.objects.create(cls.user)
+
+    def setUp(self):
+        stats.reset()
+        # Serialize the breeds in every test.
+        invalidate_breeds()
+
+    def get_breeds(self):
+        return self.client.get(
+            reverse("breeds"), HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+
+    def test_logs_request_metrics(self):
+        with self.assertLogs("api.requests", level="INFO") as logs:
+            response = self.get_breeds()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["method"], "GET")
+        self.assertEqual(line["route"], "api/pets/breeds")
+        self.assertEqual(line["view"], "breeds")
+        self.assertEqual(line["status"], 200)
+        self.assertGreater(line["db_queries"], 0)
+        self.assertGreater(line["serializer_ms"], 0)
+        self.assertEqual(line["storage_calls"], 0)
+        self.assertEqual(line["bytes"], len(response.content))
+
+    def test_logs_request_and_response(self):
+        with self.assertLogs("api.middleware", level="DEBUG") as logs:
+            response = self.get_breeds()
+        self.assertEqual(
+            [record.msg for record in logs.records], [response.wsgi_request, response]
+        )
+
+    def test_adds_request_metrics_to_stats(self):
+        self.get_breeds()
+        self.get_breeds()
+        requests = stats.snapshot()["requests"]
+        self.assertEqual(len(requests), 1)
+        totals = requests[0]
+        self.assertEqual(totals["route"], "api/pets/breeds")
+        self.assertEqual(totals["count"], 2)
+        self.assertEqual(sum(totals["buckets"]), 2)
+        self.assertGreater(totals["db_queries"], 0)
+
+    def test_unmatched_route(self):
+        self.client.get("/does-not-exist")
+        self.assertEqual(stats.snapshot()["requests"][0]["route"], "<unmatched>")
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        self.metrics = RequestMetrics()
+        self.token = request_metrics.set(self.metrics)
+
+    def tearDown(self):
+        request_metrics.reset(self.token)
+
+    def test_nested_serializers_are_timed_once(self):
+        with serializer_timer():
+            with serializer_timer():
+                pass
+            inner = self.metrics.serializer_time
+        self.assertEqual(inner, 0)
+        self.assertGreater(self.metrics.serializer_time, 0)
+        self.assertEqual(self.metrics.serializer_depth, 0)
+
+    def test_timed_storage_call(self):
+        stats.reset()
+
+        @timed_storage_call
+        def _open(name):
+            return name
+
+        self.assertEqual(_open("a.jpg"), "a.jpg")
+        self.assertEqual(self.metrics.storage_calls, 1)
+        storage = stats.snapshot()["storage"]
+        self.assertEqual(storage[0]["operation"], "open")
+        self.assertEqual(storage[0]["count"], 1)
+        self.assertEqual(storage[0]["errors"], 0)
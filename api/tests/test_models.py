@@ -44,6 +44,46 @@ class PostModelTest(TestCase):
         self.assertIsInstance(post.likes, int)
 
 
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.pet = Pet.objects.create(**FakePet().data)
+
+    def setUp(self):
+        self.post = Post.objects.create(pet=self.pet, user=self.user, **FakePost().data)
+
+    def test_counts_comments(self):
+        comment = Comment.objects.create(user=self.user, post=self.post, content="a")
+        Comment.objects.create(
+            user=self.user, post=self.post, reply_to=comment, content="b"
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+        # Deleting a comment also deletes its replies.
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_counts_photos(self):
+        photo = Photo.objects.create(post=self.post, order=0, file="a.jpg")
+        Photo.objects.create(post=self.post, order=1, file="b.jpg")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.photo_count, 2)
+
+        photo.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.photo_count, 1)
+
+    def test_deleting_post_skips_counter_updates(self):
+        Comment.objects.create(user=self.user, post=self.post, content="a")
+        Photo.objects.create(post=self.post, order=0, file="a.jpg")
+        with self.assertNumQueries(6):
+            # select comments, photos; delete comments, photos, post; savepoint.
+            self.post.delete()
+
+
 class PetModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -104,7 +144,7 @@ class UserAddressModelTest(TestCase):
 class BreedModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
-        Breed.objects.create(
+        Breed.objects.get_or_create(
             name="American Shorthair",
             species=Species.CAT,
         )
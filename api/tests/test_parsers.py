@@ -0,0 +1,72 @@
+import json
+
+from api.parsers import MultiPartJSONParser
+from api.tests.fake_data import fake_image_file
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+
+class MultiPartView(APIView):
+    parser_classes = [MultiPartJSONParser]
+    json_fields = ["pet"]
+
+    def post(self, request):
+        return Response(
+            {
+                "pet": request.data.get("pet"),
+                "description": request.data.get("description"),
+                "photos": [file.name for file in request.data.get("photos", [])],
+            }
+        )
+
+
+@override_settings(
+    MULTIPART_UPLOADS={
+        "MAX_FILE_SIZE": 10 * 1024,
+        "MAX_TOTAL_SIZE": 20 * 1024,
+        "MAX_FILE_COUNT": 3,
+    }
+)
+class MultiPartJSONParserTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = APIRequestFactory()
+
+    def post(self, data):
+        request = self.factory.post("/", data)
+        return MultiPartView.as_view()(request)
+
+    def test_decodes_only_json_fields(self):
+        pet = {"name": "Rex", "breed": [1]}
+        response = self.post({"pet": json.dumps(pet), "description": "[1, 2]"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["pet"], pet)
+        self.assertEqual(response.data["description"], "[1, 2]")
+
+    def test_400_response_for_invalid_json_field(self):
+        response = self.post({"pet": "{"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_keeps_all_files_of_a_field(self):
+        photos = [fake_image_file(), fake_image_file()]
+        response = self.post({"photos": photos})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["photos"], [photo.name for photo in photos])
+
+    def test_413_response_for_too_many_files(self):
+        response = self.post({"photos": [fake_image_file() for _ in range(4)]})
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_413_response_for_large_file(self):
+        photo = fake_image_file()
+        photo.file.write(b"\0" * 11 * 1024)
+        photo.file.seek(0)
+        response = self.post({"photos": [photo]})
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_413_response_for_large_request(self):
+        response = self.post({"description": "x" * 30 * 1024})
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
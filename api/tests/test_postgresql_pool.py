@@ -0,0 +1,20 @@
+from unittest.mock import patch
+
+from api.db.postgresql_pool.base import get_pool, pools
+from django.test import SimpleTestCase
+
+
+@patch("api.db.postgresql_pool.base.BlockingConnectionPool")
+class GetPoolTest(SimpleTestCase):
+    def setUp(self):
+        # Keep the pools of the test database, if it uses this backend.
+        self.addCleanup(pools.pop, (("database", "test"),), None)
+
+    def test_min_size_is_at_most_max_size(self, mock_pool):
+        get_pool({"POOL": {"MAX_SIZE": 2}}, {"database": "test"})
+        mock_pool.assert_called_once_with(2, 2, 10, database="test")
+
+    def test_reuses_pool_of_same_connection_parameters(self, mock_pool):
+        first = get_pool({}, {"database": "test"})
+        self.assertIs(get_pool({}, {"database": "test"}), first)
+        mock_pool.assert_called_once_with(5, 20, 10, database="test")
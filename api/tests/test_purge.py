@@ -0,0 +1,87 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from api.models import Comment, Pet, Photo, Post, User
+from api.purge import purge_deleted
+from api.tests.fake_data import FakePet, FakePost, FakeUser
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+
+@patch("api.storage.InMemoryStorage.delete_many", return_value=[])
+class PurgeDeletedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.other = User.objects.create_user(**FakeUser().data)
+        cls.posts = []
+        for i in range(3):
+            pet = Pet.objects.create(**FakePet().data)
+            post = Post.objects.create(pet=pet, user=cls.user, **FakePost().data)
+            Photo.objects.create(post=post, order=0, file=f"photo-{i}.jpg")
+            Comment.objects.create(user=cls.other, post=post, content="comment")
+            cls.posts.append(post)
+
+    def age_deletions(self):
+        long_ago = timezone.now() - timedelta(days=2)
+        Post.objects.exclude(deleted_at=None).update(deleted_at=long_ago)
+        User.objects.exclude(deleted_at=None).update(deleted_at=long_ago)
+
+    def test_soft_delete_hides_post(self, _):
+        self.posts[0].soft_delete()
+        self.assertEqual(Post.objects.alive().count(), 2)
+        self.assertEqual(Photo.objects.count(), 3)
+
+    def test_purges_only_old_deletions(self, mock_delete_many):
+        self.posts[0].soft_delete()
+        self.assertEqual(purge_deleted(), (0, 0))
+        self.age_deletions()
+        self.assertEqual(purge_deleted(batch_size=1), (1, 0))
+        self.assertFalse(Post.objects.filter(pk=self.posts[0].pk).exists())
+        self.assertFalse(Pet.objects.filter(pk=self.posts[0].pet_id).exists())
+        self.assertEqual(Photo.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        mock_delete_many.assert_called_once_with(["photo-0.jpg"])
+
+    def test_purges_deleted_users(self, mock_delete_many):
+        self.other.soft_delete()
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.is_active)
+        self.age_deletions()
+        out = StringIO()
+        call_command("purge_deleted", stdout=out)
+        self.assertIn("0 post(s) and 1 user(s)", out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.other.pk).exists())
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).comment_count, 0)
+
+    def test_user_soft_delete_hides_their_posts(self, mock_delete_many):
+        self.user.soft_delete()
+        self.assertEqual(Post.objects.alive().count(), 0)
+        self.age_deletions()
+        self.assertEqual(purge_deleted(), (3, 1))
+        self.assertEqual(Pet.objects.count(), 0)
+
+
+class ScanOrphanedPhotosTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(**FakeUser().data)
+        pet = Pet.objects.create(**FakePet().data)
+        post = Post.objects.create(pet=pet, user=user, **FakePost().data)
+        Photo.objects.create(post=post, order=0, file="kept.jpg")
+
+    @patch("api.storage.InMemoryStorage.delete_many", return_value=[])
+    @patch("api.storage.InMemoryStorage.list_files")
+    def test_finds_and_deletes_orphans(self, mock_list_files, mock_delete_many):
+        old = timezone.now() - timedelta(days=2)
+        mock_list_files.return_value = iter(
+            [("kept.jpg", old), ("orphan.jpg", old), ("new.jpg", timezone.now())]
+        )
+        out = StringIO()
+        call_command("scan_orphaned_photos", delete=True, stdout=out)
+        self.assertIn("orphan.jpg", out.getvalue())
+        self.assertIn("Deleted 1 orphaned file(s).", out.getvalue())
+        mock_delete_many.assert_called_once_with(["orphan.jpg"])
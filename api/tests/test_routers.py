@@ -0,0 +1,104 @@
+from unittest.mock import Mock, patch
+
+from api.models import Post, User
+from api.routers import (
+    ReplicaRouter,
+    RoutingState,
+    pin_to_primary,
+    replica_is_healthy,
+    routing_state,
+    unhealthy_until,
+)
+from api.tests.fake_data import FakeUser
+from django.conf import settings
+from django.core.cache import cache
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from knox.models import AuthToken
+from rest_framework.test import APIRequestFactory
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0"])
+@patch("api.routers.replica_is_healthy", return_value=True)
+class ReplicaRouterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.factory = APIRequestFactory()
+        cls.router = ReplicaRouter()
+
+    def setUp(self):
+        cache.clear()
+
+    def route(self, request, model=Post):
+        token = routing_state.set(RoutingState(request, use_primary=False))
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            routing_state.reset(token)
+
+    def test_safe_request_reads_from_replica(self, _):
+        self.assertEqual(self.route(self.factory.get("/")), "replica_0")
+
+    def test_unsafe_request_reads_from_primary(self, _):
+        token = routing_state.set(RoutingState(self.factory.post("/"), True))
+        try:
+            self.assertEqual(self.router.db_for_read(Post), "default")
+        finally:
+            routing_state.reset(token)
+
+    def test_reads_outside_request_go_to_primary(self, _):
+        self.assertEqual(self.router.db_for_read(Post), "default")
+
+    def test_writes_go_to_primary(self, _):
+        self.assertEqual(self.router.db_for_write(Post), "default")
+
+    def test_primary_models_read_from_primary(self, _):
+        self.assertEqual(self.route(self.factory.get("/"), AuthToken), "default")
+
+    def test_user_reads_own_writes(self, _):
+        request = self.factory.get("/")
+        request.user = self.user
+        self.assertEqual(self.route(request), "replica_0")
+        pin_to_primary(self.user.pk)
+        self.assertEqual(self.route(request), "default")
+
+    def test_unhealthy_replica_falls_back_to_primary(self, mock_healthy):
+        mock_healthy.return_value = False
+        self.assertEqual(self.route(self.factory.get("/")), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self, _):
+        self.assertEqual(self.route(self.factory.get("/")), "default")
+
+
+@patch("api.routers.time.monotonic", return_value=1000)
+class ReplicaHealthTest(SimpleTestCase):
+    def setUp(self):
+        unhealthy_until.clear()
+        self.connection = Mock(connection=None)
+        patcher = patch("api.routers.connections", {"replica_0": self.connection})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rechecks_open_connection(self, mock_monotonic):
+        self.assertTrue(replica_is_healthy("replica_0"))
+        self.connection.connection = Mock()
+        self.connection.is_usable.return_value = False
+        self.assertTrue(replica_is_healthy("replica_0"))
+        self.connection.is_usable.assert_not_called()
+
+        mock_monotonic.return_value += settings.REPLICA_ROUTING["CHECK_SECONDS"]
+        self.assertTrue(replica_is_healthy("replica_0"))
+        self.connection.close.assert_called_once()
+        self.assertEqual(self.connection.ensure_connection.call_count, 2)
+
+    def test_skips_replica_that_fails_to_connect(self, mock_monotonic):
+        self.connection.ensure_connection.side_effect = OperationalError
+        with self.assertLogs("api.routers", "WARNING"):
+            self.assertFalse(replica_is_healthy("replica_0"))
+        self.connection.ensure_connection.side_effect = None
+        self.assertFalse(replica_is_healthy("replica_0"))
+
+        mock_monotonic.return_value += settings.REPLICA_ROUTING["RETRY_SECONDS"]
+        self.assertTrue(replica_is_healthy("replica_0"))
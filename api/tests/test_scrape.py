@@ -0,0 +1,54 @@
+import tempfile
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase
+from scrape.scrape import Crawler, PageCache, parse
+
+URL = "https://example.com/cats/cat-breeds"
+
+
+def page(num, breeds, last=3):
+    links = "".join(
+        f'<a class="pagination-list-item-link{"_isActive" if i == num else ""}" '
+        f'data-page-num="{i}" href="?page={i}">{i}</a>'
+        for i in range(1, last + 1)
+    )
+    if num < last:
+        links += f'<a class="paginationSkip_next" href="?page={num + 1}">Next</a>'
+    labels = "".join(f'<div class="callout-label"><h4>{b}</h4></div>' for b in breeds)
+    return f"<html><body>{labels}<nav>{links}</nav></body></html>"
+
+
+class ScrapeTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = PageCache(directory.name)
+        self.cache.put(URL, page(1, ["Abyssinian Cat", "Bengal Cat "]), {})
+        self.cache.put(f"{URL}?page=2", page(2, ["Birman Cat Breed"]), {})
+        self.cache.put(f"{URL}?page=3", page(3, ["Sphynx"]), {})
+
+    def test_parse(self):
+        page_num, breeds, links = parse(page(2, ["Birman"]), URL)
+        self.assertEqual(page_num, 2)
+        self.assertEqual(breeds, ["Birman"])
+        self.assertIn((3, f"{URL}?page=3"), links)
+        self.assertIn((None, f"{URL}?page=3"), links)
+
+    def test_crawls_cached_pages_offline(self):
+        crawler = Crawler(self.cache, workers=2, offline=True)
+        breeds = crawler.crawl({"cat_breeds": URL})
+        self.assertEqual(
+            breeds["cat_breeds"],
+            ["Abyssinian Cat", "Bengal Cat ", "Birman Cat Breed", "Sphynx"],
+        )
+
+    def test_sends_conditional_requests(self):
+        self.cache.put(URL, page(1, ["Abyssinian"], last=1), {"ETag": '"abc"'})
+        session = Mock()
+        session.get.return_value = Mock(status_code=304)
+        crawler = Crawler(self.cache, delay=0, session=session)
+        breeds = crawler.crawl({"cat_breeds": URL})
+        self.assertEqual(breeds, {"cat_breeds": ["Abyssinian"]})
+        headers = session.get.call_args.kwargs["headers"]
+        self.assertEqual(headers, {"If-None-Match": '"abc"'})
@@ -1,12 +1,16 @@
 from unittest.mock import MagicMock, patch
-from api.models import Breed, Pet, Photo, Species, User, Post
+from api.cache import post_queryset
+from api.models import Breed, Color, Pet, Photo, Species, User, Post
 from api.serializers import (
     ChangePasswordSerializer,
     CreatePostSerializer,
     PetSerializer,
     PhotoSerializer,
+    PostSerializer,
     UserSerializer,
     RegisterUserSerializer,
+    read_posts,
+    raise_if_unknown_fields,
 )
 from api.tests.fake_data import (
     FakeUser,
@@ -16,6 +20,7 @@ from api.tests.fake_data import (
     fake_password,
 )
 from django.test import TestCase
+from rest_framework.serializers import ValidationError
 
 
 class UserSerializerTest(TestCase):
@@ -101,7 +106,7 @@ class PhotoSerializerTest(TestCase):
         pet = Pet.objects.create(**FakePet().data)
         post = Post.objects.create(user=user, pet=pet, **FakePost().data)
         cls.photo = Photo(post=post, file=fake_image_file())
-        cls.fields = ["order", "file"]
+        cls.fields = ["order", "file", "width", "height", "format", "bytes"]
 
     def test_serializes_all_fields(self):
         serializer = PhotoSerializer(self.photo)
@@ -214,3 +219,53 @@ class CreatePostSerializerTest(TestCase):
         self.assertEqual(post.pet, pet)
         self.assertEqual(pet.breed.count(), 2)
         self.assertEqual(mock_photo_create.call_count, 2)
+
+
+class ReadPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(**FakeUser().data)
+        breeds = list(Breed.objects.filter(species=Species.CAT).order_by("pk")[:2])
+        colors = list(Color.objects.order_by("pk")[:3])
+        pet = Pet.objects.create(**FakePet().data)
+        pet.breed.set(breeds)
+        pet.eye_colors.set(colors[:1])
+        pet.coat_colors.set(colors)
+        cls.posts = [
+            Post.objects.create(pet=pet, user=user, **FakePost().data),
+            Post.objects.create(
+                pet=Pet.objects.create(**FakePet().data),
+                user=user,
+                location_lat="-12.5",
+                location_long=3,
+                **{
+                    key: value
+                    for key, value in FakePost().data.items()
+                    if not key.startswith("location")
+                },
+            ),
+        ]
+        Photo.objects.create(post=cls.posts[0], order=0, file="a.jpg", width=4)
+        Photo.objects.create(post=cls.posts[0], order=1, file="b.jpg")
+        Photo.objects.create(post=cls.posts[1], order=0, file="")
+
+    def test_matches_post_serializer(self):
+        posts = list(post_queryset().order_by("pk"))
+        expected = PostSerializer(posts, many=True).data
+        with self.assertNumQueries(5):
+            found = read_posts(Post.objects.alive().order_by("pk"))
+        self.assertEqual(list(found), [post.pk for post in posts])
+        for data, representation in zip(expected, found.values()):
+            self.assertEqual(list(data.items()), list(representation.items()))
+
+    def test_skips_deleted_posts(self):
+        self.posts[1].soft_delete()
+        self.assertEqual(list(read_posts(Post.objects.alive())), [self.posts[0].pk])
+        self.assertEqual(read_posts(Post.objects.none()), {})
+
+
+class RaiseIfUnknownFieldsTest(TestCase):
+    def test_raises_on_unknown_fields(self):
+        raise_if_unknown_fields({"order": 0, "file": None}, PhotoSerializer)
+        with self.assertRaisesMessage(ValidationError, "size"):
+            raise_if_unknown_fields({"order": 0, "size": 1}, PhotoSerializer)
@@ -1,24 +1,36 @@
 from io import BytesIO
 import os
+import tempfile
 from unittest.mock import Mock, patch
 from uuid import UUID, uuid4
 from django.conf import settings
 
-from django.core.files.base import File
+from django.core.files.base import ContentFile, File
 
-from api.storage import S3Storage
+from api.storage import InMemoryStorage, LocalFileSystemStorage, S3Storage
 from botocore.exceptions import ClientError
 from django.test import TestCase
 
 
-@patch("api.storage.bucket.Object", spec=True)
 class TestS3Storage(TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.response_not_found = {"ResponseMetadata": {"HTTPStatusCode": 404}}
         cls.response_ok = {"ResponseMetadata": {"HTTPStatusCode": 200}}
 
-    def test_get_unique_name_returns_uuid_with_ext(self, _):
+    def setUp(self):
+        # The bucket and the client are replaced by explicit mocks, since
+        # patch() would otherwise inspect them and build them from the S3
+        # settings.
+        self.bucket = self.mock("api.storage.bucket")
+        self.s3_client = self.mock("api.storage.client")
+
+    def mock(self, target) -> Mock:
+        patcher = patch(target, Mock())
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_get_unique_name_returns_uuid_with_ext(self):
         name = S3Storage().get_unique_name("dog.jpg")
         root, ext = os.path.splitext(name)
         self.assertIsInstance(UUID(root), UUID)
@@ -27,42 +39,39 @@ class TestS3Storage(TestCase):
     @patch("api.storage.S3Storage.exists")
     @patch("api.storage.S3Storage.get_unique_name")
     def test_get_available_name_returns_unique_name(
-        self, mock_get_unique_name, mock_exists, _
+        self, mock_get_unique_name, mock_exists
     ):
         mock_exists.return_value = False
         mock_get_unique_name.return_value = "unique.jpg"
         available_name = S3Storage().get_available_name("test.jpg")
         self.assertEqual(available_name, "unique.jpg")
 
-    def test_exists_returns_true_if_200(self, mock_obj):
-        mock_obj.return_value = Mock(load=Mock(return_value=self.response_ok))
+    def test_exists_returns_true_if_200(self):
+        self.bucket.Object.return_value = Mock(load=Mock(return_value=self.response_ok))
         self.assertTrue(S3Storage().exists("test"))
 
-    def test_exists_returns_false_if_404(self, mock_obj):
-        mock_obj.return_value = Mock(
+    def test_exists_returns_false_if_404(self):
+        self.bucket.Object.return_value = Mock(
             load=Mock(side_effect=ClientError(self.response_not_found, "mock"))
         )
         self.assertFalse(S3Storage().exists("test"))
 
-    def test_save_returns_filename(self, _):
+    def test_save_returns_filename(self):
         name = str(uuid4()) + ".jpg"
         filename = S3Storage()._save(name, File(BytesIO(b"content")))
         self.assertEqual(filename, name)
 
-    @patch("api.storage.bucket", spec=True)
-    def test_save_uploads_to_s3(self, mock_bucket, _):
-        put_object = Mock(return_value=self.response_ok)
-        mock_bucket.put_object = put_object
+    def test_save_uploads_to_s3(self):
+        self.bucket.put_object.return_value = self.response_ok
         storage = S3Storage()
         self.assertEqual(
             storage._save("name.jpg", File(BytesIO(b"content"))), "name.jpg"
         )
-        self.assertTrue(put_object.called)
+        self.assertTrue(self.bucket.put_object.called)
 
-    @patch("api.storage.client", spec=True)
-    def test_url_calls_generate_presigned_url_correctly(self, mock_client, _):
+    def test_url_calls_generate_presigned_url_correctly(self):
         mock_generate_presigned_url = Mock()
-        mock_client.generate_presigned_url = mock_generate_presigned_url
+        self.s3_client.generate_presigned_url = mock_generate_presigned_url
         storage = S3Storage()
         _ = storage.url("name")
         mock_generate_presigned_url.assert_called_once_with(
@@ -71,21 +80,127 @@ class TestS3Storage(TestCase):
             ExpiresIn=60,
         )
 
-    @patch("api.storage.client", spec=True)
-    def test_url_returns_none_on_error(self, mock_client, _):
+    def test_url_returns_none_on_error(self):
         mock_generate_presigned_url = Mock(
             side_effect=ClientError(
                 error_response=self.response_not_found, operation_name="mock"
             )
         )
-        mock_client.generate_presigned_url = mock_generate_presigned_url
+        self.s3_client.generate_presigned_url = mock_generate_presigned_url
         storage = S3Storage()
         url = storage.url("name")
         self.assertEqual(url, None)
 
-    def test_delete_calls_object_delete_once(self, mock_obj):
+    def test_delete_calls_object_delete_once(self):
         mock_delete = Mock()
-        mock_obj.return_value = Mock(delete=mock_delete)
+        self.bucket.Object.return_value = Mock(delete=mock_delete)
         storage = S3Storage()
         storage.delete("name")
         mock_delete.assert_called_once()
+
+    def test_generate_upload_limits_type_and_size(self):
+        mock_generate_presigned_post = Mock(return_value={"url": "url", "fields": {}})
+        self.s3_client.generate_presigned_post = mock_generate_presigned_post
+        upload = S3Storage().generate_upload("name.jpg", "image/jpeg", 100)
+        self.assertEqual(upload, {"url": "url", "fields": {}})
+        mock_generate_presigned_post.assert_called_once_with(
+            Bucket=settings.S3_STORAGE["BUCKET_NAME"],
+            Key="name.jpg",
+            Fields={"Content-Type": "image/jpeg"},
+            Conditions=[
+                {"Content-Type": "image/jpeg"},
+                ["content-length-range", 1, 100],
+            ],
+            ExpiresIn=300,
+        )
+
+    def test_metadata_returns_none_if_404(self):
+        self.s3_client.head_object = Mock(
+            side_effect=ClientError(self.response_not_found, "mock")
+        )
+        self.assertIsNone(S3Storage().metadata("name"))
+
+    def test_metadata_many_heads_every_name_once(self):
+        def head_object(Bucket, Key):
+            if Key == "missing":
+                raise ClientError(self.response_not_found, "mock")
+            return {"ContentLength": 7, "ContentType": "image/png"}
+
+        self.s3_client.head_object = Mock(side_effect=head_object)
+        metadata = S3Storage().metadata_many(["name", "missing", "name"])
+        self.assertEqual(
+            metadata,
+            {"name": {"size": 7, "content_type": "image/png"}, "missing": None},
+        )
+        self.assertEqual(self.s3_client.head_object.call_count, 2)
+
+    def test_delete_many_sends_1000_keys_per_request(self):
+        error = {"Key": "name-3", "Code": "AccessDenied", "Message": "Denied"}
+        self.s3_client.delete_objects = Mock(side_effect=[{}, {"Errors": [error]}, {}])
+        names = [f"name-{i}" for i in range(2500)]
+        failed = S3Storage().delete_many(names)
+        self.assertEqual(failed, ["name-3"])
+        batches = [
+            call.kwargs["Delete"]["Objects"]
+            for call in self.s3_client.delete_objects.call_args_list
+        ]
+        self.assertEqual([len(batch) for batch in batches], [1000, 1000, 500])
+
+
+class TestInMemoryStorage(TestCase):
+    def setUp(self):
+        InMemoryStorage.files.clear()
+        self.storage = InMemoryStorage()
+
+    def test_save_uses_unique_name(self):
+        name = self.storage.save("dog.jpg", ContentFile(b"content"))
+        root, ext = os.path.splitext(name)
+        self.assertIsInstance(UUID(root), UUID)
+        self.assertEqual(ext, ".jpg")
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.open(name).read(), b"content")
+
+    def test_metadata(self):
+        name = self.storage.save("dog.jpg", ContentFile(b"content"))
+        self.assertEqual(
+            self.storage.metadata(name), {"size": 7, "content_type": "image/jpeg"}
+        )
+        self.assertIsNone(self.storage.metadata("missing.jpg"))
+
+    def test_delete_many_and_list_files(self):
+        names = [self.storage.save("dog.jpg", ContentFile(b"x")) for _ in range(3)]
+        self.assertEqual(self.storage.delete_many(names[:2]), [])
+        self.assertEqual([name for name, _ in self.storage.list_files()], names[2:])
+
+
+class TestLocalFileSystemStorage(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = LocalFileSystemStorage(location=directory.name)
+
+    def test_save_uses_unique_name(self):
+        name = self.storage.save("uploads/dog.jpg", ContentFile(b"content"))
+        root, ext = os.path.splitext(name)
+        self.assertIsInstance(UUID(root), UUID)
+        self.assertEqual(ext, ".jpg")
+        self.assertEqual(self.storage.open(name).read(), b"content")
+        self.assertEqual(self.storage.url(name), f"/media/{name}")
+
+    def test_metadata(self):
+        name = self.storage.save("dog.png", ContentFile(b"content"))
+        self.assertEqual(
+            self.storage.metadata(name), {"size": 7, "content_type": "image/png"}
+        )
+        self.assertIsNone(self.storage.metadata("missing.png"))
+
+    def test_list_files_by_prefix(self):
+        self.storage.save("uploads/1/a.jpg", ContentFile(b"x"))
+        name = self.storage.save("photo.jpg", ContentFile(b"x"))
+        self.storage._save("uploads/1/a.jpg", ContentFile(b"x"))
+        self.assertEqual(
+            [name for name, _ in self.storage.list_files("uploads/")],
+            ["uploads/1/a.jpg"],
+        )
+        self.assertEqual(self.storage.delete_many([name]), [])
+        self.assertFalse(self.storage.exists(name))
@@ -0,0 +1,122 @@
+import base64
+from unittest.mock import patch
+
+from api.models import User
+from api.tests.fake_data import FakeUser
+from api.throttling import TokenBuckets, buckets, parse_rate
+from api.views import BulkPostsView
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+THROTTLE = {"RATES": {"login": "2/min"}, "CACHE": "", "SYNC_INTERVAL": 1}
+
+
+class TokenBucketsTest(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("10/min"), (10, 10 / 60))
+        self.assertEqual(parse_rate("2/sec"), (2, 2))
+
+    def test_takes_and_refills_tokens(self):
+        store = TokenBuckets()
+        key = ("scope", "ip:127.0.0.1")
+        self.assertEqual(store.take(key, 2, 1, now=100), 0)
+        self.assertEqual(store.take(key, 2, 1, now=100), 0)
+        self.assertEqual(store.take(key, 2, 1, now=100.25), 0.75)
+        self.assertEqual(store.take(key, 2, 1, now=101), 0)
+        # Other clients have their own bucket.
+        self.assertEqual(store.take(("scope", "user:1"), 2, 1, now=101), 0)
+
+    def test_takes_several_tokens(self):
+        store = TokenBuckets()
+        self.assertEqual(store.take("key", 2, 1, now=100, tokens=2), 0)
+        self.assertEqual(store.take("key", 2, 1, now=100.5, tokens=2), 1.5)
+        # Requests above the capacity need a full bucket and leave a debt.
+        self.assertEqual(store.take("key", 2, 1, now=102, tokens=5), 0)
+        self.assertEqual(store.take("key", 2, 1, now=104, tokens=1), 2)
+
+    @patch("api.throttling.MAX_BUCKETS", 2)
+    def test_evicts_least_recently_used_bucket(self):
+        store = TokenBuckets()
+        store.take("first", 1, 0.001, now=100)
+        store.take("second", 1, 0.001, now=100)
+        self.assertGreater(store.take("first", 1, 0.001, now=100), 0)
+        store.take("third", 1, 0.001, now=100)
+        self.assertEqual(list(store.buckets), ["first", "third"])
+
+    @override_settings(THROTTLE={**THROTTLE, "CACHE": "default"})
+    def test_syncs_buckets_through_cache(self):
+        caches["default"].clear()
+        first, second = TokenBuckets(), TokenBuckets()
+        key = ("scope", "user:1")
+        self.assertEqual(first.take(key, 2, 0.001, now=100), 0)
+        first.sync_if_due(now=100)
+        self.assertEqual(second.take(key, 2, 0.001, now=100), 0)
+        second.sync_if_due(now=100)
+        # The shared bucket is now empty.
+        self.assertGreater(second.take(key, 2, 0.001, now=100), 0)
+
+
+@override_settings(THROTTLE=THROTTLE)
+class LoginThrottleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_data = FakeUser().data
+        User.objects.create_user(**cls.user_data)
+
+    def setUp(self):
+        buckets.buckets.clear()
+
+    def login(self, password, **extra):
+        credentials = f"{self.user_data['username']}:{password}".encode()
+        return self.client.post(
+            reverse("login"),
+            HTTP_AUTHORIZATION=f"Basic {base64.b64encode(credentials).decode()}",
+            **extra,
+        )
+
+    def test_throttles_before_authentication(self):
+        self.assertEqual(self.login("wrong").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            self.login(self.user_data["password"]).status_code, status.HTTP_200_OK
+        )
+        response = self.login(self.user_data["password"])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
+    def test_ignores_forwarded_for_header(self):
+        responses = [
+            self.login("wrong", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}") for i in range(3)
+        ]
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+
+    @override_settings(THROTTLE={**THROTTLE, "RATES": {"create_post": "3/min"}})
+    def test_bulk_posts_take_a_token_per_item(self):
+        user = User.objects.get(username=self.user_data["username"])
+        statuses = []
+        for _ in range(2):
+            request = APIRequestFactory().post(
+                reverse("bulk_posts"), [{}, {}], format="json"
+            )
+            force_authenticate(request, user)
+            statuses.append(BulkPostsView.as_view()(request).status_code)
+        self.assertEqual(
+            statuses,
+            [status.HTTP_400_BAD_REQUEST, status.HTTP_429_TOO_MANY_REQUESTS],
+        )
+
+    def test_other_views_are_not_throttled(self):
+        for _ in range(3):
+            response = self.client.post(
+                reverse("register_user"), {}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,9 @@
+import base64
 import json
 from unittest.mock import patch
 
-from api.models import Species, Pet, User, Post, Breed
+from api.cache import post_cache
+from api.models import Color, Comment, Job, Species, Pet, User, Post, Breed
 from api.tests.fake_data import (
     FakeUser,
     FakePet,
@@ -9,8 +11,21 @@ from api.tests.fake_data import (
     fake_image_file,
 )
 from api.tests.exceptions import TestException
-from api.views import BreedsListView, PostView, PostsView, ProfileView, RegisterUserView
-from django.test import TestCase
+from api.views import (
+    BreedsListView,
+    BulkPostsView,
+    CommentsView,
+    PostView,
+    PostsView,
+    ProfileView,
+    RegisterUserView,
+    UploadsView,
+)
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIRequestFactory, APIClient, force_authenticate
@@ -65,6 +80,19 @@ class ProfileViewTest(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertNotEqual(len(response.data), 0)
 
+    def test_get_hides_deleted_posts(self):
+        pet = Pet.objects.create(**FakePet().data)
+        posts = [
+            Post.objects.create(user=self.user, pet=pet, **FakePost().data)
+            for _ in range(2)
+        ]
+        posts[0].soft_delete()
+        request = self.factory.get(self.url)
+        force_authenticate(request, self.user)
+        response = ProfileView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["posts"]), 1)
+
     def test_put_200_response(self):
         data = FakeUser().exclude(["password"])
         request = self.factory.put(self.url, data, format="json")
@@ -116,7 +144,7 @@ class ProfileViewTest(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertNotEqual(len(response.data), 0)
 
-    @patch("api.models.User.delete")
+    @patch("api.models.User.soft_delete")
     def test_delete_500_response(self, mock_delete):
         mock_delete.side_effect = TestException()
         request = self.factory.delete(self.url)
@@ -131,7 +159,9 @@ class PostsViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.user = User.objects.create_user(**FakeUser().data)
-        cls.breed = Breed.objects.create(name="American Shorthair", species=Species.CAT)
+        cls.breed, _ = Breed.objects.get_or_create(
+            name="American Shorthair", species=Species.CAT
+        )
         cls.pet = Pet.objects.create(**FakePet().data)
         cls.pet.breed.set([cls.breed])
         for _ in range(3):
@@ -193,6 +223,180 @@ class PostsViewTest(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertNotEqual(len(response.data), 0)
 
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_post_json_201_response(self, mock_metadata):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/jpeg"}
+        data = FakePost().data
+        data["pet"] = FakePet().data
+        data["photos"] = [f"uploads/{self.user.pk}/a.jpg"]
+        request = self.factory.post(self.url, data, format="json")
+        force_authenticate(request, self.user)
+        response = PostsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.latest("pk")
+        self.assertEqual(post.photos.get().file.name, data["photos"][0])
+        mock_metadata.assert_called_once_with(data["photos"][0])
+
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_post_json_400_response_for_unknown_upload(self, mock_metadata):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/jpeg"}
+        data = FakePost().data
+        data["pet"] = FakePet().data
+        data["photos"] = ["uploads/0/a.jpg"]
+        request = self.factory.post(self.url, data, format="json")
+        force_authenticate(request, self.user)
+        response = PostsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("uploaded_photos", response.data)
+        mock_metadata.assert_not_called()
+
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_post_json_400_response_for_repeated_or_too_many_uploads(
+        self, mock_metadata
+    ):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/jpeg"}
+        count = Post.objects.count()
+        prefix = f"uploads/{self.user.pk}/"
+        too_many = [f"{prefix}{i}.jpg" for i in range(3)]
+        for photos in [[f"{prefix}a.jpg", f"{prefix}a.jpg"], too_many]:
+            data = FakePost().data
+            data["pet"] = FakePet().data
+            data["photos"] = photos
+            request = self.factory.post(self.url, data, format="json")
+            force_authenticate(request, self.user)
+            with self.settings(
+                PHOTO_UPLOADS={**settings.PHOTO_UPLOADS, "MAX_COUNT": 2}
+            ):
+                response = PostsView.as_view()(request)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("uploaded_photos", response.data)
+        self.assertEqual(Post.objects.count(), count)
+
+
+class BulkPostsViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.breed, _ = Breed.objects.get_or_create(name="Beagle", species=Species.DOG)
+        cls.url = reverse("bulk_posts")
+        cls.factory = APIRequestFactory()
+
+    def item(self, photos=()):
+        data = FakePost().data
+        data["pet"] = FakePet().data
+        data["pet"]["breed"] = [self.breed.pk]
+        data["photos"] = [f"uploads/{self.user.pk}/{photo}" for photo in photos]
+        return data
+
+    def post(self, data):
+        request = self.factory.post(self.url, data, format="json")
+        force_authenticate(request, self.user)
+        return BulkPostsView.as_view()(request)
+
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_post_201_response(self, mock_metadata):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/png"}
+        data = [self.item(["a.png", "b.png"]), self.item(), self.item(["c.png"])]
+        response = self.post(data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(
+            [result["post"]["photo_count"] for result in response.data], [2, 0, 1]
+        )
+        for post in Post.objects.all():
+            self.assertEqual(post.photos.count(), post.photo_count)
+            self.assertEqual(list(post.pet.breed.all()), [self.breed])
+
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_post_207_response(self, mock_metadata):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/png"}
+        invalid = self.item()
+        del invalid["status"]
+        response = self.post([self.item(["a.png"]), invalid, self.item(["a.png"])])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result["status"] for result in response.data], [201, 400, 400]
+        )
+        self.assertIn("status", response.data[1]["errors"])
+        self.assertIn("uploaded_photos", response.data[2]["errors"])
+        self.assertEqual(Post.objects.count(), 1)
+
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_validates_posts_together(self, mock_metadata):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/png"}
+        color = Color.objects.create(name="Black", hex="000000")
+
+        def count_queries(size):
+            # Posts of earlier tests may have been cached under the same pks.
+            post_cache().clear()
+            items = [self.item([f"{size}-{i}.png"]) for i in range(size)]
+            for item in items:
+                item["pet"]["eye_colors"] = [color.pk]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(items)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(5))
+
+    @patch("api.storage.InMemoryStorage.metadata")
+    def test_post_rejects_repeated_upload_key(self, mock_metadata):
+        mock_metadata.return_value = {"size": 1024, "content_type": "image/png"}
+        response = self.post([self.item(["a.png", "a.png"]), self.item(["b.png"])])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result["status"] for result in response.data], [400, 201])
+        self.assertIn("uploaded_photos", response.data[0]["errors"])
+        self.assertEqual(Post.objects.get().photo_count, 1)
+
+    def test_post_400_response(self):
+        invalid = self.item()
+        del invalid["pet"]
+        response = self.post([invalid, "not a post"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(Post.objects.count(), 0)
+
+        with self.settings(BULK_POSTS={"MAX_ITEMS": 1}):
+            response = self.post([self.item(), self.item()])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UploadsViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**FakeUser().data)
+        cls.url = reverse("uploads")
+        cls.factory = APIRequestFactory()
+
+    @patch("api.storage.InMemoryStorage.generate_upload")
+    def test_post_201_response(self, mock_generate_upload):
+        mock_generate_upload.return_value = {"url": "url", "fields": {}}
+        data = {
+            "photos": [{"content_type": "image/jpeg"}, {"content_type": "image/png"}]
+        }
+        request = self.factory.post(self.url, data, format="json")
+        force_authenticate(request, self.user)
+        response = UploadsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(response.data[0]["key"].startswith(f"uploads/{self.user.pk}/"))
+        self.assertTrue(response.data[0]["key"].endswith(".jpg"))
+        self.assertEqual(response.data[0]["url"], "url")
+
+    def test_post_400_response(self):
+        data = {"photos": [{"content_type": "text/html"}]}
+        request = self.factory.post(self.url, data, format="json")
+        force_authenticate(request, self.user)
+        response = UploadsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_post_401_response(self):
+        data = {"photos": [{"content_type": "image/jpeg"}]}
+        request = self.factory.post(self.url, data, format="json")
+        response = UploadsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
 
 class PostViewTest(TestCase):
     @classmethod
@@ -242,6 +446,11 @@ class PostViewTest(TestCase):
         response = PostView.as_view()(request, **self.kwargs)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+        request = self.factory.get(self.url)
+        response = PostView.as_view()(request, **self.kwargs)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Job.objects.filter(name="api.tasks.purge_post").exists())
+
     def test_delete_404_response(self):
         request = self.factory.delete(self.url)
         force_authenticate(request, self.user)
@@ -251,6 +460,81 @@ class PostViewTest(TestCase):
         self.assertNotEqual(len(response.data), 0)
 
 
+class CommentsViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(**FakeUser().data)
+        pet = Pet.objects.create(**FakePet().data)
+        cls.post = Post.objects.create(user=cls.user, pet=pet, **FakePost().data)
+        # Three top-level comments, each with a chain of three nested replies.
+        for i in range(3):
+            parent = Comment.objects.create(
+                user=cls.user, post=cls.post, content=f"comment {i}"
+            )
+            for j in range(3):
+                parent = Comment.objects.create(
+                    user=cls.user, post=cls.post, reply_to=parent, content="reply"
+                )
+        cls.kwargs = {"pk": cls.post.id}
+        cls.url = reverse("comments", kwargs=cls.kwargs)
+        cls.factory = APIRequestFactory()
+
+    def test_get_200_response(self):
+        request = self.factory.get(self.url)
+        with self.assertNumQueries(3):
+            response = CommentsView.as_view()(request, **self.kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(len(response.data["results"]), 3)
+        node = response.data["results"][0]
+        self.assertEqual(node["user"], self.user.username)
+        for depth in range(1, 4):
+            self.assertEqual(len(node["replies"]), 1)
+            node = node["replies"][0]
+            self.assertEqual(node["depth"], depth)
+        self.assertEqual(node["replies"], [])
+
+    def test_get_anonymizes_comments_of_deleted_users(self):
+        other = User.objects.create(**FakeUser().data)
+        Comment.objects.create(
+            user=other,
+            post=self.post,
+            reply_to=Comment.objects.filter(reply_to=None).first(),
+            content="secret",
+        )
+        other.soft_delete()
+        request = self.factory.get(self.url)
+        response = CommentsView.as_view()(request, **self.kwargs)
+        replies = response.data["results"][0]["replies"]
+        self.assertEqual(len(replies), 2)
+        self.assertEqual(replies[1]["user"], None)
+        self.assertEqual(replies[1]["content"], "")
+
+    def test_get_paginates_top_level_comments(self):
+        request = self.factory.get(self.url, {"offset": 1, "limit": 1})
+        response = CommentsView.as_view()(request, **self.kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["content"], "comment 1")
+        self.assertEqual(response.data["next"], 2)
+
+    def test_get_caps_depth(self):
+        request = self.factory.get(self.url, {"depth": 1})
+        response = CommentsView.as_view()(request, **self.kwargs)
+        reply = response.data["results"][0]["replies"][0]
+        self.assertEqual(reply["replies"], [])
+
+    def test_get_400_response(self):
+        request = self.factory.get(self.url, {"limit": "all"})
+        response = CommentsView.as_view()(request, **self.kwargs)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_404_response(self):
+        request = self.factory.get(self.url)
+        response = CommentsView.as_view()(request, pk=-1)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class BreedListViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -272,3 +556,44 @@ class BreedListViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertIsInstance(response.data, dict)
         self.assertNotEqual(len(response.data), 0)
+
+
+@override_settings(
+    PASSWORD_HASHERS=[
+        "api.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ],
+    ARGON2={"TIME_COST": 1, "MEMORY_COST": 8, "PARALLELISM": 1},
+)
+class LoginViewTest(TestCase):
+    def setUp(self):
+        self.user_data = FakeUser().data
+        self.user = User.objects.create_user(**self.user_data)
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password(self.user_data["password"], hasher="md5")
+        )
+        Post.objects.create(
+            pet=Pet.objects.create(**FakePet().data), user=self.user, **FakePost().data
+        )
+
+    def login(self):
+        credentials = f"{self.user_data['username']}:{self.user_data['password']}"
+        credentials = base64.b64encode(credentials.encode()).decode()
+        return self.client.post(
+            reverse("login"), HTTP_AUTHORIZATION=f"Basic {credentials}"
+        )
+
+    def test_login_returns_minimal_user(self):
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()["user"],
+            {"username": self.user.username, "nickname": self.user.nickname},
+        )
+
+    def test_login_rehashes_password(self):
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("argon2$argon2id$"))
+        self.assertIn("m=8,t=1,p=1", self.user.password)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
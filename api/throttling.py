@@ -0,0 +1,172 @@
+"""
+Rate limiting with token buckets, per user or per client address.
+
+Views opt in with a throttle_scope that has a rate in THROTTLE["RATES"],
+such as "10/min". Every client of a scope has a bucket that holds up to 10
+tokens and refills at 10 tokens a minute, so that short bursts are allowed
+but the long-run rate is not exceeded. Clients are authenticated users, or
+addresses when the request is not authenticated (yet). Views that do the
+work of several requests at once, such as bulk creates, can take several
+tokens per request with a throttle_cost(request) method.
+
+Buckets live in the memory of each process, which keeps a check down to a
+dictionary lookup and some arithmetic. When THROTTLE["CACHE"] is set, every
+process merges the tokens it took into buckets kept in that cache at most
+every SYNC_INTERVAL seconds, so that the limits hold, approximately, across
+worker processes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+# Number of buckets kept per process. The least recently used bucket is
+# dropped to make room for a new one, which starts full again if its
+# client comes back.
+MAX_BUCKETS = 100000
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate) -> tuple:
+    """
+    Return the capacity and the tokens added per second of a rate such as
+    "10/min", in the format of rest_framework rates.
+    """
+    count, period = rate.split("/")
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+class TokenBuckets:
+    """The token buckets of a process, keyed by (scope, client)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Lists of [tokens, updated at, capacity, rate] by key, least
+        # recently used first.
+        self.buckets = OrderedDict()
+        # Tokens taken by key since the last sync.
+        self.taken = dict()
+        self.synced_at = 0.0
+
+    def take(self, key, capacity, rate, now, tokens=1) -> float:
+        """
+        Take tokens from the bucket of key. Return 0 if there were enough, or
+        else the seconds until there are. Taking more tokens than the
+        capacity needs a full bucket and leaves it in debt, so that the
+        long-run rate still holds.
+        """
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= MAX_BUCKETS:
+                    self.buckets.popitem(last=False)
+                bucket = self.buckets[key] = [capacity, now, capacity, rate]
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            needed = min(tokens, capacity)
+            if bucket[0] < needed:
+                return (needed - bucket[0]) / rate
+            bucket[0] -= tokens
+            self.taken[key] = self.taken.get(key, 0) + tokens
+            return 0
+
+    def sync_if_due(self, now):
+        """Merge the buckets with the shared cache if SYNC_INTERVAL has passed."""
+        if not settings.THROTTLE["CACHE"]:
+            return
+        if now - self.synced_at >= settings.THROTTLE["SYNC_INTERVAL"]:
+            self.sync(now)
+
+    def sync(self, now):
+        """
+        Take the tokens taken in this process since the last sync from the
+        buckets in the shared cache, and continue from the shared buckets.
+        Tokens taken by several processes at the same time can be lost.
+        """
+        with self.lock:
+            self.synced_at = now
+            taken, self.taken = self.taken, dict()
+            # Evicted buckets have nothing left to merge.
+            limits = {
+                key: self.buckets[key][2:] for key in taken if key in self.buckets
+            }
+        if not limits:
+            return
+
+        cache = caches[settings.THROTTLE["CACHE"]]
+        cache_keys = {key: "throttle:{}:{}".format(*key) for key in limits}
+        shared = cache.get_many(cache_keys.values())
+        merged = dict()
+        for key, (capacity, rate) in limits.items():
+            tokens, updated = shared.get(cache_keys[key], (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            # Buckets may be in debt after requests that cost more tokens
+            # than their capacity.
+            merged[key] = tokens - taken[key]
+        # Buckets that are not taken from are full again before they expire.
+        timeout = max(capacity / rate for capacity, rate in limits.values()) + 1
+        cache.set_many(
+            {cache_keys[key]: (tokens, now) for key, tokens in merged.items()},
+            timeout=timeout,
+        )
+
+        with self.lock:
+            for key, tokens in merged.items():
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket[0] = min(bucket[0], tokens)
+
+    def after_fork(self):
+        # The lock is replaced in case another thread held it during the fork.
+        self.lock = threading.Lock()
+
+
+buckets = TokenBuckets()
+os.register_at_fork(after_in_child=buckets.after_fork)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles the requests of views whose throttle_scope has a rate in
+    THROTTLE["RATES"]. Other views are not throttled.
+    """
+
+    def allow_request(self, request, view):
+        rate = settings.THROTTLE["RATES"].get(getattr(view, "throttle_scope", None))
+        if rate is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        cost = getattr(view, "throttle_cost", None)
+        now = time.time()
+        self.wait_time = buckets.take(
+            (view.throttle_scope, self.get_client(request)),
+            capacity,
+            per_second,
+            now,
+            tokens=1 if cost is None else cost(request),
+        )
+        buckets.sync_if_due(now)
+        return self.wait_time == 0
+
+    def get_client(self, request) -> str:
+        # request.user would authenticate the request, so the user is only
+        # used once authentication has run. Views can then be throttled
+        # before they authenticate, by address. get_ident() only trusts
+        # X-Forwarded-For as far as REST_FRAMEWORK["NUM_PROXIES"] allows.
+        user = getattr(request, "_user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def wait(self):
+        return self.wait_time
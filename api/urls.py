@@ -1,15 +1,28 @@
+from django.conf import settings
 from django.urls import include, path
 
 from knox import views as knox_views
-from api import views
+from api import async_views, views
+
+if settings.ASYNC_VIEWS:
+    PostsView = async_views.AsyncPostsView
+    PostView = async_views.AsyncPostView
+    BreedsListView = async_views.AsyncBreedsListView
+else:
+    PostsView = views.PostsView
+    PostView = views.PostView
+    BreedsListView = views.BreedsListView
 
 urlpatterns = [
     path("profile", views.ProfileView.as_view(), name="profile"),
-    path("posts", views.PostsView.as_view(), name="posts"),
-    path("posts/<str:pk>", views.PostView.as_view(), name="post"),
+    path("posts", PostsView.as_view(), name="posts"),
+    path("posts/bulk", views.BulkPostsView.as_view(), name="bulk_posts"),
+    path("posts/<str:pk>", PostView.as_view(), name="post"),
+    path("uploads", views.UploadsView.as_view(), name="uploads"),
+    path("posts/<str:pk>/comments", views.CommentsView.as_view(), name="comments"),
     path("register", views.RegisterUserView.as_view(), name="register_user"),
     path("login", views.LoginView.as_view(), name="login"),
     path("logout", knox_views.LogoutView.as_view(), name="logout"),
     path("logoutall", knox_views.LogoutAllView.as_view(), name="logout_all"),
-    path("pets/breeds", views.BreedsListView.as_view(), name="breeds"),
+    path("pets/breeds", BreedsListView.as_view(), name="breeds"),
 ]
@@ -1,5 +1,10 @@
 import logging
+import mimetypes
+import uuid
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
@@ -9,16 +14,23 @@ from rest_framework.serializers import ValidationError
 from rest_framework.authentication import BasicAuthentication
 from knox.views import LoginView as KnoxLoginView
 
-from api.models import Breed, Post
+from api.cache import get_serialized_breeds, get_serialized_posts
+from api.idempotency import idempotent
+from api.metrics import CONTENT_TYPE, collect, render
+from api.models import Comment, Post
 from api.serializers import (
-    BreedSerializer,
+    build_comment_tree,
     CreatePostSerializer,
+    PhotoUploadsSerializer,
     RegisterUserSerializer,
     UserSerializer,
     PostSerializer,
+    upload_prefix,
 )
 from api.parsers import MultiPartJSONParser
-from api.permissions import IsOwnerOrReadOnly
+from api.permissions import IsMetricsClient, IsOwnerOrReadOnly
+from api.purge import purge_time
+from api.tasks import purge_post, purge_user
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +61,10 @@ class ProfileView(APIView):
 
     def delete(self, request):
         try:
-            request.user.delete()
+            request.user.soft_delete()
+            purge_user.delay(
+                run_at=purge_time(request.user.deleted_at), user_id=request.user.pk
+            )
             return response_204()
         except Exception as exc:
             logger.exception(exc)
@@ -60,18 +75,28 @@ class PostsView(APIView):
     """A View class for reading and creating new posts."""
 
     permission_classes = [IsAuthenticatedOrReadOnly]
-    parser_classes = [MultiPartJSONParser]
+    parser_classes = [MultiPartJSONParser, JSONParser]
+    # Multipart fields that MultiPartJSONParser decodes as json.
+    json_fields = ["pet"]
+    throttle_scope = "create_post"
+
+    def get_throttles(self):
+        # Reading posts is cheap, creating them is not.
+        if self.request.method == "POST":
+            return super().get_throttles()
+        return []
 
     def get(self, request):
-        posts = Post.objects.select_related("pet", "user").prefetch_related("photos")
-        serializer = PostSerializer(posts, many=True)
-        return response_200(serializer.data)
+        pks = list(Post.objects.alive().values_list("pk", flat=True))
+        return response_200(get_serialized_posts(pks))
 
+    @idempotent
     def post(self, request):
-        data = request.data
-        data["photos"] = [
-            {"order": i, "file": file} for i, file in enumerate(data["photos"])
-        ]
+        try:
+            multipart = request.content_type.startswith("multipart/")
+            data = post_data(request.data, multipart)
+        except ValidationError as exc:
+            return response_400(exc.detail)
         serializer = CreatePostSerializer(data=data, context={"user": request.user})
 
         try:
@@ -84,6 +109,115 @@ class PostsView(APIView):
             logger.exception(exc)
             return response_500()
 
+    def replay_data(self, data):
+        # Stored responses hold presigned photo URLs that expire long before
+        # the idempotency key, so the post is serialized again. Every new
+        # post has a pet of its own, which identifies it.
+        post = Post.objects.alive().filter(pet_id=data["pet"]["id"]).first()
+        if post is None:
+            return data
+        return CreatePostSerializer(post).data
+
+
+class BulkPostsView(APIView):
+    """
+    A View class for creating many posts at once, e.g. for shelters. Valid
+    posts are created together and errors are reported for the others.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+    # Shares the rate of PostsView, and every post takes a token.
+    throttle_scope = "create_post"
+
+    def throttle_cost(self, request) -> int:
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return 1
+        return min(len(items), settings.BULK_POSTS["MAX_ITEMS"])
+
+    def post(self, request):
+        items = request.data
+        max_items = settings.BULK_POSTS["MAX_ITEMS"]
+        if not isinstance(items, list) or not items:
+            return response_400({"non_field_errors": ["Expected a list of posts."]})
+        if len(items) > max_items:
+            return response_400(
+                {"non_field_errors": [f"At most {max_items} posts can be created."]}
+            )
+
+        results = [None] * len(items)
+        data, indexes = [], []
+        for i, item in enumerate(items):
+            try:
+                data.append(post_data(item))
+                indexes.append(i)
+            except ValidationError as exc:
+                results[i] = {
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": exc.detail,
+                }
+
+        # One serializer validates all posts, so that related objects and
+        # uploads are looked up once rather than once per post.
+        serializer = CreatePostSerializer(
+            data=data, many=True, context={"user": request.user}
+        )
+        valid = serializer.is_valid()
+        for i, errors in zip(indexes, serializer.item_errors):
+            if errors is not None:
+                results[i] = {"status": status.HTTP_400_BAD_REQUEST, "errors": errors}
+        if not valid:
+            return response_400(results)
+
+        try:
+            posts = serializer.save()
+            created = iter(get_serialized_posts([post.pk for post in posts]))
+        except Exception as exc:
+            logger.exception(exc)
+            return response_500()
+
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = {"status": status.HTTP_201_CREATED, "post": next(created)}
+        if len(posts) < len(items):
+            return response_207(results)
+        return response_201(results)
+
+
+class UploadsView(APIView):
+    """
+    A View class for requesting presigned uploads, so that clients can send
+    photos straight to storage and reference them when creating a post.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+
+    def post(self, request):
+        serializer = PhotoUploadsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return response_400(serializer.errors)
+
+        options = settings.PHOTO_UPLOADS
+        try:
+            uploads = []
+            for photo in serializer.validated_data["photos"]:
+                content_type = photo["content_type"]
+                extension = mimetypes.guess_extension(content_type) or ""
+                key = f"{upload_prefix(request.user)}{uuid.uuid4().hex}{extension}"
+                upload = default_storage.generate_upload(
+                    key,
+                    content_type,
+                    options["MAX_SIZE"],
+                    expires_in=options["EXPIRES_IN"],
+                )
+                uploads.append({"key": key, **upload})
+            return response_201(uploads)
+        except Exception as exc:
+            logger.exception(exc)
+            return response_500()
+
 
 class PostView(APIView):
     """A View class for retrieve/update/delete for a pet."""
@@ -93,18 +227,17 @@ class PostView(APIView):
 
     def get(self, request, pk=None):
         try:
-            post = (
-                Post.objects.select_related("pet").prefetch_related("photos").get(pk=pk)
-            )
-        except ObjectDoesNotExist:
+            posts = get_serialized_posts([int(pk)])
+        except ValueError:
             return response_404()
 
-        serializer = PostSerializer(post)
-        return response_200(serializer.data)
+        if not posts:
+            return response_404()
+        return response_200(posts[0])
 
     def put(self, request, pk=None):
         try:
-            post = Post.objects.get(pk=pk)
+            post = Post.objects.alive().get(pk=pk)
         except ObjectDoesNotExist:
             return response_404()
 
@@ -122,24 +255,71 @@ class PostView(APIView):
 
     def delete(self, request, pk=None):
         try:
-            post = Post.objects.get(pk=pk)
+            post = Post.objects.alive().get(pk=pk)
         except ObjectDoesNotExist:
             return response_404()
 
         self.check_object_permissions(request, post)
         try:
-            post.delete()
+            post.soft_delete()
+            purge_post.delay(run_at=purge_time(post.deleted_at), post_id=post.pk)
             return response_204()
         except Exception as exc:
             logger.exception(exc)
             return response_500()
 
 
+class CommentsView(APIView):
+    """
+    A View class for reading the comment threads of a post.
+
+    Threads are paginated by top-level comment using the "offset" and "limit"
+    query parameters, and replies are only returned up to "depth" levels
+    below each top-level comment.
+    """
+
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, pk=None):
+        try:
+            offset = int(request.query_params.get("offset", 0))
+            limit = min(
+                int(request.query_params.get("limit", settings.COMMENTS["PAGE_SIZE"])),
+                settings.COMMENTS["MAX_PAGE_SIZE"],
+            )
+            depth = min(
+                int(request.query_params.get("depth", settings.COMMENTS["MAX_DEPTH"])),
+                settings.COMMENTS["MAX_DEPTH"],
+            )
+        except ValueError:
+            return response_400({"detail": "offset, limit and depth must be integers."})
+        if offset < 0 or limit < 1 or depth < 0:
+            return response_400({"detail": "offset, limit and depth must be positive."})
+
+        if not Post.objects.alive().filter(pk=pk).exists():
+            return response_404()
+
+        count = Comment.objects.filter(post_id=pk, reply_to=None).count()
+        comments = Comment.objects.thread(
+            pk, offset=offset, limit=limit, max_depth=depth
+        )
+        next_offset = offset + limit if offset + limit < count else None
+        return response_200(
+            {
+                "count": count,
+                "next": next_offset,
+                "results": build_comment_tree(comments),
+            }
+        )
+
+
 class RegisterUserView(APIView):
     """A View class for registering new users."""
 
     parser_classes = [JSONParser]
+    throttle_scope = "register"
 
+    @idempotent
     def post(self, request):
         serializer = RegisterUserSerializer(data=request.data)
         if serializer.is_valid():
@@ -155,6 +335,16 @@ class RegisterUserView(APIView):
 
 class LoginView(KnoxLoginView):
     authentication_classes = [BasicAuthentication]
+    throttle_scope = "login"
+
+    def perform_authentication(self, request):
+        # BasicAuthentication hashes the password, so requests are throttled
+        # by address before they are authenticated instead of after.
+        super().check_throttles(request)
+        super().perform_authentication(request)
+
+    def check_throttles(self, request):
+        pass
 
 
 class BreedsListView(APIView):
@@ -163,9 +353,43 @@ class BreedsListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        breeds = Breed.objects.all()
-        serializer = BreedSerializer(breeds, many=True)
-        return response_200(serializer.data)
+        return response_200(get_serialized_breeds())
+
+
+class MetricsView(APIView):
+    """
+    A View class for scraping the metrics of all views, storage calls and
+    caches in the Prometheus text format. See api.metrics.
+    """
+
+    # Scrapers are identified by a token from the settings or by their
+    # address, which keeps the token lookup of authentication out of every
+    # scrape.
+    authentication_classes = []
+    permission_classes = [IsMetricsClient]
+
+    def get(self, request):
+        return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+def post_data(data, multipart=False):
+    """
+    Return the data of a create post request in the form expected by
+    CreatePostSerializer. Photos are files in multipart requests, and keys
+    of photos uploaded through UploadsView in json requests.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({"non_field_errors": ["Expected an object."]})
+    photos = data.pop("photos", [])
+    if not isinstance(photos, list):
+        raise ValidationError({"photos": ["Expected a list of items."]})
+    if multipart:
+        data["photos"] = [{"order": i, "file": file} for i, file in enumerate(photos)]
+    else:
+        data["uploaded_photos"] = [
+            {"order": i, "key": key} for i, key in enumerate(photos)
+        ]
+    return data
 
 
 def response_200(data):
@@ -176,6 +400,10 @@ def response_201(data):
     return Response(data=data, status=status.HTTP_201_CREATED)
 
 
+def response_207(data):
+    return Response(data=data, status=status.HTTP_207_MULTI_STATUS)
+
+
 def response_204():
     return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -0,0 +1,229 @@
+"""
+Load test the main api endpoints in process, against a seeded database.
+
+A test database is created from the migrations and seeded by the
+generate_data command with users, pets, posts, photos and comments, and
+storage is replaced with an in-memory backend so that the results measure
+our code rather than S3. Each scenario is then run by
+--concurrency threads, every one with its own test client and user, for
+--duration seconds. Throughput, latency percentiles and database queries
+per request (counted by api.instrumentation) are printed, and saved as json
+to --output to compare them across commits:
+
+    python -m benchmarks.api --users 500 --posts 5000 --output before.json
+
+Pass --keepdb to reuse the seeded database on the next run.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from uuid import uuid4
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "furlorn_restapi.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+from knox.models import AuthToken  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from api.instrumentation import stats  # noqa: E402
+from api.models import Breed, Post, Species, User  # noqa: E402
+
+
+def jpeg() -> bytes:
+    image = BytesIO()
+    Image.new("RGB", (100, 100)).save(image, "JPEG")
+    return image.getvalue()
+
+
+def create_post(client, context):
+    pet = {"name": "Yuna", "species": Species.CAT, "breed": [context["breed"]]}
+    photo = SimpleUploadedFile(f"{uuid4()}.jpg", context["jpeg"], "image/jpeg")
+    return client.post(
+        "/api/posts",
+        {
+            "description": "Seen near the park.",
+            "location_lat": 20,
+            "location_long": 25,
+            "status": Post.Status.LOST,
+            "pet": json.dumps(pet),
+            "photos": [photo],
+        },
+    )
+
+
+SCENARIOS = {
+    "list posts": lambda client, context: client.get("/api/posts"),
+    "get post": lambda client, context: client.get(
+        f"/api/posts/{random.choice(context['post_pks'])}"
+    ),
+    "profile": lambda client, context: client.get("/api/profile"),
+    "breeds": lambda client, context: client.get("/api/pets/breeds"),
+    "create post": create_post,
+}
+
+
+def worker(scenario, token, context, deadline, latencies, errors):
+    client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = scenario(client, context)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+    finally:
+        connections.close_all()
+
+
+def run(scenario, tokens, context, duration) -> dict:
+    stats.reset()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(scenario, token, context, deadline, latencies, errors),
+        )
+        for token in tokens
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    requests = stats.snapshot()["requests"]
+    count = sum(entry["count"] for entry in requests)
+    queries = sum(entry["db_queries"] for entry in requests)
+
+    def percentile(q):
+        return latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / duration,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0,
+        "p50_ms": percentile(0.5) if latencies else 0,
+        "p95_ms": percentile(0.95) if latencies else 0,
+        "p99_ms": percentile(0.99) if latencies else 0,
+        "queries_per_request": queries / count if count else 0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument(
+        "--photos", type=int, default=3, help="Maximum number of photos per post."
+    )
+    parser.add_argument(
+        "--comments", type=float, default=3, help="Average comments per post."
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="Scenario to run, may be repeated. Defaults to all.",
+    )
+    parser.add_argument("--output", help="File to write the results to as json.")
+    parser.add_argument("--keepdb", action="store_true")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=1, interactive=False, keepdb=args.keepdb)
+    try:
+        # The scenarios create posts far more often than the rates allow.
+        with override_settings(
+            DEFAULT_FILE_STORAGE="api.storage.InMemoryStorage",
+            THROTTLE={**settings.THROTTLE, "RATES": dict()},
+        ):
+            if not Post.objects.exists():
+                call_command(
+                    "generate_data",
+                    users=args.users,
+                    posts=args.posts,
+                    photos=args.photos,
+                    comments=args.comments,
+                )
+            users = User.objects.order_by("?")[: args.concurrency]
+            tokens = [AuthToken.objects.create(user)[1] for user in users]
+            context = {
+                "post_pks": list(Post.objects.values_list("pk", flat=True)),
+                "breed": Breed.objects.filter(species=Species.CAT).first().pk,
+                "jpeg": jpeg(),
+            }
+
+            results = dict()
+            print(
+                f"{'scenario':<12} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'p99 ms':>8} {'queries':>8} {'errors':>7}"
+            )
+            for name in args.scenario or SCENARIOS:
+                result = results[name] = run(
+                    SCENARIOS[name], tokens, context, args.duration
+                )
+                print(
+                    f"{name:<12} {result['rps']:8.1f} {result['p50_ms']:8.2f} "
+                    f"{result['p95_ms']:8.2f} {result['p99_ms']:8.2f} "
+                    f"{result['queries_per_request']:8.1f} {result['errors']:7}"
+                )
+    finally:
+        if not args.keepdb:
+            teardown_databases(old_config, verbosity=1)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "dataset": {
+                        "users": args.users,
+                        "posts": args.posts,
+                        "photos": args.photos,
+                        "comments": args.comments,
+                    },
+                    "concurrency": args.concurrency,
+                    "duration": args.duration,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compare requests per second and tail latency of the read endpoints served
+by the WSGI (sync DRF views) and ASGI (async views) deployments.
+
+Start both servers against the same database first, for example:
+
+    gunicorn furlorn_restapi.wsgi -w 1 --threads 8 -b 127.0.0.1:8001
+    ASYNC_VIEWS=1 uvicorn furlorn_restapi.asgi:application --port 8002
+
+and then run:
+
+    python -m benchmarks.async_views --wsgi http://127.0.0.1:8001 \\
+        --asgi http://127.0.0.1:8002 --token <knox token>
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+PATHS = ["/api/posts", "/api/posts/{post_id}", "/api/pets/breeds"]
+
+
+def worker(urls, headers, deadline, latencies, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        url = urls[i % len(urls)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers)):
+                pass
+        except (urllib.error.URLError, ConnectionError):
+            errors.append(url)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def run(base_url, args) -> dict:
+    urls = [base_url + path.format(post_id=args.post_id) for path in PATHS]
+    headers = {"Authorization": f"Token {args.token}"} if args.token else {}
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker, args=(urls, headers, deadline, latencies, errors)
+        )
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / args.duration,
+        "p50": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        "mean": statistics.mean(latencies) * 1000 if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--wsgi", required=True, help="Base URL of the WSGI server.")
+    parser.add_argument("--asgi", required=True, help="Base URL of the ASGI server.")
+    parser.add_argument("--token", help="Knox token, required by /api/pets/breeds.")
+    parser.add_argument("--post-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'server':<6} {'rps':>8} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    for name, url in (("wsgi", args.wsgi), ("asgi", args.asgi)):
+        result = run(url, args)
+        print(
+            f"{name:<6} {result['rps']:8.1f} {result['mean']:8.2f} "
+            f"{result['p50']:8.2f} {result['p99']:8.2f} {result['errors']:7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure the latency that persistent and pooled database connections save
+per request.
+
+Every simulated request runs the connection handling Django does around a
+real request (close_old_connections on request start and finish) and one
+trivial query, so the difference between the modes is the cost of opening
+connections. Run it against the database configured in settings:
+
+    python -m benchmarks.connections --requests 1000 --threads 4
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "furlorn_restapi.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db.utils import ConnectionHandler  # noqa: E402
+
+MODES = {
+    "new connection per request": {
+        "ENGINE": "django.db.backends.postgresql",
+        "CONN_MAX_AGE": 0,
+    },
+    "persistent connections": {
+        "ENGINE": "django.db.backends.postgresql",
+        "CONN_MAX_AGE": 60,
+    },
+    "pooled connections": {
+        "ENGINE": "api.db.postgresql_pool",
+        "CONN_MAX_AGE": 0,
+    },
+}
+
+
+def simulate_requests(connections, count, latencies):
+    for _ in range(count):
+        start = time.perf_counter()
+        connection = connections["default"]
+        connection.close_if_unusable_or_obsolete()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        connection.close_if_unusable_or_obsolete()
+        latencies.append(time.perf_counter() - start)
+    connections.close_all()
+
+
+def run(mode, requests, threads) -> list:
+    database = {**settings.DATABASES["default"], **MODES[mode]}
+    database["POOL"] = {"MIN_SIZE": threads, "MAX_SIZE": threads}
+    connections = ConnectionHandler({"default": database})
+    latencies = []
+    workers = [
+        threading.Thread(
+            target=simulate_requests,
+            args=(connections, requests // threads, latencies),
+        )
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'mode':<28} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'saved ms':>9}")
+    for mode in MODES:
+        latencies = sorted(run(mode, args.requests, args.threads))
+        mean = statistics.mean(latencies) * 1000
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        baseline = mean if baseline is None else baseline
+        print(f"{mode:<28} {mean:8.3f} {p50:8.3f} {p99:8.3f} {baseline - mean:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
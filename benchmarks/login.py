@@ -0,0 +1,129 @@
+"""
+Measure the latency and throughput per core of logins.
+
+First every hasher in PASSWORD_HASHERS verifies a password in a loop, in
+--processes processes at once, which is what bounds the logins a server can
+take per core. Then /api/login is called in process against a test database
+with a user that has --posts posts, to measure the whole request:
+
+    python -m benchmarks.login --processes 4 --duration 5
+
+Set ARGON2_TIME_COST and ARGON2_MEMORY_COST to try other Argon2 costs.
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "furlorn_restapi.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.hashers import (  # noqa: E402
+    check_password,
+    get_hasher,
+    get_hashers,
+    make_password,
+)
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+
+from api.models import Pet, Post, User  # noqa: E402
+from api.tests.fake_data import FakePet, FakePost, FakeUser  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def verify(encoded, duration) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        check_password(PASSWORD, encoded)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_hasher(algorithm, processes, duration) -> dict:
+    encoded = make_password(PASSWORD, hasher=get_hasher(algorithm))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(verify, [encoded] * processes, [duration] * processes)
+        latencies = [latency for result in results for latency in result]
+    return {
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "per_core": len(latencies) / duration / processes,
+        "total": len(latencies) / duration,
+    }
+
+
+def run_login(posts, duration) -> dict:
+    data = FakeUser(password=PASSWORD).data
+    user = User.objects.create_user(**data)
+    for _ in range(posts):
+        Post.objects.create(
+            pet=Pet.objects.create(**FakePet().data), user=user, **FakePost().data
+        )
+    credentials = base64.b64encode(f"{data['username']}:{PASSWORD}".encode())
+    client = Client(HTTP_AUTHORIZATION=f"Basic {credentials.decode()}")
+
+    latencies, sizes = [], []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = client.post("/api/login")
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(response.content))
+        assert response.status_code == 200, response.content
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "bytes": statistics.mean(sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument(
+        "--posts", type=int, default=50, help="Number of posts of the user."
+    )
+    args = parser.parse_args()
+
+    print(f"{'hasher':<16} {'ms':>8} {'per core/s':>11} {'total/s':>8}")
+    for hasher in get_hashers():
+        result = run_hasher(hasher.algorithm, args.processes, args.duration)
+        print(
+            f"{hasher.algorithm:<16} {result['mean_ms']:8.2f} "
+            f"{result['per_core']:11.1f} {result['total']:8.1f}"
+        )
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        # The benchmark logs in far more often than the login rate allows.
+        with override_settings(THROTTLE={**settings.THROTTLE, "RATES": dict()}):
+            result = run_login(args.posts, args.duration)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+    print(
+        f"\n/api/login, one core: {result['rps']:.1f} requests/s, "
+        f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+        f"{result['bytes']:.0f} bytes per response"
+    )
+
+
+if __name__ == "__main__":
+    main()
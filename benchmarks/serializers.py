@@ -0,0 +1,80 @@
+"""
+Compare serializing posts with PostSerializer and with read_posts().
+
+A test database is seeded with --posts posts by the generate_data command,
+and all of them are serialized --repeat times both ways, queries included.
+The outputs are also checked to be equal:
+
+    python -m benchmarks.serializers --posts 10000
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "furlorn_restapi.settings")
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+
+from api.cache import post_queryset  # noqa: E402
+from api.models import Post  # noqa: E402
+from api.serializers import PostSerializer, read_posts  # noqa: E402
+
+
+def serialize_instances() -> list:
+    return PostSerializer(post_queryset().order_by("pk"), many=True).data
+
+
+def serialize_values() -> list:
+    return list(read_posts(Post.objects.alive().order_by("pk")).values())
+
+
+def measure(function, repeat) -> tuple:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keepdb", action="store_true")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=1, interactive=False, keepdb=args.keepdb)
+    try:
+        with override_settings(DEFAULT_FILE_STORAGE="api.storage.InMemoryStorage"):
+            if not Post.objects.exists():
+                call_command("generate_data", users=args.users, posts=args.posts)
+            count = Post.objects.alive().count()
+            instances, expected = measure(serialize_instances, args.repeat)
+            values, found = measure(serialize_values, args.repeat)
+    finally:
+        if not args.keepdb:
+            teardown_databases(old_config, verbosity=1)
+
+    assert [dict(data) for data in expected] == found, "The outputs differ."
+    print(f"Serialized {count} posts, median of {args.repeat} runs:")
+    print(f"  PostSerializer   {instances * 1000:10.1f} ms")
+    print(f"  read_posts()     {values * 1000:10.1f} ms")
+    print(f"  speedup          {instances / values:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "api.middleware.LoggingMiddleware",
+    "api.middleware.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -80,28 +81,171 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "furlorn_restapi.wsgi.application"
 
+# Serve the read-only endpoints with the async views in api/async_views.py.
+# Only enable this when running under ASGI, with ASYNC_VIEWS=1, true or yes.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "").lower() in ("1", "true", "yes")
+
 CORS_ALLOW_ALL_ORIGINS = True if DEBUG else False
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "knox.auth.TokenAuthentication",
-    ]
+    ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttling.TokenBucketThrottle",
+    ],
+    # Number of reverse proxies in front of the app. Throttled clients are
+    # identified by the address that the last of them saw, and any other
+    # X-Forwarded-For entries are set by the client. With 0, the header is
+    # ignored.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+}
+
+# Rate limits of expensive views, see api.throttling.
+THROTTLE = {
+    # Rates by throttle_scope of the views, as "<requests>/<period>" with
+    # period one of sec, min, hour or day. Clients may send up to <requests>
+    # at once, after which they are held to the rate.
+    "RATES": {
+        "login": "10/min",
+        "register": "20/hour",
+        "create_post": "30/min",
+    },
+    # Alias of the cache in CACHES in which the worker processes share their
+    # buckets. Leave empty to limit each process on its own.
+    "CACHE": "default" if os.environ.get("REDIS_URL") else "",
+    # Seconds between merges of the buckets of a process with the cache.
+    "SYNC_INTERVAL": 1,
 }
 
 REST_KNOX = {
-    "USER_SERIALIZER": "api.serializers.UserSerializer",
+    # The user in the response of /api/login. /api/profile returns the rest.
+    "USER_SERIALIZER": "api.serializers.LoginUserSerializer",
     "TOKEN_TTL": timedelta(days=1),
     "AUTO_REFRESH": True,
 }
 
+COMMENTS = {
+    # Number of top-level comments returned per page of a post's comments.
+    "PAGE_SIZE": 20,
+    "MAX_PAGE_SIZE": 100,
+    # Replies nested deeper than this below a top-level comment are not returned.
+    "MAX_DEPTH": 5,
+}
 
-DEFAULT_FILE_STORAGE = "api.storage.S3Storage"
+POST_CACHE = {
+    # Alias of the cache in CACHES that stores serialized posts.
+    "CACHE": "default",
+    # Serialized photos contain presigned S3 URLs that expire after 60
+    # seconds, so cached posts must expire before them.
+    "TIMEOUT": 45,
+    # Bump this whenever the output of PostSerializer changes.
+    "VERSION": 1,
+}
+
+BREED_CACHE = {
+    # Alias of the cache in CACHES that stores the serialized list of breeds.
+    "CACHE": "default",
+    # Breeds only change through the load_breeds command, which invalidates
+    # the list, so the timeout is only a safety net.
+    "TIMEOUT": 60 * 60 * 24,
+    # Bump this whenever the output of BreedSerializer changes.
+    "VERSION": 1,
+}
+
+
+# One of api.storage.S3Storage, LocalFileSystemStorage (local development
+# without S3) or InMemoryStorage (tests and benchmarks).
+DEFAULT_FILE_STORAGE = os.environ.get("FILE_STORAGE", "api.storage.S3Storage")
+
+LOCAL_STORAGE = {
+    "LOCATION": os.environ.get("LOCAL_STORAGE_LOCATION", BASE_DIR / "media"),
+    # Files are served here by the development server when DEBUG is on.
+    "BASE_URL": "/media/",
+}
 
 S3_STORAGE = {
     "BUCKET_NAME": os.environ.get("BUCKET_NAME"),
     "AWS_ACCESS_KEY": os.environ.get("AWS_ACCESS_KEY", None),
     "AWS_SECRET_ACCESS_KEY": os.environ.get("AWS_SECRET_ACCESS_KEY"),
     "AWS_REGION": os.environ.get("AWS_REGION"),
+    "ENDPOINT_URL": os.environ.get("AWS_ENDPOINT_URL"),
+}
+
+# Photos uploaded directly to storage with presigned POST requests.
+PHOTO_UPLOADS = {
+    "CONTENT_TYPES": ["image/jpeg", "image/png", "image/gif", "image/webp"],
+    "MAX_SIZE": 10 * 1024 * 1024,
+    "MAX_COUNT": 10,
+    # Seconds during which a presigned upload can be used.
+    "EXPIRES_IN": 300,
+}
+
+IDEMPOTENCY = {
+    # Seconds (one day) for which responses to requests with an
+    # Idempotency-Key header are stored. Run the purge_idempotency_keys
+    # command to delete expired ones.
+    "TTL": 86400,
+    # Seconds after which a request that has not finished is considered
+    # abandoned, for instance by a crashed worker, and its key can be used
+    # again.
+    "LOCK_TIMEOUT": 60,
+}
+
+# Job queue, see api.jobs. Start workers with the run_worker command.
+JOBS = {
+    # Seconds an idle worker waits before looking for new jobs.
+    "POLL_INTERVAL": 1,
+    # Attempts before a failing job is given up, unless set on the job.
+    "MAX_ATTEMPTS": 5,
+    # Seconds before the first retry of a failed job, doubled for every
+    # further attempt up to MAX_BACKOFF.
+    "BACKOFF": 10,
+    "MAX_BACKOFF": 3600,
+    # Seconds after which a running job is assumed to have lost its worker
+    # and is queued again.
+    "TIMEOUT": 600,
+}
+
+SOFT_DELETE = {
+    # Seconds (one day) after which deleted posts and users are removed,
+    # along with their photos in storage. A job is queued for each deletion,
+    # and the purge_deleted command removes any that were missed.
+    "PURGE_AFTER": 86400,
+    # Number of posts or users removed per transaction.
+    "BATCH_SIZE": 500,
+}
+
+BULK_POSTS = {
+    # Maximum number of posts in a single bulk create request.
+    "MAX_ITEMS": 100,
+}
+
+# Limits for multipart requests parsed by api.parsers.MultiPartJSONParser.
+# File parts are streamed to temporary files, and requests are rejected with
+# a 413 response as soon as a limit is exceeded.
+MULTIPART_UPLOADS = {
+    "MAX_FILE_SIZE": PHOTO_UPLOADS["MAX_SIZE"],
+    "MAX_TOTAL_SIZE": 50 * 1024 * 1024,
+    "MAX_FILE_COUNT": PHOTO_UPLOADS["MAX_COUNT"],
+}
+
+# Metrics served at /metrics, see api.metrics.
+METRICS = {
+    # Bearer token that scrapers of /metrics must send. Set it when the API
+    # runs behind a reverse proxy, since every request may then come from a
+    # local address.
+    "TOKEN": os.environ.get("METRICS_TOKEN", ""),
+    # Addresses of the clients allowed to scrape /metrics when no token is
+    # set.
+    "ALLOWED_IPS": ["127.0.0.1", "::1"],
+    # Directory shared by the worker processes of a pre-forking server, in
+    # which each process writes its metrics so that /metrics can add them
+    # up. Leave empty when running a single process. Empty the directory
+    # when deploying.
+    "MULTIPROCESS_DIR": os.environ.get("METRICS_MULTIPROCESS_DIR", ""),
+    # Seconds between writes of the metrics of a process to MULTIPROCESS_DIR.
+    "FLUSH_INTERVAL": 5,
 }
 
 LOGGING = {
@@ -112,6 +256,10 @@ LOGGING = {
             "format": "{asctime} {levelname} {name} {message}",
             "style": "{",
         },
+        "message": {
+            "format": "{message}",
+            "style": "{",
+        },
     },
     "handlers": {
         "django.server": {
@@ -131,6 +279,13 @@ LOGGING = {
             "formatter": "simple",
             "level": "DEBUG",
         },
+        # One json line per request, written by api.middleware.LoggingMiddleware.
+        "requests": {
+            "class": "logging.FileHandler",
+            "filename": "logs/requests.log",
+            "formatter": "message",
+            "level": "INFO",
+        },
         "memory": {
             "class": "api.logging.EventMemoryHandler",
             "capacity": 100,
@@ -150,6 +305,11 @@ LOGGING = {
             "handlers": ["error", "memory"],
             "propagate": False,
         },
+        "api.requests": {
+            "level": "INFO",
+            "handlers": ["requests"],
+            "propagate": False,
+        },
     },
 }
 
@@ -164,9 +324,96 @@ DATABASES = {
         "PASSWORD": os.environ.get("DB_PASSWORD"),
         "HOST": os.environ.get("DB_HOST"),
         "PORT": os.environ.get("DB_PORT"),
+        # Keep connections open between requests instead of opening a new
+        # one per request, and check them before reuse.
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+# Share connections between the threads of a process through an in-process
+# pool (see api/db/postgresql_pool). Useful for ASGI and threaded servers.
+if os.environ.get("DB_POOL_MAX_SIZE"):
+    DATABASES["default"].update(
+        {
+            "ENGINE": "api.db.postgresql_pool",
+            "CONN_MAX_AGE": 0,
+            "POOL": {
+                "MIN_SIZE": int(os.environ.get("DB_POOL_MIN_SIZE", 5)),
+                "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE")),
+                "TIMEOUT": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            },
+        }
+    )
+
+# Read replicas are given as a comma separated list of host[:port] values
+# and share the credentials of the primary.
+DATABASE_REPLICAS = []
+for i, replica in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(","))):
+    host, _, port = replica.strip().partition(":")
+    alias = f"replica_{i}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+
+REPLICA_ROUTING = {
+    # Seconds during which a user reads from the primary after a write.
+    "STICKY_SECONDS": 10,
+    # Seconds during which a replica that failed to connect is skipped.
+    "RETRY_SECONDS": 30,
+    # Seconds after which an open replica connection is checked again.
+    "CHECK_SECONDS": 5,
+    # Models that are always read from the primary. Tokens are read right
+    # after login, before a replica may have received them, and job workers
+    # lock the rows they read.
+    "PRIMARY_MODELS": ["knox.AuthToken", "api.Job"],
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Use a shared cache when one is available so that invalidations reach
+# every worker process.
+if os.environ.get("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL"),
+    }
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+
+# New passwords are hashed with the first hasher. Passwords hashed by the
+# others are rehashed with it when their user logs in.
+PASSWORD_HASHERS = [
+    "api.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+
+# Costs of api.hashers.Argon2PasswordHasher, by default the minimum that
+# OWASP recommends for Argon2id. Raising them slows down every login, so
+# measure with "python -m benchmarks.login" first. A single lane keeps each
+# login on one core, since logins run in parallel anyway.
+ARGON2 = {
+    "TIME_COST": int(os.environ.get("ARGON2_TIME_COST", 2)),
+    # In KiB.
+    "MEMORY_COST": int(os.environ.get("ARGON2_MEMORY_COST", 19456)),
+    "PARALLELISM": 1,
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -0,0 +1,55 @@
+"""
+Settings for running the test suite, used by default by "manage.py test".
+
+Passwords are hashed with a fast hasher and files are kept in memory, so
+that tests run quickly and without network access. Set TEST_DATABASE=sqlite
+to run against an in-memory SQLite database instead of PostgreSQL, when no
+PostgreSQL server is at hand.
+
+The suite can run in parallel with "manage.py test --parallel". Each
+process then has its own test database and in-memory storage.
+"""
+
+import os
+
+from furlorn_restapi.settings import *  # noqa: F401, F403
+from furlorn_restapi.settings import DATABASES, LOGGING, S3_STORAGE, THROTTLE
+
+# The production hashers are slow by design, and most tests create users.
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+DEFAULT_FILE_STORAGE = "api.storage.InMemoryStorage"
+
+# The tests of S3Storage mock S3, but boto3 still needs a bucket name and a
+# region to build the bucket and the client from.
+S3_STORAGE = {
+    **S3_STORAGE,
+    "BUCKET_NAME": "test",
+    "AWS_REGION": "us-east-1",
+    "AWS_ACCESS_KEY": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+}
+
+# Many tests log in and register from the same address. The tests of
+# api.throttling set their own rates.
+THROTTLE = {**THROTTLE, "RATES": dict()}
+
+if os.environ.get("TEST_DATABASE") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+    }
+else:
+    # Replicas mirror the primary in tests anyway.
+    DATABASES = {"default": DATABASES["default"]}
+DATABASE_REPLICAS = []
+
+# Keep test runs from writing to the log files of the development server.
+LOGGING = {
+    **LOGGING,
+    "handlers": {
+        name: {"class": "logging.NullHandler"} for name in LOGGING["handlers"]
+    },
+}
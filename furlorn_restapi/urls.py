@@ -13,9 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from api.views import MetricsView
+
 urlpatterns = [
     path("api/", include("api.urls")),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ]
+
+if settings.DEFAULT_FILE_STORAGE == "api.storage.LocalFileSystemStorage":
+    # static() only adds the pattern when DEBUG is on.
+    urlpatterns += static(
+        settings.LOCAL_STORAGE["BASE_URL"],
+        document_root=settings.LOCAL_STORAGE["LOCATION"],
+    )
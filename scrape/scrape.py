@@ -1,100 +1,204 @@
+"""
+Scrape the names of cat and dog breeds from purina.com into breeds.json.
+
+Pages are fetched by a bounded pool of threads and kept in an on-disk cache
+together with their ETag and Last-Modified headers, so that a refresh sends
+conditional requests and only downloads the pages that changed. Every page
+is parsed once, and breeds.json is written once at the end. With --offline
+only cached pages are used, which is how the tests run.
+
+    python scrape/scrape.py [--offline] [--workers 4]
+"""
+
+import argparse
+import hashlib
+import json
 import os
+import tempfile
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
 import requests
-import json
-from json.decoder import JSONDecodeError
 from bs4 import BeautifulSoup
 
-ROOT_PATH = os.path.realpath(__file__)
-ROOT_DIR, _ = os.path.split(ROOT_PATH)
-BREEDS_FILENAME = "breeds.json"
-BREEDS_PATH = os.path.join(ROOT_DIR, BREEDS_FILENAME)
-CAT_PAGES_DIR = os.path.join(ROOT_DIR, "pages/cats")
-DOG_PAGES_DIR = os.path.join(ROOT_DIR, "pages/dogs")
-CATS_URL = "https://www.purina.com/cats/cat-breeds"
-DOGS_URL = "https://www.purina.com/dogs/dog-breeds"
-
-
-def get_html(url, base_url, dirpath):
-    """Requests html from url and saves text at path"""
-    time.sleep(2)
-    print(f"[INFO] Downloading from {url}")
-    html = requests.get(url).text
-    save_page(html, dirpath)
-    next_page = get_next_page_url(html, base_url)
-    if next_page is None:
-        return
-    get_html(next_page, base_url, dirpath)
-
-
-def save_page(html, dirpath):
-    soup = BeautifulSoup(html, "html.parser")
-    current_page_link = soup.find("a", class_="pagination-list-item-link_isActive")
-    if current_page_link is None:
-        raise Exception("Current page number could not be determined from html.")
-    current_page_num = current_page_link["data-page-num"]
-    with open(os.path.join(dirpath, f"page_{current_page_num}.txt"), "w") as f:
-        f.write(html)
-
-
-def get_next_page_url(html, base_url):
-    soup = BeautifulSoup(html, "html.parser")
-    next_page_link = soup.find("a", class_="paginationSkip_next")
-    if next_page_link is None:
-        return None
-    next_page_url = base_url + next_page_link["href"]
-    return next_page_url
+ROOT_DIR = os.path.dirname(os.path.realpath(__file__))
+BREEDS_PATH = os.path.join(ROOT_DIR, "breeds.json")
+CACHE_DIR = os.path.join(ROOT_DIR, "pages")
+SOURCES = {
+    "cat_breeds": "https://www.purina.com/cats/cat-breeds",
+    "dog_breeds": "https://www.purina.com/dogs/dog-breeds",
+}
 
 
-def get_breeds(html):
-    soup = BeautifulSoup(html, "html.parser")
-    labels = soup.find_all(class_="callout-label")
-    breeds = [label.h4.string for label in labels]
-    return breeds
+def write_atomic(path, text):
+    """Write text to path through a temporary file, so that path is never partly written."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(temp_path, path)
 
 
-def create_empty_json_file(file):
-    with open(file, "w") as f:
-        data = dict()
-        f.write(json.dumps(data))
+class PageCache:
+    """Pages saved on disk with the headers needed for conditional requests."""
 
-
-def save(file, data: dict, key, value):
-    with open(file, "w") as f:
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
         try:
-            data[key] += value
-        except KeyError:
-            data[key] = value
-        finally:
-            f.write(json.dumps(data))
-
-
-def save_to_file(file, key, value: list):
-    try:
-        with open(file, "r") as f:
-            data = json.loads(f.read())
-    except (FileNotFoundError, JSONDecodeError):
-        save(file, dict(), key, value)
-    save(file, data, key, value)
-
-
-def scrape(src, dst, name):
-    for i, file in enumerate(sorted(os.listdir(src))):
-        with open(os.path.join(src, file), "r") as f:
-            html = f.read()
-        breeds = get_breeds(html)
-        print(f"Page {i}", breeds, sep="\n")
-        save_to_file(dst, name, breeds)
-
-
-def init():
-    if BREEDS_FILENAME not in os.listdir(ROOT_DIR):
-        get_html(CATS_URL, CATS_URL, CAT_PAGES_DIR)
-        get_html(DOGS_URL, DOGS_URL, DOG_PAGES_DIR)
-
-    scrape(CAT_PAGES_DIR, BREEDS_PATH, "cat_breeds")
-    scrape(DOG_PAGES_DIR, BREEDS_PATH, "dog_breeds")
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = dict()
+
+    def get(self, url):
+        """Return the cached html of url and its cache entry, or None and {}."""
+        entry = self.index.get(url, None)
+        if entry is None:
+            return None, dict()
+        try:
+            with open(os.path.join(self.directory, entry["file"]), "r") as f:
+                return f.read(), entry
+        except FileNotFoundError:
+            return None, dict()
+
+    def put(self, url, html, headers):
+        filename = hashlib.sha1(url.encode()).hexdigest() + ".html"
+        write_atomic(os.path.join(self.directory, filename), html)
+        with self.lock:
+            self.index[url] = {
+                "file": filename,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+
+    def save(self):
+        with self.lock:
+            write_atomic(self.index_path, json.dumps(self.index, indent=2))
+
+
+def parse(html, url):
+    """
+    Parse a page of breeds in a single pass. Return its page number, the
+    breed names on it and the (page number, url) of the pages it links to.
+    The page number of the "next" link is not known and is None.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    current_page_link = soup.find("a", class_="pagination-list-item-link_isActive")
+    if current_page_link is None:
+        raise ValueError(f"Current page number could not be determined from {url}.")
+    page_num = int(current_page_link["data-page-num"])
+
+    breeds = [
+        label.h4.string
+        for label in soup.find_all(class_="callout-label")
+        if label.h4 is not None and label.h4.string
+    ]
+
+    links = []
+    for link in soup.find_all("a", class_="pagination-list-item-link"):
+        if link.get("href") and link.get("data-page-num"):
+            links.append((int(link["data-page-num"]), urljoin(url, link["href"])))
+    next_page_link = soup.find("a", class_="paginationSkip_next")
+    if next_page_link is not None and next_page_link.get("href"):
+        links.append((None, urljoin(url, next_page_link["href"])))
+    return page_num, breeds, links
+
+
+class Crawler:
+    """Crawls the paginated breed lists, with at most workers requests at a time."""
+
+    def __init__(self, cache, workers=4, delay=1.0, offline=False, session=None):
+        self.cache = cache
+        self.workers = workers
+        # Seconds each worker waits before a request, to be polite.
+        self.delay = delay
+        self.offline = offline
+        self.session = session or requests.Session()
+
+    def fetch(self, url) -> str:
+        html, entry = self.cache.get(url)
+        if self.offline:
+            if html is None:
+                raise LookupError(f"{url} is not cached.")
+            return html
+
+        headers = dict()
+        if html is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        time.sleep(self.delay)
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code == 304 and html is not None:
+            print(f"[INFO] Not modified: {url}")
+            return html
+        response.raise_for_status()
+        print(f"[INFO] Downloaded {url}")
+        self.cache.put(url, response.text, response.headers)
+        return response.text
+
+    def visit(self, url):
+        return parse(self.fetch(url), url)
+
+    def crawl(self, sources) -> dict:
+        """
+        Crawl every paginated list of sources, a dict of start urls by key.
+        Return the breed names of each key in page order.
+        """
+        pages = {key: dict() for key in sources}
+        queued_pages = {key: set() for key in sources}
+        queued_urls = set(sources.values())
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.visit, url): key for key, url in sources.items()
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = futures.pop(future)
+                    page_num, breeds, links = future.result()
+                    pages[key][page_num] = breeds
+                    queued_pages[key].add(page_num)
+                    for link_page_num, url in links:
+                        if url in queued_urls or link_page_num in queued_pages[key]:
+                            continue
+                        queued_urls.add(url)
+                        if link_page_num is not None:
+                            queued_pages[key].add(link_page_num)
+                        futures[executor.submit(self.visit, url)] = key
+        self.cache.save()
+        return {
+            key: [breed for num in sorted(found) for breed in found[num]]
+            for key, found in pages.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--offline", action="store_true", help="Only use cached pages.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=1.0)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--output", default=BREEDS_PATH)
+    args = parser.parse_args()
+
+    crawler = Crawler(
+        PageCache(args.cache_dir),
+        workers=args.workers,
+        delay=args.delay,
+        offline=args.offline,
+    )
+    breeds = crawler.crawl(SOURCES)
+    for key, names in breeds.items():
+        print(f"[INFO] Found {len(names)} {key.replace('_', ' ')}.")
+    write_atomic(args.output, json.dumps(breeds))
 
 
 if __name__ == "__main__":
-    init()
+    main()